@@ -1,10 +1,19 @@
 """Data Agent - Fetches protocol data from DefiLlama."""
 
+import asyncio
+from typing import Any
+
 from langchain_core.prompts import ChatPromptTemplate
 
+from src.concurrency import LoopSemaphore
 from src.models.schemas import AgentState, ProtocolData
 from src.tools.defillama import DefiLlamaClient, DefiLlamaError, get_client
 
+MAX_IN_FLIGHT = 8  # Cap on concurrent DefiLlama fetches to stay under rate limits
+
+# Bound str.format for chain distribution rows
+_format_chain_line = "- {chain}: {tvl} ({percentage:.1f}%)".format
+
 DATA_AGENT_PROMPT = ChatPromptTemplate.from_messages(
     [
         (
@@ -28,68 +37,86 @@ When reporting data:
 class DataAgent:
     """Agent responsible for fetching DeFi protocol data."""
 
-    def __init__(self, client: DefiLlamaClient | None = None) -> None:
+    def __init__(
+        self,
+        client: DefiLlamaClient | None = None,
+        max_in_flight: int = MAX_IN_FLIGHT,
+    ) -> None:
         self.client = client or get_client()
         self.name = "data_agent"
+        self._sem = LoopSemaphore(max_in_flight)
 
     async def fetch_protocol(self, protocol_name: str) -> ProtocolData:
         """Fetch data for a single protocol."""
-        return await self.client.fetch_protocol_data(protocol_name)
+        async with self._sem:
+            return await self.client.fetch_protocol_data(protocol_name)
 
     async def fetch_protocols(self, protocol_names: list[str]) -> dict[str, ProtocolData]:
         """Fetch data for multiple protocols."""
+        results, _ = await self._fetch_protocols(protocol_names)
+        return results
+
+    async def _fetch_protocols(
+        self, protocol_names: list[str]
+    ) -> tuple[dict[str, ProtocolData], list[str]]:
+        """Fetch protocols concurrently, returning the results and per-protocol errors."""
         results: dict[str, ProtocolData] = {}
         errors: list[str] = []
 
-        for name in protocol_names:
-            try:
-                data = await self.fetch_protocol(name)
-                results[data.slug] = data
-            except DefiLlamaError as e:
-                errors.append(f"{name}: {e}")
+        # Issue all requests concurrently; total latency is bounded by the slowest fetch
+        tasks = [asyncio.create_task(self.fetch_protocol(name)) for name in protocol_names]
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+
+        for name, outcome in zip(protocol_names, outcomes):
+            if isinstance(outcome, DefiLlamaError):
+                errors.append(f"{name}: {outcome}")
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results[outcome.slug] = outcome
 
         if errors and not results:
             raise DefiLlamaError(f"Failed to fetch all protocols: {', '.join(errors)}")
 
-        return results
+        return results, errors
 
-    async def run(self, state: AgentState) -> AgentState:
+    async def run(self, state: AgentState) -> dict[str, Any]:
         """Execute data fetching step in the workflow."""
         protocol_names = state.get("protocol_names", [])
 
         if not protocol_names:
             return {
-                **state,
                 "error": "No protocols specified for data fetching",
                 "current_agent": self.name,
                 "next_agent": None,
             }
 
         try:
-            protocol_data = await self.fetch_protocols(protocol_names)
+            protocol_data, errors = await self._fetch_protocols(protocol_names)
 
             # Add message about fetched data
-            messages = state.get("messages", [])
             fetched_names = list(protocol_data.keys())
             message_content = f"Successfully fetched data for: {', '.join(fetched_names)}"
 
             for slug, data in protocol_data.items():
                 message_content += (
-                    f"\n- {data.name}: TVL ${data.tvl / 1e9:.2f}B across {len(data.chains)} chains"
+                    f"\n- {data.name}: TVL {data.tvl_display} across {len(data.chains)} chains"
                 )
 
-            messages.append(
-                {
-                    "role": "assistant",
-                    "content": message_content,
-                    "agent": self.name,
-                }
-            )
+            # Report protocols that failed while the rest continue through the workflow
+            if errors:
+                message_content += f"\nCould not fetch: {'; '.join(errors)}"
 
+            # Return only the updated keys; LangGraph merges them into the workflow state
             return {
-                **state,
                 "protocol_data": protocol_data,
-                "messages": messages,
+                "messages": [
+                    {
+                        "role": "assistant",
+                        "content": message_content,
+                        "agent": self.name,
+                    }
+                ],
                 "current_agent": self.name,
                 "next_agent": "risk_agent",
                 "error": None,
@@ -97,7 +124,6 @@ class DataAgent:
 
         except DefiLlamaError as e:
             return {
-                **state,
                 "error": str(e),
                 "current_agent": self.name,
                 "next_agent": None,
@@ -108,7 +134,7 @@ class DataAgent:
         lines = [
             f"# {data.name} ({data.symbol or 'N/A'})",
             f"**Category:** {data.category or 'Unknown'}",
-            f"**TVL:** ${data.tvl / 1e9:.2f}B",
+            f"**TVL:** {data.tvl_display}",
             "",
             "## TVL Changes",
             f"- 24h: {data.tvl_change_1d or 0:+.2f}%",
@@ -118,8 +144,10 @@ class DataAgent:
             "## Chain Distribution",
         ]
 
-        for chain in data.chain_tvls[:5]:
-            lines.append(f"- {chain.chain}: ${chain.tvl / 1e9:.2f}B ({chain.percentage:.1f}%)")
+        lines.extend(
+            _format_chain_line(chain=c.chain, tvl=c.tvl_display, percentage=c.percentage)
+            for c in data.chain_tvls[:5]
+        )
 
         lines.extend(
             [
@@ -135,3 +163,15 @@ class DataAgent:
         )
 
         return "\n".join(lines)
+
+
+# Singleton instance
+_data_agent: DataAgent | None = None
+
+
+def get_data_agent() -> DataAgent:
+    """Get or create DataAgent singleton."""
+    global _data_agent
+    if _data_agent is None:
+        _data_agent = DataAgent()
+    return _data_agent
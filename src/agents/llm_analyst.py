@@ -1,17 +1,17 @@
 """LLM-powered analysis agent for enhanced risk insights."""
 
+import asyncio
+from datetime import datetime
+
 from langchain_core.language_models import BaseChatModel
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
 from src.models.schemas import ProtocolData, RiskAssessment
 
 
-def _get_factor_score(assessment: RiskAssessment, name: str) -> str:
-    """Extract a factor score by name from the assessment."""
-    for f in assessment.score.factors:
-        if f.name == name:
-            return str(f.score)
-    return "N/A"
+def _get_factor_scores(assessment: RiskAssessment) -> dict[str, str]:
+    """Index factor scores by name so each lookup is O(1)."""
+    return {f.name: str(f.score) for f in assessment.score.factors}
 
 
 ANALYST_SYSTEM_PROMPT = """You are a DeFi risk analyst. Analyze the provided protocol \
@@ -27,6 +27,13 @@ Do not make up information. Only reference data provided to you.
 Do not give financial advice. Frame insights as considerations, not recommendations.
 """
 
+# Built once and shared by every prompt; messages are not mutated after construction
+_ANALYST_SYSTEM_MSG = SystemMessage(content=ANALYST_SYSTEM_PROMPT)
+
+
+# Bound str.format for chain distribution rows
+_format_chain_line = "  - {chain}: {tvl} ({percentage:.1f}%)".format
+
 
 def format_protocol_for_llm(protocol: ProtocolData, assessment: RiskAssessment) -> str:
     """Format protocol data for LLM consumption."""
@@ -34,16 +41,19 @@ def format_protocol_for_llm(protocol: ProtocolData, assessment: RiskAssessment)
     if protocol.chain_tvls:
         top_chains = protocol.chain_tvls[:5]
         chain_info = "\n".join(
-            f"  - {c.chain}: ${c.tvl / 1e9:.2f}B ({c.percentage:.1f}%)" for c in top_chains
+            _format_chain_line(chain=c.chain, tvl=c.tvl_display, percentage=c.percentage)
+            for c in top_chains
         )
 
+    factor_scores = _get_factor_scores(assessment)
+
     return f"""
 Protocol: {protocol.name}
 Category: {protocol.category or "Unknown"}
 Symbol: {protocol.symbol or "N/A"}
 
 TVL Metrics:
-- Current TVL: ${protocol.tvl / 1e9:.2f}B
+- Current TVL: {protocol.tvl_display}
 - 24h Change: {protocol.tvl_change_1d or 0:+.2f}%
 - 7d Change: {protocol.tvl_change_7d or 0:+.2f}%
 - 30d Change: {protocol.tvl_change_30d or 0:+.2f}%
@@ -57,22 +67,27 @@ Security:
 
 Risk Assessment:
 - Overall Score: {assessment.score.overall:.1f}/10 ({assessment.score.level.value.upper()})
-- TVL Risk: {_get_factor_score(assessment, "TVL Risk")}/10
-- Chain Concentration: {_get_factor_score(assessment, "Chain Concentration")}/10
-- Audit Status: {_get_factor_score(assessment, "Audit Status")}/10
-- Oracle Risk: {_get_factor_score(assessment, "Oracle Risk")}/10
-- Incident History: {_get_factor_score(assessment, "Incident History")}/10
+- TVL Risk: {factor_scores.get("TVL Risk", "N/A")}/10
+- Chain Concentration: {factor_scores.get("Chain Concentration", "N/A")}/10
+- Audit Status: {factor_scores.get("Audit Status", "N/A")}/10
+- Oracle Risk: {factor_scores.get("Oracle Risk", "N/A")}/10
+- Incident History: {factor_scores.get("Incident History", "N/A")}/10
 
 Incidents: {len(protocol.incidents)} documented
 Warnings: {", ".join(assessment.warnings) if assessment.warnings else "None"}
 """
 
 
+FORMAT_CACHE_SIZE = 256
+OFFLOAD_THRESHOLD = 8  # Format batches at least this large in a worker thread
+
+
 class LLMAnalyst:
     """LLM-powered analyst for enhanced risk insights."""
 
     def __init__(self, llm: BaseChatModel | None = None):
         self._llm = llm
+        self._fmt_cache: dict[tuple[str, datetime, datetime], str] = {}
 
     @property
     def llm(self) -> BaseChatModel:
@@ -83,19 +98,71 @@ class LLMAnalyst:
             self._llm = get_llm()
         return self._llm
 
-    def analyze(self, protocol: ProtocolData, assessment: RiskAssessment) -> str:
-        """Generate LLM-powered analysis for a protocol."""
-        protocol_info = format_protocol_for_llm(protocol, assessment)
-
-        messages = [
-            SystemMessage(content=ANALYST_SYSTEM_PROMPT),
+    def _format_protocol(self, protocol: ProtocolData, assessment: RiskAssessment) -> str:
+        """Format protocol data for the LLM, reusing earlier output for the same snapshot."""
+        key = (protocol.slug, protocol.fetched_at, assessment.assessed_at)
+        cached = self._fmt_cache.get(key)
+        if cached is not None:
+            return cached
+
+        formatted = format_protocol_for_llm(protocol, assessment)
+        if len(self._fmt_cache) >= FORMAT_CACHE_SIZE:
+            # Evict the oldest entry (dicts preserve insertion order)
+            del self._fmt_cache[next(iter(self._fmt_cache))]
+        self._fmt_cache[key] = formatted
+        return formatted
+
+    def _format_protocols(
+        self,
+        protocols: list[ProtocolData],
+        assessments: list[RiskAssessment],
+    ) -> list[str]:
+        """Format a batch of protocols for a comparison prompt."""
+        return [self._format_protocol(p, a) for p, a in zip(protocols, assessments)]
+
+    def _analysis_messages(
+        self, protocol: ProtocolData, assessment: RiskAssessment
+    ) -> list[BaseMessage]:
+        """Build the prompt for a single-protocol analysis."""
+        protocol_info = self._format_protocol(protocol, assessment)
+
+        return [
+            _ANALYST_SYSTEM_MSG,
             HumanMessage(
                 content=f"Analyze this DeFi protocol and provide insights:\n{protocol_info}"
             ),
         ]
 
-        response = self.llm.invoke(messages)
-        return response.content
+    def _comparison_messages(self, protocol_infos: list[str]) -> list[BaseMessage]:
+        """Build the prompt comparing already-formatted protocol blocks."""
+        combined_info = "\n---\n".join(protocol_infos)
+
+        prompt = (
+            "Compare these DeFi protocols and provide insights "
+            f"on their relative risk profiles:\n{combined_info}"
+        )
+        return [
+            _ANALYST_SYSTEM_MSG,
+            HumanMessage(content=prompt),
+        ]
+
+    def analyze(self, protocol: ProtocolData, assessment: RiskAssessment) -> str:
+        """Generate LLM-powered analysis for a protocol."""
+        response = self.llm.invoke(self._analysis_messages(protocol, assessment))
+        return response.text
+
+    async def aanalyze(self, protocol: ProtocolData, assessment: RiskAssessment) -> str:
+        """Generate LLM-powered analysis for a protocol without blocking the event loop."""
+        response = await self.llm.ainvoke(self._analysis_messages(protocol, assessment))
+        return response.text
+
+    async def analyze_many(
+        self,
+        protocols: list[ProtocolData],
+        assessments: list[RiskAssessment],
+    ) -> list[str]:
+        """Analyze several protocols with concurrent LLM requests."""
+        return await asyncio.gather(*(self.aanalyze(p, a) for p, a in zip(protocols, assessments)))
 
     def compare(
         self,
@@ -103,23 +170,25 @@ class LLMAnalyst:
         assessments: list[RiskAssessment],
     ) -> str:
         """Generate LLM-powered comparison analysis."""
-        protocol_infos = []
-        for protocol, assessment in zip(protocols, assessments):
-            protocol_infos.append(format_protocol_for_llm(protocol, assessment))
+        protocol_infos = self._format_protocols(protocols, assessments)
 
-        combined_info = "\n---\n".join(protocol_infos)
+        response = self.llm.invoke(self._comparison_messages(protocol_infos))
+        return response.text
 
-        prompt = (
-            "Compare these DeFi protocols and provide insights "
-            f"on their relative risk profiles:\n{combined_info}"
-        )
-        messages = [
-            SystemMessage(content=ANALYST_SYSTEM_PROMPT),
-            HumanMessage(content=prompt),
-        ]
+    async def acompare(
+        self,
+        protocols: list[ProtocolData],
+        assessments: list[RiskAssessment],
+    ) -> str:
+        """Generate LLM-powered comparison analysis asynchronously."""
+        if len(protocols) >= OFFLOAD_THRESHOLD:
+            # Keep large formatting batches off the event loop
+            protocol_infos = await asyncio.to_thread(self._format_protocols, protocols, assessments)
+        else:
+            protocol_infos = self._format_protocols(protocols, assessments)
 
-        response = self.llm.invoke(messages)
-        return response.content
+        response = await self.llm.ainvoke(self._comparison_messages(protocol_infos))
+        return response.text
 
     def answer_question(
         self,
@@ -128,15 +197,15 @@ class LLMAnalyst:
         assessment: RiskAssessment,
     ) -> str:
         """Answer a specific question about a protocol."""
-        protocol_info = format_protocol_for_llm(protocol, assessment)
+        protocol_info = self._format_protocol(protocol, assessment)
 
         prompt = (
             f"Based on this protocol data:\n{protocol_info}\n\nAnswer this question: {question}"
         )
         messages = [
-            SystemMessage(content=ANALYST_SYSTEM_PROMPT),
+            _ANALYST_SYSTEM_MSG,
             HumanMessage(content=prompt),
         ]
 
         response = self.llm.invoke(messages)
-        return response.content
+        return response.text
@@ -1,5 +1,11 @@
 """Report Agent - Synthesizes findings into professional reports."""
 
+import io
+import itertools
+from collections.abc import Iterator
+from typing import Any
+
+import orjson
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.models.schemas import (
@@ -34,6 +40,40 @@ Avoid speculation; stick to data-supported conclusions.
 )
 
 
+# Static markdown blocks shared by every formatted report
+_REPORT_DISCLAIMER = (
+    "",
+    "---",
+    "",
+    "*This report is generated algorithmically based on publicly available data. "
+    "It should not be considered financial advice. Always conduct independent "
+    "research before making investment decisions.*",
+)
+
+_COMPARISON_FOOTER = (
+    "",
+    "---",
+    "",
+    "## Data Sources",
+    "- DefiLlama API (https://defillama.com)",
+    "- On-chain TVL data aggregated across chains",
+    "",
+    "---",
+    "",
+    "*This report is generated algorithmically based on publicly available data. "
+    "It should not be considered financial advice.*",
+)
+
+
+# Horizontal rule between report sections
+_SECTION_BREAK = "\n---\n"
+
+
+def _pair_score(pair: tuple[ProtocolData, RiskAssessment]) -> float:
+    """Sort key for (protocol, assessment) pairs: the overall risk score."""
+    return pair[1].score.overall
+
+
 class ReportAgent:
     """Agent responsible for generating risk reports."""
 
@@ -45,16 +85,20 @@ class ReportAgent:
             "Public audit records and security disclosures",
             "Rekt.news Incident Database (https://rekt.news/leaderboard)",
         ]
+        # Markdown list of the default sources, rendered once and reused by format_report
+        self._data_sources_md = "\n".join(f"- {source}" for source in self.data_sources)
 
     def generate_executive_summary(self, protocol: ProtocolData, assessment: RiskAssessment) -> str:
         """Generate executive summary for a protocol."""
         risk_level = assessment.score.level.value.upper()
         score = assessment.score.overall
+        n_chains = len(protocol.chains)
 
         summary_parts = [
-            f"{protocol.name} is a {protocol.category or 'DeFi'} protocol "
-            f"with ${protocol.tvl / 1e9:.2f}B in Total Value Locked across "
-            f"{len(protocol.chains)} blockchain{'s' if len(protocol.chains) > 1 else ''}.",
+            # 's'[: n_chains > 1] pluralizes without a conditional expression
+            f"{protocol.name} is a {protocol.category or 'DeFi'} protocol with "
+            f"{protocol.tvl_display} in Total Value Locked across "
+            f"{n_chains} blockchain{'s'[: n_chains > 1]}.",
             "",
             f"**Risk Assessment:** {risk_level} (Score: {score:.1f}/10)",
             "",
@@ -71,9 +115,9 @@ class ReportAgent:
                 findings.append(f"Significant TVL decline ({protocol.tvl_change_30d:+.1f}% 30d)")
 
         # Chain diversification
-        if len(protocol.chains) >= 5:
-            findings.append(f"Well-diversified across {len(protocol.chains)} chains")
-        elif len(protocol.chains) == 1:
+        if n_chains >= 5:
+            findings.append(f"Well-diversified across {n_chains} chains")
+        elif n_chains == 1:
             findings.append("Single-chain deployment limits diversification")
 
         # Audit status
@@ -94,126 +138,155 @@ class ReportAgent:
 
         if findings:
             summary_parts.append("**Key Findings:**")
-            for finding in findings:
-                summary_parts.append(f"- {finding}")
+            summary_parts.extend(f"- {finding}" for finding in findings)
 
         # Risk warnings
         if assessment.warnings:
             summary_parts.append("")
             summary_parts.append("**Risk Warnings:**")
-            for warning in assessment.warnings[:3]:
-                summary_parts.append(f"- {warning}")
+            summary_parts.extend(f"- {warning}" for warning in assessment.warnings[:3])
 
         return "\n".join(summary_parts)
 
     def generate_detailed_analysis(self, protocol: ProtocolData, assessment: RiskAssessment) -> str:
         """Generate detailed analysis section."""
-        sections = []
+        buf = io.StringIO()
+
+        def line(text: str = "") -> None:
+            buf.write(text)
+            buf.write("\n")
 
         # Protocol Overview
-        sections.append("## Protocol Overview")
-        sections.append(f"**Name:** {protocol.name}")
-        sections.append(f"**Category:** {protocol.category or 'Unknown'}")
-        sections.append(f"**Symbol:** {protocol.symbol or 'N/A'}")
+        line("## Protocol Overview")
+        line(f"**Name:** {protocol.name}")
+        line(f"**Category:** {protocol.category or 'Unknown'}")
+        line(f"**Symbol:** {protocol.symbol or 'N/A'}")
         if protocol.description:
-            sections.append(f"**Description:** {protocol.description[:300]}...")
-        sections.append("")
+            line(f"**Description:** {protocol.description[:300]}...")
+        line()
 
         # TVL Analysis
-        sections.append("## Total Value Locked Analysis")
-        sections.append(f"**Current TVL:** ${protocol.tvl / 1e9:.2f}B")
-        sections.append("")
-        sections.append("### TVL Trends")
-        sections.append(f"- 24-hour change: {protocol.tvl_change_1d or 0:+.2f}%")
-        sections.append(f"- 7-day change: {protocol.tvl_change_7d or 0:+.2f}%")
-        sections.append(f"- 30-day change: {protocol.tvl_change_30d or 0:+.2f}%")
-        sections.append("")
-        sections.append(assessment.tvl_analysis)
-        sections.append("")
+        line("## Total Value Locked Analysis")
+        line(f"**Current TVL:** {protocol.tvl_display}")
+        line()
+        line("### TVL Trends")
+        line(f"- 24-hour change: {protocol.tvl_change_1d or 0:+.2f}%")
+        line(f"- 7-day change: {protocol.tvl_change_7d or 0:+.2f}%")
+        line(f"- 30-day change: {protocol.tvl_change_30d or 0:+.2f}%")
+        line()
+        line(assessment.tvl_analysis)
+        line()
 
         # Chain Distribution
-        sections.append("## Chain Distribution Analysis")
-        sections.append(f"**Chains Supported:** {len(protocol.chains)}")
-        sections.append("")
+        line("## Chain Distribution Analysis")
+        line(f"**Chains Supported:** {len(protocol.chains)}")
+        line()
         if protocol.chain_tvls:
-            sections.append("### TVL by Chain")
-            for chain in protocol.chain_tvls[:10]:
-                sections.append(
-                    f"- {chain.chain}: ${chain.tvl / 1e9:.2f}B ({chain.percentage:.1f}%)"
-                )
-        sections.append("")
-        sections.append(assessment.chain_analysis)
-        sections.append("")
+            line("### TVL by Chain")
+            buf.writelines(
+                f"- {c.chain}: {c.tvl_display} ({c.percentage:.1f}%)\n"
+                for c in protocol.chain_tvls[:10]
+            )
+        line()
+        line(assessment.chain_analysis)
+        line()
 
         # Security Analysis
-        sections.append("## Security Analysis")
-        sections.append("### Audit Status")
+        line("## Security Analysis")
+        line("### Audit Status")
         if protocol.audit_links:
-            sections.append(f"**Audits Found:** {len(protocol.audit_links)}")
-            for link in protocol.audit_links[:5]:
-                sections.append(f"- {link}")
+            line(f"**Audits Found:** {len(protocol.audit_links)}")
+            buf.writelines(f"- {link}\n" for link in protocol.audit_links[:5])
         else:
-            sections.append("No public audit records were identified for this protocol.")
-        sections.append("")
-        sections.append(assessment.audit_analysis)
-        sections.append("")
+            line("No public audit records were identified for this protocol.")
+        line()
+        line(assessment.audit_analysis)
+        line()
 
         # Incident History
-        sections.append("## Incident History")
+        line("## Incident History")
         if protocol.incidents:
-            sections.append(f"**Total Incidents:** {len(protocol.incidents)}")
-            sections.append("")
-            sections.append("### Documented Exploits")
-
-            for incident in protocol.incidents[:5]:  # Show 5 most recent
-                sections.append(f"\n#### {incident.title}")
-                sections.append(f"- **Date:** {incident.date.strftime('%B %d, %Y')}")
-                sections.append(f"- **Amount Lost:** ${incident.amount_lost_usd / 1e6:.2f}M")
-                sections.append(f"- **Severity:** {incident.severity.value.upper()}")
-                if incident.details_url:
-                    sections.append(f"- **Details:** {incident.details_url}")
+            line(f"**Total Incidents:** {len(protocol.incidents)}")
+            line()
+            line("### Documented Exploits")
+
+            buf.writelines(
+                itertools.chain.from_iterable(
+                    (
+                        f"\n#### {incident.title}\n",
+                        f"- **Date:** {incident.date.strftime('%B %d, %Y')}\n",
+                        f"- **Amount Lost:** ${incident.amount_lost_usd / 1e6:.2f}M\n",
+                        f"- **Severity:** {incident.severity.value.upper()}\n",
+                        f"- **Details:** {incident.details_url}\n" if incident.details_url else "",
+                    )
+                    for incident in protocol.incidents[:5]  # Show 5 most recent
+                )
+            )
 
             if len(protocol.incidents) > 5:
-                sections.append(f"\n*({len(protocol.incidents) - 5} additional incidents not shown)*")
+                line(f"\n*({len(protocol.incidents) - 5} additional incidents not shown)*")
         else:
-            sections.append("No historical incidents found.")
+            line("No historical incidents found.")
 
-        sections.append(f"\n{assessment.incident_analysis}\n")
+        line(f"\n{assessment.incident_analysis}\n")
 
         # Oracle Dependencies
         if protocol.oracles:
-            sections.append("### Oracle Dependencies")
-            sections.append(f"**Oracles Used:** {', '.join(protocol.oracles)}")
-            sections.append("")
+            line("### Oracle Dependencies")
+            line(f"**Oracles Used:** {', '.join(protocol.oracles)}")
+            line()
 
         # Risk Score Breakdown
-        sections.append("## Risk Score Methodology")
-        sections.append(
-            "Risk scores are calculated on a 0-10 scale where lower scores indicate lower risk."
+        line("## Risk Score Methodology")
+        line("Risk scores are calculated on a 0-10 scale where lower scores indicate lower risk.")
+        line()
+        line("### Factor Weights")
+        buf.writelines(
+            f"- **{factor.name}:** {factor.weight:.0%} weight\n"
+            for factor in assessment.score.factors
         )
-        sections.append("")
-        sections.append("### Factor Weights")
-        for factor in assessment.score.factors:
-            sections.append(f"- **{factor.name}:** {factor.weight:.0%} weight")
-        sections.append("")
-
-        sections.append("### Individual Factor Scores")
-        for factor in assessment.score.factors:
-            sections.append(f"#### {factor.name}: {factor.score:.1f}/10")
-            sections.append(f"{factor.description}")
-            if factor.details:
-                sections.append(f"*{factor.details}*")
-            sections.append("")
-
-        return "\n".join(sections)
-
-    def generate_report(self, protocol: ProtocolData, assessment: RiskAssessment) -> RiskReport:
-        """Generate complete risk report."""
+        line()
+
+        line("### Individual Factor Scores")
+        buf.writelines(
+            itertools.chain.from_iterable(
+                (
+                    f"#### {factor.name}: {factor.score:.1f}/10\n",
+                    f"{factor.description}\n",
+                    f"*{factor.details}*\n" if factor.details else "",
+                    "\n",
+                )
+                for factor in assessment.score.factors
+            )
+        )
+
+        # Drop the terminator written after the final line
+        return buf.getvalue().removesuffix("\n")
+
+    def generate_report(
+        self,
+        protocol: ProtocolData,
+        assessment: RiskAssessment,
+        narrative: bool = True,
+    ) -> RiskReport:
+        """
+        Generate complete risk report.
+
+        Pass ``narrative=False`` when only the structured data and scores are needed;
+        the executive summary and detailed analysis are then left empty, skipping the
+        bulk of the markdown formatting work.
+        """
+        if narrative:
+            executive_summary = self.generate_executive_summary(protocol, assessment)
+            detailed_analysis = self.generate_detailed_analysis(protocol, assessment)
+        else:
+            executive_summary = detailed_analysis = ""
+
         return RiskReport(
             protocol=protocol,
             assessment=assessment,
-            executive_summary=self.generate_executive_summary(protocol, assessment),
-            detailed_analysis=self.generate_detailed_analysis(protocol, assessment),
+            executive_summary=executive_summary,
+            detailed_analysis=detailed_analysis,
             data_sources=self.data_sources,
         )
 
@@ -223,11 +296,30 @@ class ReportAgent:
         assessments: list[RiskAssessment],
     ) -> ComparisonReport:
         """Generate comparison report for multiple protocols."""
-        # Sort by risk score
-        sorted_pairs = sorted(
-            zip(protocols, assessments),
-            key=lambda x: x[1].score.overall,
-        )
+        # Sort by risk score; one or two protocols need at most a swap, not a full sort
+        sorted_pairs = list(zip(protocols, assessments))
+        if len(sorted_pairs) == 2:
+            if sorted_pairs[1][1].score.overall < sorted_pairs[0][1].score.overall:
+                sorted_pairs.reverse()
+        elif len(sorted_pairs) > 2:
+            sorted_pairs.sort(key=_pair_score)
+
+        # Build every section in a single pass over the ranked protocols
+        ranking: list[str] = []
+        tvl_lines: list[str] = []
+        chain_lines: list[str] = []
+        audit_lines: list[str] = []
+
+        for i, (protocol, assessment) in enumerate(sorted_pairs, 1):
+            name = protocol.name
+            ranking.append(
+                f"{i}. **{name}** - {assessment.score.level.value.upper()} "
+                f"(Score: {assessment.score.overall:.1f}/10)"
+            )
+            tvl_lines.append(f"- {name}: {protocol.tvl_display}")
+            chain_lines.append(f"- {name}: {len(protocol.chains)} chains")
+            audit_count = len(protocol.audit_links) if protocol.audit_links else 0
+            audit_lines.append(f"- {name}: {audit_count} audits")
 
         # Generate comparison summary
         summary_lines = [
@@ -236,27 +328,18 @@ class ReportAgent:
             f"This report compares {len(protocols)} DeFi protocols across key risk dimensions.",
             "",
             "### Risk Ranking",
+            *ranking,
+            "",
+            "### TVL Comparison",
+            *tvl_lines,
+            "",
+            "### Chain Diversification",
+            *chain_lines,
+            "",
+            "### Audit Status",
+            *audit_lines,
         ]
 
-        for i, (protocol, assessment) in enumerate(sorted_pairs, 1):
-            summary_lines.append(
-                f"{i}. **{protocol.name}** - {assessment.score.level.value.upper()} "
-                f"(Score: {assessment.score.overall:.1f}/10)"
-            )
-
-        summary_lines.extend(["", "### TVL Comparison"])
-        for protocol, _ in sorted_pairs:
-            summary_lines.append(f"- {protocol.name}: ${protocol.tvl / 1e9:.2f}B")
-
-        summary_lines.extend(["", "### Chain Diversification"])
-        for protocol, _ in sorted_pairs:
-            summary_lines.append(f"- {protocol.name}: {len(protocol.chains)} chains")
-
-        summary_lines.extend(["", "### Audit Status"])
-        for protocol, _ in sorted_pairs:
-            audit_count = len(protocol.audit_links) if protocol.audit_links else 0
-            summary_lines.append(f"- {protocol.name}: {audit_count} audits")
-
         # Generate recommendation
         lowest_risk = sorted_pairs[0]
         highest_risk = sorted_pairs[-1]
@@ -282,22 +365,19 @@ class ReportAgent:
             recommendation=recommendation,
         )
 
-    async def run(self, state: AgentState) -> AgentState:
+    async def run(self, state: AgentState) -> dict[str, Any]:
         """Execute report generation step in the workflow."""
         protocol_data = state.get("protocol_data", {})
         risk_assessments = state.get("risk_assessments", {})
 
         if not protocol_data or not risk_assessments:
             return {
-                **state,
                 "error": "Missing data or assessments for report generation",
                 "current_agent": self.name,
                 "next_agent": None,
             }
 
         try:
-            messages = state.get("messages", [])
-
             # Generate appropriate report type
             if len(protocol_data) == 1:
                 slug = list(protocol_data.keys())[0]
@@ -305,31 +385,25 @@ class ReportAgent:
                 assessment = risk_assessments[slug]
                 report = self.generate_report(protocol, assessment)
 
-                messages.append(
-                    {
-                        "role": "assistant",
-                        "content": f"Generated risk report for {protocol.name}",
-                        "agent": self.name,
-                    }
-                )
+                content = f"Generated risk report for {protocol.name}"
             else:
                 protocols = list(protocol_data.values())
                 assessments = [risk_assessments[p.slug] for p in protocols]
                 report = self.generate_comparison_report(protocols, assessments)
 
                 protocol_names = [p.name for p in protocols]
-                messages.append(
+                content = f"Generated comparison report for: {', '.join(protocol_names)}"
+
+            # Return only the updated keys; LangGraph merges them into the workflow state
+            return {
+                "report": report,
+                "messages": [
                     {
                         "role": "assistant",
-                        "content": f"Generated comparison report for: {', '.join(protocol_names)}",
+                        "content": content,
                         "agent": self.name,
                     }
-                )
-
-            return {
-                **state,
-                "report": report,
-                "messages": messages,
+                ],
                 "current_agent": self.name,
                 "next_agent": None,  # End of workflow
                 "error": None,
@@ -337,15 +411,18 @@ class ReportAgent:
 
         except Exception as e:
             return {
-                **state,
                 "error": f"Report generation failed: {e}",
                 "current_agent": self.name,
                 "next_agent": None,
             }
 
+    def serialize(self, report: RiskReport | ComparisonReport) -> bytes:
+        """Serialize a report to JSON bytes using orjson."""
+        return orjson.dumps(report.model_dump(), option=orjson.OPT_UTC_Z)
+
     def format_report(self, report: RiskReport) -> str:
         """Format risk report as markdown."""
-        lines = [
+        header = (
             f"# DeFi Risk Report: {report.protocol.name}",
             "",
             f"_Generated: {report.generated_at.strftime('%Y-%m-%d %H:%M UTC')}_",
@@ -363,53 +440,71 @@ class ReportAgent:
             "---",
             "",
             "## Data Sources",
-        ]
-
-        for source in report.data_sources:
-            lines.append(f"- {source}")
-
-        lines.extend(
-            [
-                "",
-                "---",
-                "",
-                "*This report is generated algorithmically based on publicly available data. "
-                "It should not be considered financial advice. Always conduct independent "
-                "research before making investment decisions.*",
-            ]
         )
 
-        return "\n".join(lines)
+        if report.data_sources == self.data_sources:
+            sources = self._data_sources_md
+        else:
+            sources = "\n".join(f"- {source}" for source in report.data_sources)
+
+        return "\n".join(
+            itertools.chain(
+                header,
+                (sources,) if sources else (),
+                _REPORT_DISCLAIMER,
+            )
+        )
 
     def format_comparison_report(self, report: ComparisonReport) -> str:
         """Format comparison report as markdown."""
-        protocol_names = [p.name for p in report.protocols]
+        protocol_names = " vs ".join(p.name for p in report.protocols)
+
+        return "\n".join(
+            itertools.chain(
+                (
+                    f"# DeFi Risk Comparison: {protocol_names}",
+                    "",
+                    f"_Generated: {report.generated_at.strftime('%Y-%m-%d %H:%M UTC')}_",
+                    "",
+                    "---",
+                    "",
+                    report.comparison_summary,
+                    "",
+                    "---",
+                    "",
+                    "## Recommendation",
+                    "",
+                    report.recommendation,
+                ),
+                _COMPARISON_FOOTER,
+            )
+        )
+
+    def iter_report_sections(self, report: RiskReport | ComparisonReport) -> Iterator[str]:
+        """
+        Yield the formatted report one section at a time, split at its horizontal rules.
+
+        Each section after the first keeps its leading rule, so joining the sections
+        with newlines reproduces the full markdown.
+        """
+        if isinstance(report, ComparisonReport):
+            markdown = self.format_comparison_report(report)
+        else:
+            markdown = self.format_report(report)
+
+        first, *rest = markdown.split(_SECTION_BREAK)
+        yield first
+        for section in rest:
+            yield "---\n" + section
+
+
+# Singleton instance
+_report_agent: ReportAgent | None = None
 
-        lines = [
-            f"# DeFi Risk Comparison: {' vs '.join(protocol_names)}",
-            "",
-            f"_Generated: {report.generated_at.strftime('%Y-%m-%d %H:%M UTC')}_",
-            "",
-            "---",
-            "",
-            report.comparison_summary,
-            "",
-            "---",
-            "",
-            "## Recommendation",
-            "",
-            report.recommendation,
-            "",
-            "---",
-            "",
-            "## Data Sources",
-            "- DefiLlama API (https://defillama.com)",
-            "- On-chain TVL data aggregated across chains",
-            "",
-            "---",
-            "",
-            "*This report is generated algorithmically based on publicly available data. "
-            "It should not be considered financial advice.*",
-        ]
 
-        return "\n".join(lines)
+def get_report_agent() -> ReportAgent:
+    """Get or create ReportAgent singleton."""
+    global _report_agent
+    if _report_agent is None:
+        _report_agent = ReportAgent()
+    return _report_agent
@@ -1,10 +1,19 @@
 """Risk Agent - Analyzes protocol risk factors."""
 
+import asyncio
+from typing import Any
+
 from langchain_core.prompts import ChatPromptTemplate
 
+from src.concurrency import LoopSemaphore
 from src.models.schemas import AgentState, ProtocolData, RiskAssessment
 from src.tools.risk_metrics import RiskCalculator, get_calculator
 
+MAX_CONCURRENT_ASSESSMENTS = 8
+
+# Factors listed side by side in compare_assessments
+COMPARISON_FACTORS = ("TVL Risk", "Chain Concentration", "Audit Status", "Oracle Risk")
+
 RISK_AGENT_PROMPT = ChatPromptTemplate.from_messages(
     [
         (
@@ -34,9 +43,14 @@ When assessing risk:
 class RiskAgent:
     """Agent responsible for protocol risk analysis."""
 
-    def __init__(self, calculator: RiskCalculator | None = None) -> None:
+    def __init__(
+        self,
+        calculator: RiskCalculator | None = None,
+        max_concurrency: int = MAX_CONCURRENT_ASSESSMENTS,
+    ) -> None:
         self.calculator = calculator or get_calculator()
         self.name = "risk_agent"
+        self._sem = LoopSemaphore(max_concurrency)
 
     def assess_protocol(self, protocol: ProtocolData) -> RiskAssessment:
         """Perform risk assessment on a protocol."""
@@ -44,50 +58,55 @@ class RiskAgent:
 
     def assess_protocols(self, protocols: dict[str, ProtocolData]) -> dict[str, RiskAssessment]:
         """Assess multiple protocols."""
-        return {slug: self.assess_protocol(data) for slug, data in protocols.items()}
+        return dict(zip(protocols, self.calculator.assess_batch(list(protocols.values()))))
+
+    async def aassess_protocol(self, protocol: ProtocolData) -> RiskAssessment:
+        """Assess a protocol in a worker thread so the event loop stays free."""
+        async with self._sem:
+            return await asyncio.to_thread(self.assess_protocol, protocol)
+
+    async def aassess_protocols(
+        self, protocols: dict[str, ProtocolData]
+    ) -> dict[str, RiskAssessment]:
+        """Assess multiple protocols as one calculator batch in a worker thread."""
+        async with self._sem:
+            return await asyncio.to_thread(self.assess_protocols, protocols)
 
-    async def run(self, state: AgentState) -> AgentState:
+    async def run(self, state: AgentState) -> dict[str, Any]:
         """Execute risk analysis step in the workflow."""
         protocol_data = state.get("protocol_data", {})
 
         if not protocol_data:
             return {
-                **state,
                 "error": "No protocol data available for risk analysis",
                 "current_agent": self.name,
                 "next_agent": None,
             }
 
         try:
-            assessments = self.assess_protocols(protocol_data)
+            assessments = await self.aassess_protocols(protocol_data)
 
             # Add message about assessments
-            messages = state.get("messages", [])
             message_lines = ["Risk analysis complete:"]
 
-            for slug, assessment in assessments.items():
+            for assessment in assessments.values():
                 score = assessment.score
                 message_lines.append(
                     f"- {assessment.protocol_name}: {score.level.value.upper()} risk "
                     f"(score: {score.overall:.1f}/10)"
                 )
+                message_lines.extend(f"  ⚠️ {warning}" for warning in assessment.warnings[:2])
 
-                if assessment.warnings:
-                    for warning in assessment.warnings[:2]:
-                        message_lines.append(f"  ⚠️ {warning}")
-
-            messages.append(
-                {
-                    "role": "assistant",
-                    "content": "\n".join(message_lines),
-                    "agent": self.name,
-                }
-            )
-
+            # Return only the updated keys; LangGraph merges them into the workflow state
             return {
-                **state,
                 "risk_assessments": assessments,
-                "messages": messages,
+                "messages": [
+                    {
+                        "role": "assistant",
+                        "content": "\n".join(message_lines),
+                        "agent": self.name,
+                    }
+                ],
                 "current_agent": self.name,
                 "next_agent": "report_agent",
                 "error": None,
@@ -95,7 +114,6 @@ class RiskAgent:
 
         except Exception as e:
             return {
-                **state,
                 "error": f"Risk analysis failed: {e}",
                 "current_agent": self.name,
                 "next_agent": None,
@@ -103,16 +121,17 @@ class RiskAgent:
 
     def format_assessment(self, assessment: RiskAssessment) -> str:
         """Format risk assessment as human-readable report."""
+        score = assessment.score
         lines = [
             f"# Risk Assessment: {assessment.protocol_name}",
             "",
-            f"## Overall Risk: {assessment.score.level.value.upper()}",
-            f"**Score:** {assessment.score.overall:.1f}/10",
+            f"## Overall Risk: {score.level.value.upper()}",
+            f"**Score:** {score.overall:.1f}/10",
             "",
             "## Risk Factor Breakdown",
         ]
 
-        for factor in assessment.score.factors:
+        for factor in score.factors:
             lines.append(f"### {factor.name}")
             lines.append(f"**Score:** {factor.score:.1f}/10 (weight: {factor.weight:.0%})")
             lines.append(f"**Summary:** {factor.description}")
@@ -136,14 +155,12 @@ class RiskAgent:
 
         if assessment.warnings:
             lines.append("## ⚠️ Warnings")
-            for warning in assessment.warnings:
-                lines.append(f"- {warning}")
+            lines.extend(f"- {warning}" for warning in assessment.warnings)
             lines.append("")
 
         if assessment.recommendations:
             lines.append("## Recommendations")
-            for rec in assessment.recommendations:
-                lines.append(f"- {rec}")
+            lines.extend(f"- {rec}" for rec in assessment.recommendations)
             lines.append("")
 
         lines.append(
@@ -168,26 +185,26 @@ class RiskAgent:
             "## Risk Ranking (lowest to highest)",
         ]
 
-        for i, assessment in enumerate(sorted_assessments, 1):
-            lines.append(
-                f"{i}. **{assessment.protocol_name}**: "
-                f"{assessment.score.level.value.upper()} ({assessment.score.overall:.1f}/10)"
-            )
+        lines.extend(
+            f"{i}. **{a.protocol_name}**: {a.score.level.value.upper()} ({a.score.overall:.1f}/10)"
+            for i, a in enumerate(sorted_assessments, 1)
+        )
 
         lines.extend(["", "## Factor Comparison", ""])
 
-        # Compare each factor
-        factor_names = ["TVL Risk", "Chain Concentration", "Audit Status", "Oracle Risk"]
+        # Index each assessment's factors by name once, rather than scanning per factor
+        factors_by_protocol = [
+            (a.protocol_name, {f.name: f for f in a.score.factors}) for a in sorted_assessments
+        ]
 
-        for factor_name in factor_names:
+        # Compare each factor
+        for factor_name in COMPARISON_FACTORS:
             lines.append(f"### {factor_name}")
-            for assessment in sorted_assessments:
-                factor = next(
-                    (f for f in assessment.score.factors if f.name == factor_name),
-                    None,
-                )
-                if factor:
-                    lines.append(f"- {assessment.protocol_name}: {factor.score:.1f}/10")
+            lines.extend(
+                f"- {name}: {factor.score:.1f}/10"
+                for name, factors in factors_by_protocol
+                if (factor := factors.get(factor_name))
+            )
             lines.append("")
 
         # Recommendation
@@ -205,3 +222,15 @@ class RiskAgent:
         )
 
         return "\n".join(lines)
+
+
+# Singleton instance
+_risk_agent: RiskAgent | None = None
+
+
+def get_risk_agent() -> RiskAgent:
+    """Get or create RiskAgent singleton."""
+    global _risk_agent
+    if _risk_agent is None:
+        _risk_agent = RiskAgent()
+    return _risk_agent
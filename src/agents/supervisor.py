@@ -1,6 +1,7 @@
 """Supervisor Agent - Routes queries to appropriate specialist agents."""
 
-from typing import Literal
+import re
+from typing import Any, Literal
 
 from langchain_core.prompts import ChatPromptTemplate
 
@@ -33,6 +34,82 @@ For risk questions, route through the full workflow.
 )
 
 
+# Common DeFi protocols for matching
+KNOWN_PROTOCOLS = (
+    "aave",
+    "compound",
+    "makerdao",
+    "maker",
+    "uniswap",
+    "curve",
+    "lido",
+    "rocket pool",
+    "rocketpool",
+    "convex",
+    "yearn",
+    "balancer",
+    "sushiswap",
+    "pancakeswap",
+    "gmx",
+    "dydx",
+    "morpho",
+    "euler",
+    "venus",
+    "benqi",
+    "traderjoe",
+    "instadapp",
+    "radiant",
+    "spark",
+    "frax",
+    "eigenlayer",
+    "ronin",
+    "cream",
+)
+
+# Known name -> normalized protocol identifier
+_PROTOCOL_ALIASES = {name: name.replace(" ", "-") for name in KNOWN_PROTOCOLS}
+
+# One alternation over all known names, longest first so e.g. "makerdao" wins over "maker"
+_PROTOCOL_PATTERN = re.compile(
+    "|".join(re.escape(name) for name in sorted(KNOWN_PROTOCOLS, key=len, reverse=True))
+)
+
+# Intent keywords matched against whole query tokens, checked in priority order.
+# Common inflections are listed explicitly since tokens must match exactly.
+_INTENT_COMPARE = frozenset({"compare", "compared", "comparing", "vs", "versus", "difference"})
+_INTENT_ANALYZE = frozenset(
+    {"analyze", "analyzed", "risk", "risks", "risky", "assess", "assessment", "report", "reports"}
+)
+_INTENT_DATA = frozenset({"data", "tvl", "info", "fetch"})
+
+_WORD_PATTERN = re.compile(r"[a-z]+")
+
+# Whole whitespace-delimited words of 2+ letters, ignoring surrounding punctuation;
+# words with digits or other symbols inside (e.g. "foo_bar123") are not candidates
+_CANDIDATE_PATTERN = re.compile(r"(?<!\S)[,.!?]*([^\W\d_]{2,})[,.!?]*(?!\S)")
+
+# Words never treated as protocol names by the fallback extractor
+_STOPWORDS = frozenset(
+    {
+        "analyze",
+        "compare",
+        "risk",
+        "report",
+        "the",
+        "and",
+        "vs",
+        "versus",
+        "with",
+        "for",
+        "of",
+        "to",
+        "a",
+        "an",
+        "protocol",
+    }
+)
+
+
 AgentName = Literal["data_agent", "risk_agent", "report_agent", "supervisor"]
 
 
@@ -46,86 +123,33 @@ class SupervisorAgent:
         """Parse user query to determine intent and extract protocol names."""
         query_lower = query.lower()
 
-        # Determine intent
-        if any(word in query_lower for word in ["compare", "vs", "versus", "difference"]):
+        # Determine intent from the query's tokens
+        tokens = set(_WORD_PATTERN.findall(query_lower))
+        if tokens & _INTENT_COMPARE:
             intent = "compare"
-        elif any(word in query_lower for word in ["analyze", "risk", "assess", "report"]):
+        elif tokens & _INTENT_ANALYZE:
             intent = "analyze"
-        elif any(word in query_lower for word in ["data", "tvl", "info", "fetch"]):
+        elif tokens & _INTENT_DATA:
             intent = "data"
         else:
             intent = "analyze"  # Default to full analysis
 
-        # Extract protocol names (simple heuristic)
-        # Common DeFi protocols for matching
-        known_protocols = [
-            "aave",
-            "compound",
-            "makerdao",
-            "maker",
-            "uniswap",
-            "curve",
-            "lido",
-            "rocket pool",
-            "rocketpool",
-            "convex",
-            "yearn",
-            "balancer",
-            "sushiswap",
-            "pancakeswap",
-            "gmx",
-            "dydx",
-            "morpho",
-            "euler",
-            "venus",
-            "benqi",
-            "traderjoe",
-            "instadapp",
-            "radiant",
-            "spark",
-            "frax",
-            "eigenlayer",
-            "ronin",
-            "cream",
-        ]
-
-        protocols = []
-        for protocol in known_protocols:
-            if protocol in query_lower:
-                # Normalize name
-                normalized = protocol.replace(" ", "-")
-                if normalized not in protocols:
-                    protocols.append(normalized)
+        # Extract protocol names in a single pass over the query, in order of appearance;
+        # dict keys dedupe in O(1) while keeping first-seen order
+        protocols = dict.fromkeys(
+            _PROTOCOL_ALIASES[match.group()] for match in _PROTOCOL_PATTERN.finditer(query_lower)
+        )
 
         # If no known protocols found, try to extract words that might be protocol names
         if not protocols:
-            # Simple extraction: look for capitalized words or words after "analyze/compare"
-            words = query.split()
-            for i, word in enumerate(words):
-                clean_word = word.strip(",.!?").lower()
-                if clean_word and clean_word not in [
-                    "analyze",
-                    "compare",
-                    "risk",
-                    "report",
-                    "the",
-                    "and",
-                    "vs",
-                    "versus",
-                    "with",
-                    "for",
-                    "of",
-                    "to",
-                    "a",
-                    "an",
-                    "protocol",
-                ]:
-                    if len(clean_word) >= 2 and clean_word.isalpha():
-                        protocols.append(clean_word)
-                        if len(protocols) >= 5:  # Max 5 protocols
-                            break
-
-        return intent, protocols[:5]  # Limit to 5 protocols
+            # Simple extraction: alphabetic words of the query that are not stopwords
+            for word in _CANDIDATE_PATTERN.findall(query_lower):
+                if word not in _STOPWORDS:
+                    protocols[word] = None
+                    if len(protocols) >= 5:  # Max 5 protocols
+                        break
+
+        return intent, list(protocols)[:5]  # Limit to 5 protocols
 
     def determine_first_agent(self, intent: str) -> AgentName:
         """Determine which agent should handle the query first."""
@@ -148,13 +172,12 @@ class SupervisorAgent:
 
         return None
 
-    async def run(self, state: AgentState) -> AgentState:
+    async def run(self, state: AgentState) -> dict[str, Any]:
         """Process query and initialize workflow."""
         query = state.get("query", "")
 
         if not query:
             return {
-                **state,
                 "error": "No query provided",
                 "current_agent": self.name,
                 "next_agent": None,
@@ -169,7 +192,6 @@ class SupervisorAgent:
                 "Please specify a protocol name (e.g., 'analyze aave')"
             )
             return {
-                **state,
                 "error": error_msg,
                 "current_agent": self.name,
                 "next_agent": None,
@@ -178,20 +200,29 @@ class SupervisorAgent:
         # Initialize workflow
         first_agent = self.determine_first_agent(intent)
 
-        messages = state.get("messages", [])
-        messages.append(
-            {
-                "role": "assistant",
-                "content": f"Starting {intent} workflow for: {', '.join(protocols)}",
-                "agent": self.name,
-            }
-        )
-
+        # Return only the updated keys; LangGraph merges them into the workflow state
         return {
-            **state,
             "protocol_names": protocols,
-            "messages": messages,
+            "messages": [
+                {
+                    "role": "assistant",
+                    "content": f"Starting {intent} workflow for: {', '.join(protocols)}",
+                    "agent": self.name,
+                }
+            ],
             "current_agent": self.name,
             "next_agent": first_agent,
             "error": None,
         }
+
+
+# Singleton instance
+_supervisor: SupervisorAgent | None = None
+
+
+def get_supervisor() -> SupervisorAgent:
+    """Get or create SupervisorAgent singleton."""
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = SupervisorAgent()
+    return _supervisor
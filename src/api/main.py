@@ -1,13 +1,20 @@
 """FastAPI application for DeFi risk analysis."""
 
+import asyncio
+import time
+from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
-from datetime import datetime
+from datetime import UTC, datetime
 from typing import Any
 
+import orjson
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
 from src.graph.workflow import DeFiRiskWorkflow
+from src.http import aclose as close_http_client
 from src.models.schemas import (
     AnalyzeRequest,
     CompareRequest,
@@ -15,10 +22,81 @@ from src.models.schemas import (
     HealthResponse,
     RiskReport,
 )
+from src.tools.defillama import top_protocols_by_tvl
 
 # Global workflow instance
 workflow: DeFiRiskWorkflow | None = None
 
+# Protocol list cache for /protocols: (fetched_at monotonic seconds, protocols)
+PROTOCOLS_CACHE_TTL = 900.0  # 15 minutes
+_protocols_cache: tuple[float, list[dict[str, Any]]] | None = None
+_protocols_lock = asyncio.Lock()
+
+
+async def _cached_protocols() -> list[dict[str, Any]]:
+    """Return the DefiLlama protocol list, refetching at most once per TTL window."""
+    global _protocols_cache
+    from src.tools.defillama import get_client
+
+    if _protocols_cache and time.monotonic() - _protocols_cache[0] < PROTOCOLS_CACHE_TTL:
+        return _protocols_cache[1]
+
+    # Single-flight: concurrent misses wait for one fetch instead of each hitting the API
+    async with _protocols_lock:
+        if _protocols_cache and time.monotonic() - _protocols_cache[0] < PROTOCOLS_CACHE_TTL:
+            return _protocols_cache[1]
+
+        protocols = await get_client().get_protocols()
+        _protocols_cache = (time.monotonic(), protocols)
+        return protocols
+
+
+# Finished /analyze reports keyed by lowercased protocol: (cached_at monotonic seconds, report)
+REPORT_CACHE_TTL = 600.0  # 10 minutes
+_report_cache: dict[str, tuple[float, RiskReport]] = {}
+# Workflow runs in progress, so concurrent cold requests for one protocol share a single run
+_report_inflight: dict[str, asyncio.Future[RiskReport | None]] = {}
+
+
+async def _cached_report(workflow: DeFiRiskWorkflow, protocol: str) -> RiskReport | None:
+    """Return a recent report for a protocol, running the workflow at most once per key."""
+    key = protocol.lower()
+
+    while True:
+        cached = _report_cache.get(key)
+        if cached and time.monotonic() - cached[0] < REPORT_CACHE_TTL:
+            return cached[1]
+
+        inflight = _report_inflight.get(key)
+        if inflight is None:
+            break
+
+        try:
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            # Retry only if the leading run was cancelled, not this request
+            if not inflight.cancelled():
+                raise
+
+    future: asyncio.Future[RiskReport | None] = asyncio.get_running_loop().create_future()
+    _report_inflight[key] = future
+    try:
+        report = await workflow.analyze(protocol)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved in case nobody else was waiting
+        raise
+    else:
+        if report is not None:
+            _report_cache[key] = (time.monotonic(), report)
+        future.set_result(report)
+        return report
+    finally:
+        _report_inflight.pop(key, None)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -27,6 +105,7 @@ async def lifespan(app: FastAPI):
     workflow = DeFiRiskWorkflow()
     yield
     workflow = None
+    await close_http_client()
 
 
 app = FastAPI(
@@ -46,14 +125,14 @@ app.add_middleware(
 )
 
 
+# Fields of /health that never change; only the timestamp is stamped per call
+_HEALTH_STATIC = {"status": "healthy", "version": "0.1.0"}
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check() -> HealthResponse:
     """Health check endpoint."""
-    return HealthResponse(
-        status="healthy",
-        version="0.1.0",
-        timestamp=datetime.utcnow(),
-    )
+    return HealthResponse(**_HEALTH_STATIC, timestamp=datetime.now(UTC))
 
 
 @app.post("/analyze/{protocol}", response_model=RiskReport)
@@ -71,7 +150,7 @@ async def analyze_protocol(protocol: str) -> RiskReport:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
     try:
-        report = await workflow.analyze(protocol)
+        report = await _cached_report(workflow, protocol)
         if report is None:
             raise HTTPException(status_code=500, detail="Failed to generate report")
         return report
@@ -126,6 +205,34 @@ async def compare_protocols(request: CompareRequest) -> ComparisonReport:
         raise HTTPException(status_code=500, detail=f"Comparison failed: {e}")
 
 
+def _query_result(state: dict[str, Any]) -> dict[str, Any]:
+    """Summarize a finished workflow state for /query responses."""
+    result: dict[str, Any] = {
+        "query": state.get("query"),
+        "protocols_analyzed": state.get("protocol_names", []),
+        "error": state.get("error"),
+    }
+
+    # Include report if available
+    # (kept as a model; FastAPI serializes it in the same pass as the response)
+    report = state.get("report")
+    if report:
+        if isinstance(report, RiskReport):
+            result["report_type"] = "risk_report"
+            result["report"] = report
+        elif isinstance(report, ComparisonReport):
+            result["report_type"] = "comparison_report"
+            result["report"] = report
+
+    return result
+
+
+def _sse_event(event: str, data: dict[str, Any]) -> bytes:
+    """Encode one server-sent event."""
+    payload = orjson.dumps(data, default=BaseModel.model_dump, option=orjson.OPT_UTC_Z)
+    return b"event: " + event.encode() + b"\ndata: " + payload + b"\n\n"
+
+
 @app.post("/query")
 async def run_query(query: str) -> dict[str, Any]:
     """
@@ -141,34 +248,19 @@ async def run_query(query: str) -> dict[str, Any]:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
     try:
-        result = await workflow.run_query(query)
-
-        if result.get("error"):
-            raise HTTPException(status_code=400, detail=result["error"])
-
-        # Serialize the response
-        response: dict[str, Any] = {
-            "query": result.get("query"),
-            "protocols_analyzed": result.get("protocol_names", []),
-            "error": result.get("error"),
-        }
-
-        # Include report if available
-        report = result.get("report")
-        if report:
-            if isinstance(report, RiskReport):
-                response["report_type"] = "risk_report"
-                response["report"] = report.model_dump()
-            elif isinstance(report, ComparisonReport):
-                response["report_type"] = "comparison_report"
-                response["report"] = report.model_dump()
-
-        # Include agent messages
-        messages = result.get("messages", [])
-        response["agent_messages"] = [
-            {"agent": m.get("agent"), "content": m.get("content")} for m in messages
-        ]
-
+        agent_messages: list[dict[str, Any]] = []
+        state: dict[str, Any] = {}
+        async for kind, payload in workflow.astream_query(query):
+            if kind == "message":
+                agent_messages.append(payload)
+            else:
+                state = payload
+
+        if state.get("error"):
+            raise HTTPException(status_code=400, detail=state["error"])
+
+        response = _query_result(state)
+        response["agent_messages"] = agent_messages
         return response
 
     except HTTPException:
@@ -177,6 +269,35 @@ async def run_query(query: str) -> dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Query failed: {e}")
 
 
+@app.post("/query/stream")
+async def stream_query(query: str) -> StreamingResponse:
+    """
+    Run a natural language query, streaming progress as server-sent events.
+
+    Args:
+        query: Natural language query
+
+    Returns:
+        An event stream with one "message" event per agent step, then a
+        "result" event shaped like the /query response (without agent_messages),
+        or an "error" event if the workflow fails
+    """
+    if workflow is None:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async for kind, payload in workflow.astream_query(query):
+                if kind == "message":
+                    yield _sse_event("message", payload)
+                else:
+                    yield _sse_event("result", _query_result(payload))
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Query failed: {e}"})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 @app.get("/protocols")
 async def list_protocols(limit: int = 50) -> list[dict[str, Any]]:
     """
@@ -188,20 +309,12 @@ async def list_protocols(limit: int = 50) -> list[dict[str, Any]]:
     Returns:
         List of protocols with basic info
     """
-    from src.tools.defillama import get_client
-
     limit = min(limit, 200)
-    client = get_client()
 
     try:
-        all_protocols = await client.get_protocols()
-
-        # Sort by TVL
-        sorted_protocols = sorted(
-            all_protocols,
-            key=lambda p: p.get("tvl", 0) or 0,
-            reverse=True,
-        )[:limit]
+        all_protocols = await _cached_protocols()
+
+        sorted_protocols = top_protocols_by_tvl(all_protocols, limit)
 
         # Return simplified data
         return [
@@ -1,38 +1,104 @@
 """CLI interface for DeFi risk analysis."""
 
 import asyncio
-from typing import Annotated
+from collections.abc import Coroutine, Iterable
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Annotated, Any, Protocol, TypeVar
 
+import orjson
 import typer
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
-from src.graph.workflow import DeFiRiskWorkflow
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+    from src.graph.workflow import DeFiRiskWorkflow
+    from src.models.schemas import ProtocolData, RiskAssessment
+
+T = TypeVar("T")
+
+
+class _LoopRunner(Protocol):
+    """Runs a coroutine to completion on a fresh event loop, like ``asyncio.run``."""
+
+    def __call__(self, main: Coroutine[Any, Any, T], /) -> T: ...
+
+
+run_loop: _LoopRunner
+try:
+    from uvloop import run as run_loop
+except ImportError:  # uvloop is unavailable on Windows
+    from asyncio import run as run_loop
 
 app = typer.Typer(
     name="defi-risk",
     help="DeFi Protocol Risk Analysis Agent",
     add_completion=False,
+    rich_markup_mode=None,
 )
 console = Console()
 
 
-def run_async(coro):
-    """Run async function in sync context."""
+def dump_json(report: "BaseModel") -> str:
+    """Render a report as indented JSON."""
+    return orjson.dumps(report.model_dump(), option=orjson.OPT_INDENT_2 | orjson.OPT_UTC_Z).decode()
+
+
+async def _closing_http(coro: Coroutine[Any, Any, T]) -> T:
+    """Await a command, then close the pooled HTTP connections it opened."""
     try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        loop = None
+        return await coro
+    finally:
+        from src.http import aclose
 
-    if loop is None:
-        return asyncio.run(coro)
-    else:
-        return loop.run_until_complete(coro)
+        await aclose()
 
 
-def get_llm_analysis(protocol_data, assessment, compare_mode=False, all_data=None):
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a command coroutine on a fresh event loop."""
+    return run_loop(_closing_http(coro))
+
+
+def spinner(disable: bool = False) -> Progress:
+    """Create the status spinner shown while a command waits on I/O."""
+    # Transient so it leaves no residue; callers exit it before rendering output
+    return Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=console,
+        transient=True,
+        refresh_per_second=10,
+        disable=disable,
+    )
+
+
+def print_markdown(sections: Iterable[str]) -> None:
+    """Render markdown section by section so output starts before the whole report is parsed."""
+    for i, section in enumerate(sections):
+        if i:
+            # Blank line that a single Markdown render would put before each rule
+            console.print()
+        console.print(Markdown(section))
+
+
+@lru_cache(maxsize=1)
+def get_workflow() -> "DeFiRiskWorkflow":
+    """Get the shared workflow, compiling the graph on first use."""
+    # Imported here so commands that never run the graph skip loading LangGraph and agents
+    from src.graph.workflow import DeFiRiskWorkflow
+
+    return DeFiRiskWorkflow()
+
+
+def get_llm_analysis(
+    protocol_data: "ProtocolData | None",
+    assessment: "RiskAssessment | None",
+    compare_mode: bool = False,
+    all_data: "tuple[list[ProtocolData], list[RiskAssessment]] | None" = None,
+) -> str:
     """Get LLM-powered analysis if available."""
     try:
         from src.agents.llm_analyst import LLMAnalyst
@@ -42,6 +108,8 @@ def get_llm_analysis(protocol_data, assessment, compare_mode=False, all_data=Non
         if compare_mode and all_data:
             protocols, assessments = all_data
             return analyst.compare(protocols, assessments)
+        elif protocol_data is None or assessment is None:
+            raise ValueError("Single-protocol analysis needs protocol data and an assessment")
         else:
             return analyst.analyze(protocol_data, assessment)
     except RuntimeError as e:
@@ -50,6 +118,14 @@ def get_llm_analysis(protocol_data, assessment, compare_mode=False, all_data=Non
         return f"[LLM analysis failed: {e}]"
 
 
+def start_llm_analysis(*args: Any, **kwargs: Any) -> asyncio.Future[str]:
+    """Run get_llm_analysis in a worker thread so it overlaps report rendering."""
+    # run_in_executor submits right away, before the caller next yields to the loop
+    return asyncio.get_running_loop().run_in_executor(
+        None, partial(get_llm_analysis, *args, **kwargs)
+    )
+
+
 @app.command()
 def analyze(
     protocol: Annotated[
@@ -68,17 +144,18 @@ def analyze(
         defi-risk analyze aave --llm      # With AI insights
         defi-risk analyze compound --json
     """
-    workflow = DeFiRiskWorkflow()
+    run_async(_analyze(protocol, json_output, llm))
 
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
+
+async def _analyze(protocol: str, json_output: bool, llm: bool) -> None:
+    """Run the analyze command."""
+    workflow = get_workflow()
+
+    with spinner(disable=json_output) as progress:
         task = progress.add_task(f"Analyzing {protocol}...", total=None)
 
         try:
-            report = run_async(workflow.analyze(protocol))
+            report = await workflow.analyze(protocol)
         except RuntimeError as e:
             console.print(f"[red]Error:[/red] {e}")
             raise typer.Exit(1)
@@ -90,21 +167,20 @@ def analyze(
         raise typer.Exit(1)
 
     if json_output:
-        console.print(report.model_dump_json(indent=2))
+        console.out(dump_json(report), highlight=False)
     else:
-        formatted = workflow.format_report(report)
-        console.print(Markdown(formatted))
+        # Start the LLM request before rendering so its latency overlaps formatting
+        if llm:
+            llm_future = start_llm_analysis(report.protocol, report.assessment)
+
+        print_markdown(workflow.iter_format_report(report))
 
         if llm:
             console.print()
             console.print(Panel("AI Analysis", style="cyan"))
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                console=console,
-            ) as progress:
+            with spinner() as progress:
                 task = progress.add_task("Generating AI insights...", total=None)
-                llm_output = get_llm_analysis(report.protocol, report.assessment)
+                llm_output = await llm_future
                 progress.update(task, completed=True)
 
             console.print(Markdown(llm_output))
@@ -137,18 +213,19 @@ def compare(
         console.print("[red]Error:[/red] Maximum 5 protocols can be compared at once")
         raise typer.Exit(1)
 
-    workflow = DeFiRiskWorkflow()
+    run_async(_compare(protocols, json_output, llm))
 
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
+
+async def _compare(protocols: list[str], json_output: bool, llm: bool) -> None:
+    """Run the compare command."""
+    workflow = get_workflow()
+
+    with spinner(disable=json_output) as progress:
         protocol_list = ", ".join(protocols)
         task = progress.add_task(f"Comparing {protocol_list}...", total=None)
 
         try:
-            report = run_async(workflow.compare(protocols))
+            report = await workflow.compare(protocols)
         except RuntimeError as e:
             console.print(f"[red]Error:[/red] {e}")
             raise typer.Exit(1)
@@ -160,26 +237,25 @@ def compare(
         raise typer.Exit(1)
 
     if json_output:
-        console.print(report.model_dump_json(indent=2))
+        console.out(dump_json(report), highlight=False)
     else:
-        formatted = workflow.format_report(report)
-        console.print(Markdown(formatted))
+        # Start the LLM request before rendering so its latency overlaps formatting
+        if llm:
+            llm_future = start_llm_analysis(
+                None,
+                None,
+                compare_mode=True,
+                all_data=(report.protocols, report.assessments),
+            )
+
+        print_markdown(workflow.iter_format_report(report))
 
         if llm:
             console.print()
             console.print(Panel("AI Comparison Analysis", style="cyan"))
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                console=console,
-            ) as progress:
+            with spinner() as progress:
                 task = progress.add_task("Generating AI insights...", total=None)
-                llm_output = get_llm_analysis(
-                    None,
-                    None,
-                    compare_mode=True,
-                    all_data=(report.protocols, report.assessments),
-                )
+                llm_output = await llm_future
                 progress.update(task, completed=True)
 
             console.print(Markdown(llm_output))
@@ -196,17 +272,20 @@ def query(
         defi-risk query "What is the risk profile of Aave?"
         defi-risk query "Compare Uniswap and Curve"
     """
-    workflow = DeFiRiskWorkflow()
+    run_async(_query(text))
 
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
+
+async def _query(text: str) -> None:
+    """Run the query command."""
+    from src.graph.workflow import agent_message
+
+    workflow = get_workflow()
+
+    with spinner() as progress:
         task = progress.add_task("Processing query...", total=None)
 
         try:
-            result = run_async(workflow.run_query(text))
+            result = await workflow.run_query(text)
         except Exception as e:
             console.print(f"[red]Error:[/red] {e}")
             raise typer.Exit(1)
@@ -219,14 +298,12 @@ def query(
 
     report = result.get("report")
     if report:
-        formatted = workflow.format_report(report)
-        console.print(Markdown(formatted))
+        print_markdown(workflow.iter_format_report(report))
     else:
         console.print(Panel("Agent Responses", style="blue"))
         for msg in result.get("messages", []):
-            agent = msg.get("agent", "unknown")
-            content = msg.get("content", "")
-            console.print(f"[bold]{agent}:[/bold] {content}")
+            message = agent_message(msg)
+            console.print(f"[bold]{message['agent'] or 'unknown'}:[/bold] {message['content']}")
 
 
 @app.command()
@@ -237,30 +314,27 @@ def protocols() -> None:
     Example:
         defi-risk protocols
     """
-    from src.tools.defillama import get_client
+    run_async(_protocols())
+
+
+async def _protocols() -> None:
+    """Run the protocols command."""
+    from src.tools.defillama import get_client, top_protocols_by_tvl
 
     client = get_client()
 
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
+    with spinner() as progress:
         task = progress.add_task("Fetching protocols...", total=None)
 
         try:
-            all_protocols = run_async(client.get_protocols())
+            all_protocols = await client.get_protocols()
         except Exception as e:
             console.print(f"[red]Error:[/red] {e}")
             raise typer.Exit(1)
 
         progress.update(task, completed=True)
 
-    sorted_protocols = sorted(
-        all_protocols,
-        key=lambda p: p.get("tvl", 0) or 0,
-        reverse=True,
-    )[:50]
+    sorted_protocols = top_protocols_by_tvl(all_protocols, 50)
 
     console.print(Panel("Top 50 DeFi Protocols by TVL", style="blue"))
     console.print()
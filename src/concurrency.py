@@ -0,0 +1,40 @@
+"""Concurrency limits that are safe to share across event loops."""
+
+import asyncio
+from types import TracebackType
+
+
+class LoopSemaphore:
+    """
+    A semaphore limit applied separately within each running event loop.
+
+    ``asyncio.Semaphore`` binds to the first loop that waits on it, so a limit
+    held by a process-wide object (e.g. the shared agents, used by one
+    ``asyncio.run`` per CLI command) keeps one semaphore per loop instead.
+    """
+
+    def __init__(self, value: int) -> None:
+        self._value = value
+        self._semaphores: dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """Get or create the semaphore for the running event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            # Forget semaphores of loops that have closed
+            for closed in [other for other in self._semaphores if other.is_closed()]:
+                self._semaphores.pop(closed, None)
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self._value)
+        return semaphore
+
+    async def __aenter__(self) -> None:
+        await self._semaphore().acquire()
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self._semaphore().release()
@@ -1,23 +1,26 @@
 """LangGraph workflow definition for DeFi risk analysis."""
 
-from collections.abc import Sequence
-from typing import Annotated, Any
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from typing import Annotated, Any, cast
 
 from langchain_core.messages import BaseMessage
 from langgraph.graph import END, StateGraph
 from langgraph.graph.message import add_messages
+from langgraph.graph.state import CompiledStateGraph
+from pydantic import BaseModel
 from typing_extensions import TypedDict
 
-from src.agents.data_agent import DataAgent
-from src.agents.report_agent import ReportAgent
-from src.agents.risk_agent import RiskAgent
-from src.agents.supervisor import SupervisorAgent
+from src.agents.data_agent import get_data_agent
+from src.agents.report_agent import get_report_agent
+from src.agents.risk_agent import get_risk_agent
+from src.agents.supervisor import get_supervisor
 from src.models.schemas import (
     ComparisonReport,
     ProtocolData,
     RiskAssessment,
     RiskReport,
 )
+from src.tools.defillama import DefiLlamaError
 
 
 class WorkflowState(TypedDict):
@@ -49,6 +52,13 @@ def create_initial_state(query: str) -> dict[str, Any]:
     }
 
 
+def agent_message(message: BaseMessage | dict[str, Any]) -> dict[str, Any]:
+    """Return the agent name and content of a workflow message."""
+    if isinstance(message, BaseMessage):
+        return {"agent": message.additional_kwargs.get("agent"), "content": message.content}
+    return {"agent": message.get("agent"), "content": message.get("content")}
+
+
 def route_next_agent(state: WorkflowState) -> str:
     """Route to next agent based on state."""
     if state.get("error"):
@@ -66,10 +76,10 @@ def create_workflow() -> StateGraph:
     """Create the LangGraph workflow for DeFi risk analysis."""
 
     # Initialize agents
-    supervisor = SupervisorAgent()
-    data_agent = DataAgent()
-    risk_agent = RiskAgent()
-    report_agent = ReportAgent()
+    supervisor = get_supervisor()
+    data_agent = get_data_agent()
+    risk_agent = get_risk_agent()
+    report_agent = get_report_agent()
 
     # Create graph
     workflow = StateGraph(WorkflowState)
@@ -122,22 +132,72 @@ def create_workflow() -> StateGraph:
     return workflow
 
 
-def compile_workflow():
+# Compiled workflow graph; inputs and outputs are plain state dicts (see create_initial_state)
+WorkflowApp = CompiledStateGraph[WorkflowState, None, Any, Any]
+
+
+def compile_workflow() -> WorkflowApp:
     """Compile the workflow for execution."""
     workflow = create_workflow()
     return workflow.compile()
 
 
+# Singleton instance
+_compiled_workflow: WorkflowApp | None = None
+
+
+def get_compiled_workflow() -> WorkflowApp:
+    """Get or compile the shared workflow app."""
+    global _compiled_workflow
+    if _compiled_workflow is None:
+        _compiled_workflow = compile_workflow()
+    return _compiled_workflow
+
+
 class DeFiRiskWorkflow:
     """High-level interface for running DeFi risk analysis workflows."""
 
-    def __init__(self) -> None:
-        self.app = compile_workflow()
-        self.report_agent = ReportAgent()
+    def __init__(self, app: WorkflowApp | None = None) -> None:
+        self.app = app or get_compiled_workflow()
+        self.report_agent = get_report_agent()
+        # Report type -> markdown formatter; other values are rendered with str()
+        self._formatters: dict[type[BaseModel], Callable[[Any], str]] = {
+            RiskReport: self.report_agent.format_report,
+            ComparisonReport: self.report_agent.format_comparison_report,
+        }
 
     async def analyze(self, protocol: str) -> RiskReport | None:
-        """Analyze a single protocol and return risk report."""
-        initial_state = create_initial_state(f"analyze {protocol}")
+        """
+        Analyze a single protocol and return risk report.
+
+        When the query names exactly one protocol the graph can only run
+        data -> risk -> report, so those steps are called directly, skipping the
+        per-node scheduling and state merges. Anything else goes through the graph.
+        """
+        query = f"analyze {protocol}"
+        _, names = get_supervisor().parse_query(query)
+        if len(names) != 1:
+            return await self._analyze_with_graph(query)
+
+        try:
+            # Fetched as a batch of one so failures read exactly as the data node reports them
+            (protocol_data,) = (await get_data_agent().fetch_protocols(names)).values()
+        except DefiLlamaError as e:
+            raise RuntimeError(str(e)) from e
+
+        try:
+            assessment = await get_risk_agent().aassess_protocol(protocol_data)
+        except Exception as e:
+            raise RuntimeError(f"Risk analysis failed: {e}") from e
+
+        try:
+            return get_report_agent().generate_report(protocol_data, assessment)
+        except Exception as e:
+            raise RuntimeError(f"Report generation failed: {e}") from e
+
+    async def _analyze_with_graph(self, query: str) -> RiskReport | None:
+        """Run an analyze query through the full workflow graph."""
+        initial_state = create_initial_state(query)
         result = await self.app.ainvoke(initial_state)
 
         if result.get("error"):
@@ -169,11 +229,35 @@ class DeFiRiskWorkflow:
         initial_state = create_initial_state(query)
         return await self.app.ainvoke(initial_state)
 
+    async def astream_query(self, query: str) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+        """
+        Run arbitrary query through the workflow, yielding progress as it happens.
+
+        Yields ("message", {"agent", "content"}) as each agent step completes,
+        then ("state", final_state) once the workflow has finished.
+        """
+        initial_state = create_initial_state(query)
+        final_state: dict[str, Any] = initial_state
+
+        async for mode, chunk in self.app.astream(initial_state, stream_mode=["updates", "values"]):
+            if mode == "values":
+                # The full state after each step
+                final_state = cast(dict[str, Any], chunk)
+                continue
+
+            # "updates": each node that ran, mapped to the keys it returned
+            for update in cast(dict[str, dict[str, Any] | None], chunk).values():
+                for message in (update or {}).get("messages", []):
+                    yield "message", agent_message(message)
+
+        yield "state", final_state
+
     def format_report(self, report: RiskReport | ComparisonReport) -> str:
         """Format report as markdown string."""
-        if isinstance(report, RiskReport):
-            return self.report_agent.format_report(report)
-        elif isinstance(report, ComparisonReport):
-            return self.report_agent.format_comparison_report(report)
-        else:
-            return str(report)
+        return self._formatters.get(type(report), str)(report)
+
+    def iter_format_report(self, report: RiskReport | ComparisonReport) -> Iterator[str]:
+        """Format report as markdown, one section at a time."""
+        if type(report) in self._formatters:
+            return self.report_agent.iter_report_sections(report)
+        return iter((str(report),))
@@ -0,0 +1,85 @@
+"""Shared HTTP clients so connections are pooled across the application."""
+
+import asyncio
+import random
+from typing import Any
+
+import httpx
+
+LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+# Rate limits and transient gateway/server errors are retried with exponential backoff
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 1.0  # Seconds before the first retry; doubles on each attempt
+RETRY_MAX_DELAY = 8.0
+
+# Backoff sleeps go through this alias so tests can skip them without patching asyncio
+_sleep = asyncio.sleep
+
+_client: httpx.Client | None = None
+# Pooled connections belong to the loop that opened them, so each loop gets its own client
+_async_clients: dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+
+def client() -> httpx.Client:
+    """Get or create the shared synchronous HTTP client."""
+    global _client
+    if _client is None:
+        _client = httpx.Client(http2=True, limits=LIMITS)
+    return _client
+
+
+def async_client() -> httpx.AsyncClient:
+    """
+    Get or create the shared asynchronous HTTP client for the running event loop.
+
+    Each loop (e.g. one ``asyncio.run`` per CLI command) gets its own client,
+    which ``aclose`` must close before the loop ends; a client can't be closed
+    from another loop once its own has closed.
+    """
+    loop = asyncio.get_running_loop()
+    shared = _async_clients.get(loop)
+    if shared is None:
+        # Forget clients of loops that closed without aclose; they can no longer be closed
+        for closed in [other for other in _async_clients if other.is_closed()]:
+            _async_clients.pop(closed, None)
+        shared = _async_clients[loop] = httpx.AsyncClient(http2=True, limits=LIMITS)
+    return shared
+
+
+async def aclose() -> None:
+    """Close the running event loop's shared asynchronous client, if one is open."""
+    shared = _async_clients.pop(asyncio.get_running_loop(), None)
+    if shared is not None:
+        await shared.aclose()
+
+
+def _retry_delay(response: httpx.Response | None, attempt: int) -> float:
+    """Seconds to wait before retrying, honoring a numeric Retry-After header."""
+    headers = response.headers if response is not None else {}
+    try:
+        delay = float(headers["Retry-After"])
+    except (KeyError, ValueError):
+        delay = RETRY_BASE_DELAY * 2**attempt + random.random() * 0.1
+    return min(max(delay, 0.0), RETRY_MAX_DELAY)
+
+
+async def get_with_retry(client: httpx.AsyncClient, url: str, **kwargs: Any) -> httpx.Response:
+    """
+    GET a URL, retrying rate-limited, transient server error and transport failures.
+
+    The final response is returned whatever its status, so callers still
+    decide how to surface errors with ``raise_for_status``; a transport error
+    (connection failure, timeout) on the final attempt is raised.
+    """
+    for attempt in range(RETRY_ATTEMPTS - 1):
+        response = None
+        try:
+            response = await client.get(url, **kwargs)
+        except httpx.TransportError:
+            pass  # Retried like a transient server error
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            return response
+        await _sleep(_retry_delay(response, attempt))
+    return await client.get(url, **kwargs)
@@ -1,12 +1,15 @@
 """LLM provider configuration with Ollama as default."""
 
 import os
+import time
 from dataclasses import dataclass
 from enum import Enum
 
 import httpx
 from langchain_core.language_models import BaseChatModel
 
+from src.http import client as http_client
+
 
 class LLMProvider(str, Enum):
     """Supported LLM providers."""
@@ -30,113 +33,161 @@ class LLMConfig:
     def from_env(cls) -> "LLMConfig":
         """Create config from environment variables."""
         provider_str = os.getenv("LLM_PROVIDER", "ollama").lower()
+        return _ENV_CONFIGS.get(provider_str, _ollama_env_config)(cls)
 
-        if provider_str == "openai":
-            return cls(
-                provider=LLMProvider.OPENAI,
-                model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-                api_key=os.getenv("OPENAI_API_KEY"),
-            )
-        elif provider_str == "anthropic":
-            return cls(
-                provider=LLMProvider.ANTHROPIC,
-                model=os.getenv("ANTHROPIC_MODEL", "claude-3-haiku-20240307"),
-                api_key=os.getenv("ANTHROPIC_API_KEY"),
-            )
-        else:
-            return cls(
-                provider=LLMProvider.OLLAMA,
-                model=os.getenv("OLLAMA_MODEL", "llama3.2"),
-                base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
-            )
 
+def _openai_env_config(cls: type[LLMConfig]) -> LLMConfig:
+    """Build an OpenAI config from environment variables."""
+    return cls(
+        provider=LLMProvider.OPENAI,
+        model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        api_key=os.getenv("OPENAI_API_KEY"),
+    )
 
-def check_ollama_available(base_url: str = "http://localhost:11434") -> bool:
-    """Check if Ollama server is running."""
-    try:
-        response = httpx.get(f"{base_url}/api/tags", timeout=2.0)
-        return response.status_code == 200
-    except (httpx.RequestError, httpx.TimeoutException):
-        return False
 
+def _anthropic_env_config(cls: type[LLMConfig]) -> LLMConfig:
+    """Build an Anthropic config from environment variables."""
+    return cls(
+        provider=LLMProvider.ANTHROPIC,
+        model=os.getenv("ANTHROPIC_MODEL", "claude-3-haiku-20240307"),
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+    )
 
-def get_available_ollama_models(base_url: str = "http://localhost:11434") -> list[str]:
-    """Get list of available Ollama models."""
+
+def _ollama_env_config(cls: type[LLMConfig]) -> LLMConfig:
+    """Build an Ollama config from environment variables."""
+    return cls(
+        provider=LLMProvider.OLLAMA,
+        model=os.getenv("OLLAMA_MODEL", "llama3.2"),
+        base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+    )
+
+
+# LLM_PROVIDER value -> config builder; anything else falls back to Ollama
+_ENV_CONFIGS = {
+    "openai": _openai_env_config,
+    "anthropic": _anthropic_env_config,
+    "ollama": _ollama_env_config,
+}
+
+
+OLLAMA_PROBE_TTL = 30.0  # Seconds to reuse an Ollama availability/model probe
+OLLAMA_PROBE_TIMEOUT = 2.0
+
+# base_url -> (probed_at monotonic seconds, installed models or None if unreachable)
+_ollama_probes: dict[str, tuple[float, list[str] | None]] = {}
+
+
+def _probe_ollama(base_url: str) -> list[str] | None:
+    """Return installed Ollama models, or None if the server is unreachable."""
+    cached = _ollama_probes.get(base_url)
+    if cached and time.monotonic() - cached[0] < OLLAMA_PROBE_TTL:
+        return cached[1]
+
+    models: list[str] | None = None
     try:
-        response = httpx.get(f"{base_url}/api/tags", timeout=5.0)
+        # One /api/tags call answers both availability and the model list
+        response = http_client().get(f"{base_url}/api/tags", timeout=OLLAMA_PROBE_TIMEOUT)
         if response.status_code == 200:
-            data = response.json()
-            return [model["name"] for model in data.get("models", [])]
+            models = [model["name"] for model in response.json().get("models", [])]
     except (httpx.RequestError, httpx.TimeoutException):
         pass
-    return []
 
+    _ollama_probes[base_url] = (time.monotonic(), models)
+    return models
 
-def get_llm(config: LLMConfig | None = None) -> BaseChatModel:
-    """
-    Get LLM instance based on configuration.
 
-    Defaults to Ollama with llama3.2 if no config provided.
-    Falls back gracefully if Ollama is not available.
-    """
-    if config is None:
-        config = LLMConfig.from_env()
+def check_ollama_available(base_url: str = "http://localhost:11434") -> bool:
+    """Check if Ollama server is running."""
+    return _probe_ollama(base_url) is not None
+
+
+def get_available_ollama_models(base_url: str = "http://localhost:11434") -> list[str]:
+    """Get list of available Ollama models."""
+    return _probe_ollama(base_url) or []
+
+
+def _ollama_llm(config: LLMConfig) -> BaseChatModel:
+    """Create a ChatOllama model, resolving the model tag against installed models."""
+    from langchain_ollama import ChatOllama
 
-    if config.provider == LLMProvider.OLLAMA:
-        from langchain_ollama import ChatOllama
+    if not check_ollama_available(config.base_url):
+        raise RuntimeError(
+            f"Ollama server not available at {config.base_url}. Start it with: ollama serve"
+        )
 
-        if not check_ollama_available(config.base_url):
+    available_models = get_available_ollama_models(config.base_url)
+    if available_models and config.model not in available_models:
+        # Try to find a matching model
+        base_model = config.model.split(":")[0]
+        matches = [m for m in available_models if m.startswith(base_model)]
+        if matches:
+            config.model = matches[0]
+        else:
             raise RuntimeError(
-                f"Ollama server not available at {config.base_url}. Start it with: ollama serve"
+                f"Model '{config.model}' not found. "
+                f"Available: {', '.join(available_models)}. "
+                f"Pull it with: ollama pull {config.model}"
             )
 
-        available_models = get_available_ollama_models(config.base_url)
-        if available_models and config.model not in available_models:
-            # Try to find a matching model
-            base_model = config.model.split(":")[0]
-            matches = [m for m in available_models if m.startswith(base_model)]
-            if matches:
-                config.model = matches[0]
-            else:
-                raise RuntimeError(
-                    f"Model '{config.model}' not found. "
-                    f"Available: {', '.join(available_models)}. "
-                    f"Pull it with: ollama pull {config.model}"
-                )
-
-        return ChatOllama(
-            model=config.model,
-            base_url=config.base_url,
-            temperature=config.temperature,
-        )
+    return ChatOllama(
+        model=config.model,
+        base_url=config.base_url,
+        temperature=config.temperature,
+    )
 
-    elif config.provider == LLMProvider.OPENAI:
-        from langchain_openai import ChatOpenAI
 
-        if not config.api_key:
-            raise RuntimeError("OPENAI_API_KEY environment variable required")
+def _openai_llm(config: LLMConfig) -> BaseChatModel:
+    """Create a ChatOpenAI model."""
+    from langchain_openai import ChatOpenAI
 
-        return ChatOpenAI(
-            model=config.model,
-            temperature=config.temperature,
-            api_key=config.api_key,
-        )
+    if not config.api_key:
+        raise RuntimeError("OPENAI_API_KEY environment variable required")
 
-    elif config.provider == LLMProvider.ANTHROPIC:
-        from langchain_anthropic import ChatAnthropic
+    return ChatOpenAI(
+        model=config.model,
+        temperature=config.temperature,
+        api_key=config.api_key,
+    )
 
-        if not config.api_key:
-            raise RuntimeError("ANTHROPIC_API_KEY environment variable required")
 
-        return ChatAnthropic(
-            model=config.model,
-            temperature=config.temperature,
-            api_key=config.api_key,
-        )
+def _anthropic_llm(config: LLMConfig) -> BaseChatModel:
+    """Create a ChatAnthropic model."""
+    from langchain_anthropic import ChatAnthropic
+
+    if not config.api_key:
+        raise RuntimeError("ANTHROPIC_API_KEY environment variable required")
+
+    return ChatAnthropic(
+        model=config.model,
+        temperature=config.temperature,
+        api_key=config.api_key,
+    )
 
-    else:
+
+_LLM_BUILDERS = {
+    LLMProvider.OLLAMA: _ollama_llm,
+    LLMProvider.OPENAI: _openai_llm,
+    LLMProvider.ANTHROPIC: _anthropic_llm,
+}
+
+
+def get_llm(config: LLMConfig | None = None) -> BaseChatModel:
+    """
+    Get LLM instance based on configuration.
+
+    Defaults to Ollama with llama3.2 if no config provided.
+    Falls back gracefully if Ollama is not available.
+    """
+    if config is None:
+        config = LLMConfig.from_env()
+
+    builder = _LLM_BUILDERS.get(config.provider)
+    if builder is None:
         raise ValueError(f"Unknown provider: {config.provider}")
 
+    return builder(config)
+
 
 # Singleton for reuse
 _llm_instance: BaseChatModel | None = None
@@ -154,3 +205,4 @@ def reset_llm() -> None:
     """Reset the LLM instance (useful for testing)."""
     global _llm_instance
     _llm_instance = None
+    _ollama_probes.clear()
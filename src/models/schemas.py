@@ -1,6 +1,7 @@
 """Pydantic models for DeFi risk analysis."""
 
-from datetime import datetime
+import bisect
+from datetime import UTC, datetime
 from enum import Enum
 from typing import Annotated
 
@@ -8,6 +9,11 @@ from pydantic import BaseModel, Field
 from typing_extensions import TypedDict
 
 
+def _utcnow() -> datetime:
+    """Current time as an aware UTC datetime (datetime.utcnow is deprecated)."""
+    return datetime.now(UTC)
+
+
 class RiskLevel(str, Enum):
     """Risk level classification."""
 
@@ -33,6 +39,11 @@ class ChainBreakdown(BaseModel):
     tvl: float = Field(ge=0, description="Total Value Locked in USD")
     percentage: float = Field(ge=0, le=100, description="Percentage of total TVL")
 
+    @property
+    def tvl_display(self) -> str:
+        """TVL formatted in billions (e.g. "$1.50B")."""
+        return f"${self.tvl / 1e9:.2f}B"
+
 
 class TVLDataPoint(BaseModel):
     """Historical TVL data point."""
@@ -81,7 +92,12 @@ class ProtocolData(BaseModel):
     gecko_id: str | None = None
     twitter: str | None = None
     mcap: float | None = None
-    fetched_at: datetime = Field(default_factory=datetime.utcnow)
+    fetched_at: datetime = Field(default_factory=_utcnow)
+
+    @property
+    def tvl_display(self) -> str:
+        """TVL formatted in billions (e.g. "$1.50B")."""
+        return f"${self.tvl / 1e9:.2f}B"
 
 
 class RiskFactor(BaseModel):
@@ -94,6 +110,11 @@ class RiskFactor(BaseModel):
     details: str | None = None
 
 
+# Upper bounds (inclusive) of each risk level below CRITICAL, for RiskScore.from_score
+_LEVEL_THRESHOLDS = (3, 5, 7)
+_LEVELS = (RiskLevel.LOW, RiskLevel.MEDIUM, RiskLevel.HIGH, RiskLevel.CRITICAL)
+
+
 class RiskScore(BaseModel):
     """Overall risk score with breakdown."""
 
@@ -104,14 +125,7 @@ class RiskScore(BaseModel):
     @classmethod
     def from_score(cls, score: float, factors: list[RiskFactor]) -> "RiskScore":
         """Create RiskScore from numerical score."""
-        if score <= 3:
-            level = RiskLevel.LOW
-        elif score <= 5:
-            level = RiskLevel.MEDIUM
-        elif score <= 7:
-            level = RiskLevel.HIGH
-        else:
-            level = RiskLevel.CRITICAL
+        level = _LEVELS[bisect.bisect_left(_LEVEL_THRESHOLDS, score)]
         return cls(overall=score, level=level, factors=factors)
 
 
@@ -127,7 +141,7 @@ class RiskAssessment(BaseModel):
     incident_analysis: str
     recommendations: list[str] = Field(default_factory=list)
     warnings: list[str] = Field(default_factory=list)
-    assessed_at: datetime = Field(default_factory=datetime.utcnow)
+    assessed_at: datetime = Field(default_factory=_utcnow)
 
 
 class RiskReport(BaseModel):
@@ -138,7 +152,7 @@ class RiskReport(BaseModel):
     executive_summary: str
     detailed_analysis: str
     data_sources: list[str] = Field(default_factory=list)
-    generated_at: datetime = Field(default_factory=datetime.utcnow)
+    generated_at: datetime = Field(default_factory=_utcnow)
 
 
 class ComparisonReport(BaseModel):
@@ -148,7 +162,7 @@ class ComparisonReport(BaseModel):
     assessments: list[RiskAssessment]
     comparison_summary: str
     recommendation: str
-    generated_at: datetime = Field(default_factory=datetime.utcnow)
+    generated_at: datetime = Field(default_factory=_utcnow)
 
 
 # LangGraph State Models
@@ -198,4 +212,4 @@ class HealthResponse(BaseModel):
 
     status: str = "healthy"
     version: str = "0.1.0"
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=_utcnow)
@@ -1,15 +1,43 @@
 """DefiLlama API client for fetching protocol data."""
 
-from datetime import datetime
+import asyncio
+import heapq
+import re
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from operator import itemgetter
 from typing import Any
 
 import httpx
+import orjson
 
-from src.models.schemas import ChainBreakdown, ProtocolData, TVLDataPoint
+from src.http import async_client, get_with_retry
+from src.models.schemas import ChainBreakdown, ExploitIncident, ProtocolData, TVLDataPoint
 from src.tools.rekt_scraper import get_scraper
 
 BASE_URL = "https://api.llama.fi"
 TIMEOUT = 30.0
+CACHE_TTL = 300.0  # Seconds a response stays fresh
+CACHE_SIZE = 128  # Responses kept before the least recently used is evicted
+TVL_HISTORY_DAYS = 90  # Daily TVL points kept for volatility and trend scoring
+
+# currentChainTvls entries that are not chain TVL: aggregate categories and their
+# per-chain variants (e.g. "Ethereum-borrowed")
+_EXCLUDED_CHAIN_KEYS = frozenset({"borrowed", "staking", "pool2"})
+_EXCLUDED_CHAIN_SUFFIXES = ("-borrowed", "-staking", "-pool2")
+
+# Per-chain and per-token histories in /protocol responses; never read, and they
+# can run to megabytes for large protocols
+_UNUSED_PROTOCOL_KEYS = ("chainTvls", "tokens", "tokensInUsd")
+
+
+# Queries that could be a DefiLlama slug as typed (e.g. "aave-v3", "curve-dex")
+_SLUG_SHAPE = re.compile(r"[a-z0-9][a-z0-9.-]*")
+
+# Lowercased slug/name -> slug, (slug, name, original slug) rows for partial matches,
+# and slug -> listed name
+_SearchIndex = tuple[dict[str, str], list[tuple[str, str, str]], dict[str, str]]
 
 
 class DefiLlamaError(Exception):
@@ -18,57 +46,126 @@ class DefiLlamaError(Exception):
     pass
 
 
+class ProtocolNotFoundError(DefiLlamaError):
+    """The requested protocol does not exist on DefiLlama."""
+
+
+def top_protocols_by_tvl(protocols: list[dict[str, Any]], limit: int) -> list[dict[str, Any]]:
+    """Return the `limit` largest protocols by TVL, without sorting the full list."""
+    return heapq.nlargest(limit, protocols, key=lambda p: p.get("tvl", 0) or 0)
+
+
+def _whole_usd(value: float) -> float:
+    """Round a USD amount to whole dollars; finer precision is noise in TVL estimates."""
+    return float(round(value))
+
+
+def _prune_protocol(data: dict[str, Any]) -> dict[str, Any]:
+    """Drop the parts of a /protocol response that are never read before it is cached."""
+    for key in _UNUSED_PROTOCOL_KEYS:
+        data.pop(key, None)
+    tvl = data.get("tvl")
+    if isinstance(tvl, list):
+        data["tvl"] = tvl[-TVL_HISTORY_DAYS:]
+    return data
+
+
 class DefiLlamaClient:
     """Client for DefiLlama API with caching."""
 
-    def __init__(self, timeout: float = TIMEOUT) -> None:
+    def __init__(self, timeout: float = TIMEOUT, cache_size: int = CACHE_SIZE) -> None:
         self.base_url = BASE_URL
         self.timeout = timeout
-        self._cache: dict[str, tuple[datetime, Any]] = {}
-        self._cache_ttl = 300  # 5 minutes
+        # URL -> (cached_at monotonic seconds, value), least recently used first
+        self._cache: dict[str, tuple[float, Any]] = {}
+        self._cache_ttl = CACHE_TTL
+        self._cache_size = cache_size
+        # Requests in progress, so concurrent cold lookups of one URL share a single call
+        self._inflight: dict[str, asyncio.Future[Any]] = {}
+        # (protocol list, search index built from it) for search_protocol
+        self._protocol_index: tuple[list[dict[str, Any]], _SearchIndex] | None = None
 
     def _get_cached(self, key: str) -> Any | None:
         """Get cached value if not expired."""
-        if key in self._cache:
-            cached_at, value = self._cache[key]
-            if (datetime.utcnow() - cached_at).total_seconds() < self._cache_ttl:
-                return value
-            del self._cache[key]
-        return None
+        entry = self._cache.pop(key, None)
+        if entry is None or time.monotonic() - entry[0] >= self._cache_ttl:
+            return None
+        # Reinsert so the dict stays ordered from least to most recently used
+        self._cache[key] = entry
+        return entry[1]
 
     def _set_cache(self, key: str, value: Any) -> None:
-        """Cache a value."""
-        self._cache[key] = (datetime.utcnow(), value)
-
-    async def _request(self, endpoint: str) -> Any:
-        """Make HTTP request to DefiLlama API."""
+        """Cache a value, evicting the least recently used entry once the cache is full."""
+        self._cache.pop(key, None)
+        if len(self._cache) >= self._cache_size:
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = (time.monotonic(), value)
+
+    async def _request(self, endpoint: str, prune: Callable[[Any], Any] | None = None) -> Any:
+        """
+        Make HTTP request to DefiLlama API.
+
+        ``prune``, if given, is applied to the decoded response before it is cached.
+        Concurrent requests for the same uncached URL share a single HTTP call.
+        """
         url = f"{self.base_url}{endpoint}"
 
-        cached = self._get_cached(url)
-        if cached is not None:
-            return cached
+        while True:
+            cached = self._get_cached(url)
+            if cached is not None:
+                return cached
+
+            inflight = self._inflight.get(url)
+            if inflight is None:
+                break
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
             try:
-                response = await client.get(url)
-                response.raise_for_status()
-                data = response.json()
-                self._set_cache(url, data)
-                return data
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 404:
-                    raise DefiLlamaError(f"Protocol not found: {endpoint}")
-                raise DefiLlamaError(f"API error: {e.response.status_code}")
-            except httpx.RequestError as e:
-                raise DefiLlamaError(f"Request failed: {e}")
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Retry only if the leading request was cancelled, not this caller
+                if not inflight.cancelled():
+                    raise
+
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self._inflight[url] = future
+        try:
+            data = await self._fetch(url, endpoint, prune)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved in case nobody else was waiting
+            raise
+        else:
+            self._set_cache(url, data)
+            future.set_result(data)
+            return data
+        finally:
+            self._inflight.pop(url, None)
+
+    async def _fetch(self, url: str, endpoint: str, prune: Callable[[Any], Any] | None) -> Any:
+        """Perform the HTTP call for a URL and decode the response."""
+        try:
+            # Shared pooled client; concurrent fetches reuse its connections
+            response = await get_with_retry(async_client(), url, timeout=self.timeout)
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+            return prune(data) if prune is not None else data
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                raise ProtocolNotFoundError(f"Protocol not found: {endpoint}")
+            raise DefiLlamaError(f"API error: {e.response.status_code}")
+        except httpx.RequestError as e:
+            raise DefiLlamaError(f"Request failed: {e}")
 
     async def get_protocols(self) -> list[dict[str, Any]]:
         """Fetch list of all protocols with metadata."""
         return await self._request("/protocols")
 
     async def get_protocol(self, slug: str) -> dict[str, Any]:
-        """Fetch detailed protocol data including TVL history."""
-        return await self._request(f"/protocol/{slug}")
+        """Fetch detailed protocol data including recent TVL history."""
+        return await self._request(f"/protocol/{slug}", prune=_prune_protocol)
 
     async def get_chains(self) -> list[dict[str, Any]]:
         """Fetch chain-level TVL data."""
@@ -78,50 +175,130 @@ class DefiLlamaClient:
         """Fetch yield pool data with APY."""
         return await self._request("/pools")
 
+    def _search_index(self, protocols: list[dict[str, Any]]) -> _SearchIndex:
+        """
+        Return the search_protocol lookup tables, built once per protocol list.
+
+        Each exact key keeps the first protocol in list order, as a linear scan would.
+        """
+        if self._protocol_index is not None and self._protocol_index[0] is protocols:
+            return self._protocol_index[1]
+
+        exact: dict[str, str] = {}
+        entries: list[tuple[str, str, str]] = []
+        names: dict[str, str] = {}
+        for p in protocols:
+            slug = p.get("slug", "")
+            name = p.get("name", "")
+            slug_lower = slug.lower()
+            name_lower = name.lower()
+            exact.setdefault(slug_lower, slug)
+            exact.setdefault(name_lower, slug)
+            entries.append((slug_lower, name_lower, slug))
+            if name:
+                names.setdefault(slug, name)
+
+        index = (exact, entries, names)
+        self._protocol_index = (protocols, index)
+        return index
+
     async def search_protocol(self, query: str) -> str | None:
         """Search for protocol by name and return slug."""
-        protocols = await self.get_protocols()
+        exact, entries, _ = self._search_index(await self.get_protocols())
         query_lower = query.lower()
 
         # Exact match first
-        for p in protocols:
-            if p.get("slug", "").lower() == query_lower:
-                return p["slug"]
-            if p.get("name", "").lower() == query_lower:
-                return p["slug"]
+        slug = exact.get(query_lower)
+        if slug is not None:
+            return slug
 
         # Partial match
-        for p in protocols:
-            if query_lower in p.get("slug", "").lower():
-                return p["slug"]
-            if query_lower in p.get("name", "").lower():
-                return p["slug"]
+        for slug_lower, name_lower, slug in entries:
+            if query_lower in slug_lower or query_lower in name_lower:
+                return slug
 
         return None
 
     async def fetch_protocol_data(self, protocol_name: str) -> ProtocolData:
-        """Fetch and parse protocol data into structured format."""
-        # Search for the protocol first
-        slug = await self.search_protocol(protocol_name)
-        if not slug:
-            raise DefiLlamaError(f"Protocol '{protocol_name}' not found")
-
-        # Fetch detailed data
-        data = await self.get_protocol(slug)
-
+        """
+        Fetch and parse protocol data into structured format.
+
+        A query shaped like a slug is fetched directly, which skips downloading the
+        megabytes-long protocol list; only if DefiLlama has no such slug is it searched
+        for by name. The order never depends on what is cached, so a query always
+        resolves to the same protocol.
+        """
+        slug = protocol_name.strip().lower()
+        tried = None
+        if _SLUG_SHAPE.fullmatch(slug):
+            try:
+                return await self._fetch_protocol_data(slug)
+            except ProtocolNotFoundError:
+                tried = slug
+
+        found = await self.search_protocol(protocol_name)
+        if not found or found == tried:
+            raise ProtocolNotFoundError(f"Protocol '{protocol_name}' not found")
+
+        # The listed name is the one /protocol/{slug} reports
+        _, _, names = self._search_index(await self.get_protocols())
+        return await self._fetch_protocol_data(found, names.get(found, found))
+
+    async def _fetch_protocol_data(self, slug: str, name: str | None = None) -> ProtocolData:
+        """
+        Fetch and parse a protocol by slug, scraping its incidents alongside.
+
+        Incidents are matched on the listed name, which Rekt normalizes differently
+        from the slug (e.g. "BadgerDAO" vs "badger-dao"). Without one the scrape
+        waits for the name in the detail response.
+        """
+        incidents_task = None
+        if name is not None:
+            # The incident scrape only needs the slug and name, so it overlaps the detail fetch
+            incidents_task = asyncio.create_task(self._fetch_incidents(slug, name))
+        try:
+            data = await self.get_protocol(slug)
+            if incidents_task is None:
+                incidents_task = asyncio.create_task(
+                    self._fetch_incidents(slug, data.get("name", slug))
+                )
+            return await self._parse_protocol(slug, data, incidents_task)
+        finally:
+            if incidents_task is not None:
+                incidents_task.cancel()  # No-op once awaited; stops the scrape on failure
+
+    @staticmethod
+    async def _fetch_incidents(slug: str, name: str) -> list[ExploitIncident]:
+        """Scrape a protocol's incident history, or nothing if the scrape fails."""
+        try:
+            return await get_scraper().fetch_protocol_incidents(slug, name)
+        except Exception:
+            return []  # Don't fail on scraper errors
+
+    async def _parse_protocol(
+        self,
+        slug: str,
+        data: dict[str, Any],
+        incidents_task: asyncio.Task[list[ExploitIncident]],
+    ) -> ProtocolData:
+        """Build ProtocolData from a /protocol response and the pending incident scrape."""
         # Parse TVL history (tvl field is a list of historical data)
         tvl_history: list[TVLDataPoint] = []
         tvl_data = data.get("tvl", [])
         if isinstance(tvl_data, list) and tvl_data:
-            for point in tvl_data[-90:]:
+            for point in tvl_data[-TVL_HISTORY_DAYS:]:
+                # Skip sparse or malformed points by checking types, not by catching errors
+                if not isinstance(point, dict):
+                    continue
+                ts = point.get("date")
+                tvl = point.get("totalLiquidityUSD", 0)
+                if not isinstance(ts, (int, float)) or not isinstance(tvl, (int, float)):
+                    continue
                 try:
-                    tvl_history.append(
-                        TVLDataPoint(
-                            date=datetime.fromtimestamp(point["date"]),
-                            tvl=point.get("totalLiquidityUSD", 0),
-                        )
-                    )
-                except (KeyError, ValueError):
+                    # Naive UTC, the convention risk scoring compares dates in
+                    date = datetime.fromtimestamp(ts, UTC).replace(tzinfo=None)
+                    tvl_history.append(TVLDataPoint(date=date, tvl=_whole_usd(tvl)))
+                except (ValueError, OverflowError, OSError):  # Date outside the datetime range
                     continue
 
         # Get current TVL from the latest history point or currentChainTvls
@@ -129,33 +306,30 @@ class DefiLlamaClient:
 
         # Calculate total TVL from currentChainTvls (exclude borrowed, staking, pool2)
         total_tvl = 0.0
-        chain_tvls: list[ChainBreakdown] = []
-        excluded_suffixes = ["-borrowed", "-staking", "-pool2"]
+        chain_amounts: list[tuple[str, float]] = []
 
         for chain, tvl in current_chain_tvls.items():
             # Skip aggregate categories and borrowed amounts
-            if chain in ["borrowed", "staking", "pool2"] or any(
-                chain.endswith(suffix) for suffix in excluded_suffixes
-            ):
+            if chain in _EXCLUDED_CHAIN_KEYS or chain.endswith(_EXCLUDED_CHAIN_SUFFIXES):
                 continue
-            if isinstance(tvl, (int, float)) and tvl > 0:
+            if not isinstance(tvl, (int, float)):
+                continue
+            tvl = _whole_usd(tvl)
+            if tvl > 0:
                 total_tvl += tvl
-                chain_tvls.append(
-                    ChainBreakdown(chain=chain, tvl=tvl, percentage=0)  # Will calculate after
-                )
+                chain_amounts.append((chain, tvl))
 
-        # Calculate percentages
-        if total_tvl > 0:
-            for chain_tvl in chain_tvls:
-                chain_tvl.percentage = (chain_tvl.tvl / total_tvl) * 100
+        # Sort by TVL descending, then build each breakdown once with its percentage
+        chain_amounts.sort(key=itemgetter(1), reverse=True)
+        chain_tvls = [
+            ChainBreakdown(chain=chain, tvl=tvl, percentage=(tvl / total_tvl) * 100)
+            for chain, tvl in chain_amounts
+        ]
 
         # If no currentChainTvls, use latest historical TVL
         if total_tvl == 0 and tvl_history:
             total_tvl = tvl_history[-1].tvl
 
-        # Sort by TVL descending
-        chain_tvls.sort(key=lambda x: x.tvl, reverse=True)
-
         # Extract audit info
         audits: list[str] = []
         audit_links: list[str] = []
@@ -170,12 +344,12 @@ class DefiLlamaClient:
         tvl_change_7d = data.get("change_7d")
         tvl_change_30d = data.get("change_1m")
 
-        # Fetch incident data
-        scraper = get_scraper()
-        try:
-            incidents = await scraper.fetch_protocol_incidents(slug, data.get("name", slug))
-        except Exception:
-            incidents = []  # Don't fail on scraper errors
+        mcap = data.get("mcap")
+        if isinstance(mcap, (int, float)):
+            mcap = _whole_usd(mcap)
+
+        # Collect incident data
+        incidents = await incidents_task
 
         return ProtocolData(
             name=data.get("name", slug),
@@ -198,7 +372,7 @@ class DefiLlamaClient:
             incidents=incidents,
             gecko_id=data.get("gecko_id"),
             twitter=data.get("twitter"),
-            mcap=data.get("mcap"),
+            mcap=mcap,
         )
 
 
@@ -1,26 +1,140 @@
 """Rekt.news incident data scraper."""
 
-import json
+import bisect
+import os
 import re
-from datetime import datetime, timedelta
+import time
+from collections import defaultdict
+from datetime import UTC, datetime
+from pathlib import Path
 from typing import Any
 
 import httpx
+import orjson
 from bs4 import BeautifulSoup
 
+from src.http import get_with_retry
 from src.models.schemas import ExploitIncident, IncidentSeverity
 
+# Patterns compiled once at import rather than looked up on every call
+_LEADERBOARD_JSON = re.compile(
+    r'(?:var|let|const)?\s*(?:leaderboard|data)\s*=\s*(\[.*?\]);',
+    re.DOTALL | re.IGNORECASE,
+)
+_SCRIPT_BODY = re.compile(r'<script\b[^>]*>(.*?)</script\s*>', re.DOTALL | re.IGNORECASE)
+_LEADERBOARD_WORD = re.compile(r'leaderboard', re.IGNORECASE)
+_SLUG_TAIL = re.compile(r'/([^/]+)/?$')
+_AMOUNT_CLEAN = re.compile(r'[$,\s]')
+_AMOUNT_NUM = re.compile(r'([\d.]+)([KMB])?')
+_NORM_SUFFIX = re.compile(r'\s+(finance|protocol|defi|network|v\d+)$')
+_NORM_SPECIAL = re.compile(r'[^\w\s-]')
+_NORM_SPACES = re.compile(r'\s+')
+_NORM_DASHES = re.compile(r'-+')
+
+# Leaderboard snapshot kept across restarts; the scrape is slow and changes rarely
+LEADERBOARD_CACHE_PATH = Path.home() / ".cache" / "defi_risk_agent" / "rekt_leaderboard.json"
+
+# Date formats grouped by the prefix each one requires, so _parse_date only tries
+# formats that can match instead of raising ValueError for every other one
+_DATE_FORMATS = (
+    (re.compile(r'\d{4}-'), ("%Y-%m-%d",)),
+    (re.compile(r'\d{1,2}/'), ("%d/%m/%Y", "%m/%d/%Y")),
+    (re.compile(r'[A-Za-z]'), ("%B %d, %Y",)),
+    (re.compile(r'\d{1,2}\s+[A-Za-z]'), ("%d %B %Y",)),
+)
+
+
+class _LeaderboardIndex:
+    """Normalized lookup tables over the rows of one leaderboard list."""
+
+    def __init__(self, rows: list[tuple[str, str, set[str]]]) -> None:
+        """Index (protocol, slug, tags) rows, already normalized, by row position."""
+        self.by_protocol: dict[str, list[int]] = defaultdict(list)
+        self.by_slug: dict[str, list[int]] = defaultdict(list)
+        self.by_tag: dict[str, list[int]] = defaultdict(list)
+        # "slug\0protocol" of each row with a slug, joined by newlines; neither separator
+        # survives normalization, so a substring hit always lies within one row
+        keys: list[str] = []
+        self._starts: list[int] = []
+        self._rows: list[int] = []
+
+        offset = 0
+        for i, (protocol, slug, tags) in enumerate(rows):
+            self.by_protocol[protocol].append(i)
+            self.by_slug[slug].append(i)
+            for tag in tags:
+                self.by_tag[tag].append(i)
+            if slug:
+                key = f"{slug}\0{protocol}"
+                keys.append(key)
+                self._starts.append(offset)
+                self._rows.append(i)
+                offset += len(key) + 1
+
+        self._haystack = "\n".join(keys)
+
+    def partial_matches(self, needle: str) -> list[int]:
+        """Rows with a slug whose slug or protocol contains needle."""
+        haystack = self._haystack
+        starts = self._starts
+        matches: list[int] = []
+        pos = haystack.find(needle)
+        while pos != -1:
+            row = bisect.bisect_right(starts, pos) - 1
+            matches.append(self._rows[row])
+            # Resume at the next row so each row is reported once
+            next_start = starts[row + 1] if row + 1 < len(starts) else len(haystack)
+            pos = haystack.find(needle, next_start)
+        return matches
+
 
 class RektScraper:
     """Scraper for Rekt.news leaderboard data."""
 
     LEADERBOARD_URL = "https://rekt.news/leaderboard/"
-    CACHE_TTL = timedelta(hours=24)
+    CACHE_TTL = 86400.0  # Seconds (24 hours)
+
+    def __init__(self, cache_path: Path | None = LEADERBOARD_CACHE_PATH) -> None:
+        """
+        Initialize scraper with cache.
 
-    def __init__(self) -> None:
-        """Initialize scraper with cache."""
+        Args:
+            cache_path: File the leaderboard is persisted to, or None to keep it in memory only
+        """
         self._cache: dict[str, Any] = {}
-        self._cache_time: datetime | None = None
+        self._cache_time: float | None = None  # time.monotonic() of the last fetch
+        # Lookup index and the leaderboard list it was built from
+        self._index: tuple[list[dict[str, Any]], _LeaderboardIndex] | None = None
+        self._cache_path = cache_path
+        self._load_disk_cache()
+
+    def _load_disk_cache(self) -> None:
+        """Load a persisted leaderboard that is still within the cache TTL."""
+        if self._cache_path is None:
+            return
+        try:
+            age = time.time() - self._cache_path.stat().st_mtime
+            if not 0 <= age < self.CACHE_TTL:
+                return
+            data = orjson.loads(self._cache_path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return
+        if isinstance(data, list):
+            self._cache["leaderboard_data"] = data
+            # Age the entry as if it had been fetched by this process
+            self._cache_time = time.monotonic() - age
+
+    def _save_disk_cache(self, incidents: list[dict[str, Any]]) -> None:
+        """Persist the leaderboard atomically; failures only cost the next restart a fetch."""
+        if self._cache_path is None:
+            return
+        tmp_path = self._cache_path.with_suffix(".tmp")
+        try:
+            self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(orjson.dumps(incidents, option=orjson.OPT_UTC_Z))
+            os.replace(tmp_path, self._cache_path)
+        except (OSError, TypeError):
+            pass
 
     async def fetch_leaderboard_data(self) -> list[dict[str, Any]]:
         """
@@ -30,43 +144,24 @@ class RektScraper:
             List of incident dictionaries with title, date, amount, tags, etc.
         """
         # Check cache
-        if self._cache_time and datetime.utcnow() - self._cache_time < self.CACHE_TTL:
+        if self._cache_time is not None and time.monotonic() - self._cache_time < self.CACHE_TTL:
             return self._cache.get("leaderboard_data", [])
 
         try:
             async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-                response = await client.get(self.LEADERBOARD_URL)
+                response = await get_with_retry(client, self.LEADERBOARD_URL)
                 response.raise_for_status()
 
-                soup = BeautifulSoup(response.text, "html.parser")
-
-                # Look for embedded JSON data in script tags
-                incidents = []
-                for script in soup.find_all("script"):
-                    if script.string and "leaderboard" in script.string.lower():
-                        # Try to extract JSON data
-                        try:
-                            # Look for patterns like: var leaderboard = [...];
-                            json_match = re.search(
-                                r'(?:var|let|const)?\s*(?:leaderboard|data)\s*=\s*(\[.*?\]);',
-                                script.string,
-                                re.DOTALL | re.IGNORECASE,
-                            )
-                            if json_match:
-                                data = json.loads(json_match.group(1))
-                                if isinstance(data, list):
-                                    incidents = data
-                                    break
-                        except (json.JSONDecodeError, AttributeError):
-                            continue
-
-                # If no JSON found, try parsing HTML table
+                # Embedded JSON needs no parse tree; build one only for the table fallback
+                incidents = self._parse_leaderboard_json(response.text)
                 if not incidents:
-                    incidents = self._parse_leaderboard_table(soup)
+                    incidents = self._parse_leaderboard_table(BeautifulSoup(response.text, "lxml"))
 
                 # Cache results
                 self._cache["leaderboard_data"] = incidents
-                self._cache_time = datetime.utcnow()
+                self._cache_time = time.monotonic()
+                if incidents:
+                    self._save_disk_cache(incidents)
 
                 return incidents
 
@@ -75,6 +170,35 @@ class RektScraper:
             print(f"Error fetching Rekt.news data: {e}")
             return []
 
+    def _parse_leaderboard_json(self, html: str) -> list[dict[str, Any]]:
+        """
+        Extract leaderboard data embedded as JSON in a script tag.
+
+        Args:
+            html: Raw leaderboard page
+
+        Returns:
+            List of incident dictionaries, or an empty list if none is embedded
+        """
+        for script_match in _SCRIPT_BODY.finditer(html):
+            script = script_match.group(1)
+            if not _LEADERBOARD_WORD.search(script):
+                continue
+
+            # Look for patterns like: var leaderboard = [...];
+            json_match = _LEADERBOARD_JSON.search(script)
+            if not json_match:
+                continue
+
+            try:
+                data = orjson.loads(json_match.group(1))
+            except orjson.JSONDecodeError:
+                continue
+            if isinstance(data, list):
+                return data
+
+        return []
+
     def _parse_leaderboard_table(self, soup: BeautifulSoup) -> list[dict[str, Any]]:
         """
         Parse leaderboard data from HTML structure.
@@ -124,7 +248,7 @@ class RektScraper:
 
                 slug = None
                 if url:
-                    slug_match = re.search(r'/([^/]+)/?$', url)
+                    slug_match = _SLUG_TAIL.search(url)
                     if slug_match:
                         slug = slug_match.group(1)
 
@@ -185,7 +309,7 @@ class RektScraper:
 
                     slug = None
                     if url:
-                        slug_match = re.search(r'/([^/]+)/?$', url)
+                        slug_match = _SLUG_TAIL.search(url)
                         if slug_match:
                             slug = slug_match.group(1)
 
@@ -205,10 +329,10 @@ class RektScraper:
     def _parse_amount(self, amount_text: str) -> float:
         """Parse amount string to USD value."""
         # Remove currency symbols and whitespace
-        amount_text = re.sub(r'[$,\s]', '', amount_text.upper())
+        amount_text = _AMOUNT_CLEAN.sub('', amount_text.upper())
 
         # Extract number and multiplier
-        match = re.search(r'([\d.]+)([KMB])?', amount_text)
+        match = _AMOUNT_NUM.search(amount_text)
         if not match:
             return 0.0
 
@@ -227,12 +351,16 @@ class RektScraper:
     def _parse_date(self, date_text: str) -> datetime | None:
         """Parse date string to datetime."""
         try:
-            # Try common date formats
-            for fmt in ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%B %d, %Y", "%d %B %Y"]:
-                try:
-                    return datetime.strptime(date_text.strip(), fmt)
-                except ValueError:
-                    continue
+            # Try the common date formats whose shape matches
+            text = date_text.strip()
+            for prefix, formats in _DATE_FORMATS:
+                if prefix.match(text):
+                    for fmt in formats:
+                        try:
+                            return datetime.strptime(text, fmt)
+                        except ValueError:
+                            continue
+                    break
 
             # Try parsing with dateutil if available
             try:
@@ -269,68 +397,76 @@ class RektScraper:
         # Normalize search terms
         normalized_slug = self._normalize_protocol_name(slug)
         normalized_name = self._normalize_protocol_name(protocol_name) if protocol_name else None
+        index = self._leaderboard_index(leaderboard_data)
+
+        # Exact matches by slug or protocol name, and tag matches
+        matches: set[int] = set()
+        matches.update(index.by_slug.get(normalized_slug, ()))
+        matches.update(index.by_protocol.get(normalized_slug, ()))
+        matches.update(index.by_tag.get(normalized_slug, ()))
+        if normalized_name:
+            matches.update(index.by_protocol.get(normalized_name, ()))
+            matches.update(index.by_tag.get(normalized_name, ()))
+
+        # Partial matches on the base name (before hyphen), e.g. "cream" in "cream-rekt"
+        base_slug = normalized_slug.partition('-')[0]
+        if base_slug:
+            matches.update(index.partial_matches(base_slug))
 
         incidents = []
-        for item in leaderboard_data:
-            # Match by slug, protocol name, or tags
-            item_protocol = self._normalize_protocol_name(item.get("protocol", ""))
-            item_slug = self._normalize_protocol_name(item.get("slug", ""))
-            item_tags = [self._normalize_protocol_name(tag) for tag in item.get("tags", [])]
-
-            # Check for exact matches first
-            exact_match = (
-                item_slug == normalized_slug
-                or item_protocol == normalized_slug
-                or (normalized_name and item_protocol == normalized_name)
+        for i in sorted(matches):
+            item = leaderboard_data[i]
+            # Create ExploitIncident
+            amount = float(item.get("amount", 0))
+            date_str = item.get("date")
+            date = datetime.fromisoformat(date_str) if date_str else datetime.utcnow()
+            if date.tzinfo is not None:
+                # Risk scoring compares against naive UTC, so drop "Z"/offset suffixes
+                date = date.astimezone(UTC).replace(tzinfo=None)
+
+            incident = ExploitIncident(
+                protocol_name=item.get("protocol", protocol_name or slug),
+                date=date,
+                amount_lost_usd=amount,
+                severity=self._classify_severity(amount),
+                title=item.get("title", f"Security Incident - ${amount / 1e6:.1f}M"),
+                description=item.get("description"),
+                tags=item.get("tags", []),
+                audit_status=item.get("audit_status"),
+                fixed=item.get("fixed", False),
+                details_url=item.get("url"),
+                slug=item.get("slug"),
             )
-
-            # Check for partial matches (e.g., "cream" in "cream-rekt")
-            partial_match = False
-            if not exact_match and normalized_slug:
-                # Extract base name (before hyphen)
-                base_slug = normalized_slug.split('-')[0]
-                base_item_slug = item_slug.split('-')[0] if item_slug else ""
-
-                # Match if base names match or if one contains the other
-                if (
-                    base_slug and base_item_slug and
-                    (base_slug in item_slug or item_slug.startswith(base_slug) or
-                     base_slug in item_protocol or item_protocol.startswith(base_slug))
-                ):
-                    partial_match = True
-
-            # Check tags
-            tag_match = (
-                normalized_slug in item_tags or
-                (normalized_name and normalized_name in item_tags)
-            )
-
-            if exact_match or partial_match or tag_match:
-                # Create ExploitIncident
-                amount = float(item.get("amount", 0))
-                date_str = item.get("date")
-                date = datetime.fromisoformat(date_str) if date_str else datetime.utcnow()
-
-                incident = ExploitIncident(
-                    protocol_name=item.get("protocol", protocol_name or slug),
-                    date=date,
-                    amount_lost_usd=amount,
-                    severity=self._classify_severity(amount),
-                    title=item.get("title", f"Security Incident - ${amount / 1e6:.1f}M"),
-                    description=item.get("description"),
-                    tags=item.get("tags", []),
-                    audit_status=item.get("audit_status"),
-                    fixed=item.get("fixed", False),
-                    details_url=item.get("url"),
-                    slug=item.get("slug"),
-                )
-                incidents.append(incident)
+            incidents.append(incident)
 
         # Sort by date (most recent first)
         incidents.sort(key=lambda x: x.date, reverse=True)
 
         return incidents
 
+    def _leaderboard_index(self, leaderboard_data: list[dict[str, Any]]) -> "_LeaderboardIndex":
+        """
+        Return the lookup index for a leaderboard list.
+
+        Built once per list, so queries do dict lookups instead of re-running the
+        normalization regexes on every row.
+        """
+        if self._index is not None and self._index[0] is leaderboard_data:
+            return self._index[1]
+
+        index = _LeaderboardIndex(
+            [
+                (
+                    self._normalize_protocol_name(item.get("protocol", "")),
+                    self._normalize_protocol_name(item.get("slug", "")),
+                    {self._normalize_protocol_name(tag) for tag in item.get("tags", [])},
+                )
+                for item in leaderboard_data
+            ]
+        )
+        self._index = (leaderboard_data, index)
+        return index
+
     def _classify_severity(self, amount_usd: float) -> IncidentSeverity:
         """
         Classify incident severity based on amount lost.
@@ -367,16 +503,16 @@ class RektScraper:
         normalized = name.lower()
 
         # Remove common suffixes
-        normalized = re.sub(r'\s+(finance|protocol|defi|network|v\d+)$', '', normalized)
+        normalized = _NORM_SUFFIX.sub('', normalized)
 
         # Remove special characters except hyphens
-        normalized = re.sub(r'[^\w\s-]', '', normalized)
+        normalized = _NORM_SPECIAL.sub('', normalized)
 
         # Replace spaces with hyphens
-        normalized = re.sub(r'\s+', '-', normalized)
+        normalized = _NORM_SPACES.sub('-', normalized)
 
         # Remove multiple hyphens
-        normalized = re.sub(r'-+', '-', normalized)
+        normalized = _NORM_DASHES.sub('-', normalized)
 
         # Remove leading/trailing hyphens
         normalized = normalized.strip('-')
@@ -1,7 +1,12 @@
 """Risk calculation utilities for DeFi protocol analysis."""
 
-import statistics
-from datetime import datetime, timedelta
+import bisect
+import math
+import threading
+import time
+from collections.abc import Sequence
+from datetime import UTC, datetime, timedelta
+from typing import Any
 
 from src.models.schemas import (
     ChainBreakdown,
@@ -14,6 +19,21 @@ from src.models.schemas import (
     TVLDataPoint,
 )
 
+# Severity contribution to the incident score; unknown severities count as 5
+_SEVERITY_WEIGHTS = {
+    IncidentSeverity.CRITICAL: 10.0,
+    IncidentSeverity.HIGH: 7.0,
+    IncidentSeverity.MEDIUM: 4.0,
+    IncidentSeverity.LOW: 2.0,
+}
+
+ASSESSMENT_CACHE_SIZE = 256
+# Seconds an assessment is reused; recency and trend scores depend on the current date
+ASSESSMENT_CACHE_TTL = 300.0
+
+# Established oracle providers (lowercase) that lower oracle risk
+_TRUSTED_ORACLES = frozenset({"chainlink", "pyth", "redstone", "band", "api3", "uma"})
+
 
 class RiskCalculator:
     """Calculate risk metrics for DeFi protocols."""
@@ -30,6 +50,12 @@ class RiskCalculator:
     CONCENTRATION_LOW = 50  # 50% on one chain is concerning
     CONCENTRATION_HIGH = 80  # 80% on one chain is high risk
 
+    def __init__(self) -> None:
+        # Protocol fingerprint -> (time.monotonic() of assessment, assessment)
+        self._cache: dict[tuple[Any, ...], tuple[float, RiskAssessment]] = {}
+        # RiskAgent assesses on worker threads, so memo reads and evictions are serialized
+        self._cache_lock = threading.Lock()
+
     def calculate_tvl_volatility(self, history: list[TVLDataPoint]) -> float:
         """Calculate TVL volatility as coefficient of variation."""
         if len(history) < 2:
@@ -39,20 +65,29 @@ class RiskCalculator:
         if len(tvls) < 2:
             return 0.0
 
-        mean = statistics.mean(tvls)
+        # Float two-pass mean/variance; the statistics module's exact fraction
+        # arithmetic is ~15x slower and agrees to within rounding
+        n = len(tvls)
+        mean = math.fsum(tvls) / n
         if mean == 0:
             return 0.0
 
-        stdev = statistics.stdev(tvls)
-        return stdev / mean
+        variance = math.fsum([(tvl - mean) ** 2 for tvl in tvls]) / (n - 1)
+        return math.sqrt(variance) / mean
 
-    def calculate_tvl_trend(self, history: list[TVLDataPoint], days: int = 30) -> float:
-        """Calculate TVL trend over specified days as percentage change."""
+    def calculate_tvl_trend(
+        self, history: list[TVLDataPoint], days: int = 30, now: datetime | None = None
+    ) -> float:
+        """Calculate TVL trend over specified days (ending at now) as percentage change."""
         if len(history) < 2:
             return 0.0
 
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        recent = [p for p in history if p.date >= cutoff]
+        cutoff = (now or _utcnow_naive()) - timedelta(days=days)
+        if history[0].date <= history[-1].date:
+            # Ascending, as DefiLlama returns it: binary search for the cutoff
+            recent = history[bisect.bisect_left(history, cutoff, key=_point_date) :]
+        else:
+            recent = [p for p in history if p.date >= cutoff]
 
         if len(recent) < 2:
             recent = history[-min(len(history), 30) :]
@@ -73,16 +108,16 @@ class RiskCalculator:
         if not chain_tvls:
             return 0.0
 
-        # HHI: sum of squared market shares
-        hhi = sum((c.percentage / 100) ** 2 for c in chain_tvls)
-        # Normalize to 0-100 scale
-        return hhi * 100
+        # HHI: sum of squared market shares, normalized to a 0-100 scale. Squaring
+        # percentages and scaling once is sum((p / 100) ** 2) * 100 without the
+        # per-chain division and pow
+        return sum([c.percentage * c.percentage for c in chain_tvls]) / 100
 
-    def assess_tvl_risk(self, protocol: ProtocolData) -> RiskFactor:
+    def assess_tvl_risk(self, protocol: ProtocolData, now: datetime | None = None) -> RiskFactor:
         """Assess risk based on TVL size and trends."""
         tvl = protocol.tvl
         volatility = self.calculate_tvl_volatility(protocol.tvl_history)
-        trend = protocol.tvl_change_30d or self.calculate_tvl_trend(protocol.tvl_history)
+        trend = protocol.tvl_change_30d or self.calculate_tvl_trend(protocol.tvl_history, now=now)
 
         # Size component (larger = safer)
         if tvl >= self.TVL_HIGH_THRESHOLD:
@@ -212,9 +247,6 @@ class RiskCalculator:
         """Assess risk based on oracle usage."""
         oracles = protocol.oracles
 
-        trusted_oracles = {"chainlink", "pyth", "redstone", "band", "api3", "uma"}
-        uses_trusted = any(o.lower() in trusted_oracles for o in oracles)
-
         if not oracles:
             # Many protocols don't need oracles
             return RiskFactor(
@@ -225,6 +257,8 @@ class RiskCalculator:
                 details="Protocol may not require price feeds or uses internal pricing",
             )
 
+        uses_trusted = any(o.lower() in _TRUSTED_ORACLES for o in oracles)
+
         if uses_trusted and len(oracles) >= 1:
             score = 2.0
             description = f"Uses trusted oracle(s): {', '.join(oracles[:3])}"
@@ -246,7 +280,9 @@ class RiskCalculator:
             details=details,
         )
 
-    def assess_incident_risk(self, protocol: ProtocolData) -> RiskFactor:
+    def assess_incident_risk(
+        self, protocol: ProtocolData, now: datetime | None = None
+    ) -> RiskFactor:
         """Assess risk based on historical incidents."""
         incidents = protocol.incidents
 
@@ -259,10 +295,16 @@ class RiskCalculator:
                 details="Clean security track record with no major exploits on record",
             )
 
-        # Calculate recency score (more recent = worse)
-        now = datetime.utcnow()
+        # One pass over the incidents accumulates every score and count below
+        now = now or _utcnow_naive()
         recency_score = 0.0
+        severity_score = 0.0
+        unfixed_count = 0
+        critical_count = 0
+        high_count = 0
+        total_loss = 0.0
         for incident in incidents:
+            # Recency (more recent = worse)
             days_ago = (now - incident.date).days
             if days_ago <= 30:
                 recency_score += 10
@@ -275,35 +317,27 @@ class RiskCalculator:
             else:
                 recency_score += 1
 
-        # Normalize recency score (cap at 10)
-        recency_score = min(10.0, recency_score / len(incidents))
+            severity = incident.severity
+            severity_score += _SEVERITY_WEIGHTS.get(severity, 5.0)
+            if severity == IncidentSeverity.CRITICAL:
+                critical_count += 1
+            elif severity == IncidentSeverity.HIGH:
+                high_count += 1
 
-        # Calculate severity score
-        severity_score = 0.0
-        severity_weights = {
-            IncidentSeverity.CRITICAL: 10,
-            IncidentSeverity.HIGH: 7,
-            IncidentSeverity.MEDIUM: 4,
-            IncidentSeverity.LOW: 2,
-        }
-        for incident in incidents:
-            severity_score += severity_weights.get(incident.severity, 5)
+            # Resolution (unfixed = higher risk)
+            if not incident.fixed:
+                unfixed_count += 1
+            total_loss += incident.amount_lost_usd
 
-        # Normalize severity score
+        # Normalize scores (cap at 10)
+        recency_score = min(10.0, recency_score / len(incidents))
         severity_score = min(10.0, severity_score / len(incidents))
-
-        # Calculate resolution score (unfixed = higher risk)
-        unfixed_count = sum(1 for i in incidents if not i.fixed)
         resolution_score = min(10.0, (unfixed_count / len(incidents)) * 10)
 
         # Final weighted score: 50% recency + 40% severity + 10% resolution
         final_score = (recency_score * 0.5) + (severity_score * 0.4) + (resolution_score * 0.1)
 
         # Generate description
-        critical_count = sum(1 for i in incidents if i.severity == IncidentSeverity.CRITICAL)
-        high_count = sum(1 for i in incidents if i.severity == IncidentSeverity.HIGH)
-        total_loss = sum(i.amount_lost_usd for i in incidents)
-
         if critical_count > 0:
             description = f"{len(incidents)} incident(s), {critical_count} critical (${total_loss / 1e6:.1f}M lost)"
         elif high_count > 0:
@@ -339,33 +373,61 @@ class RiskCalculator:
         if not factors:
             return RiskScore(overall=5.0, level=RiskLevel.MEDIUM, factors=[])
 
-        total_weight = sum(f.weight for f in factors)
+        total_weight = 0.0
+        weighted_sum = 0.0
+        for factor in factors:
+            weight = factor.weight
+            total_weight += weight
+            weighted_sum += factor.score * weight
         if total_weight == 0:
             return RiskScore(overall=5.0, level=RiskLevel.MEDIUM, factors=factors)
 
-        weighted_sum = sum(f.score * f.weight for f in factors)
         overall = weighted_sum / total_weight
 
         return RiskScore.from_score(overall, factors)
 
     def assess_protocol(self, protocol: ProtocolData) -> RiskAssessment:
-        """Perform complete risk assessment on a protocol."""
-        factors = [
-            self.assess_tvl_risk(protocol),
-            self.assess_chain_risk(protocol),
-            self.assess_audit_risk(protocol),
-            self.assess_oracle_risk(protocol),
-            self.assess_incident_risk(protocol),
-        ]
+        """
+        Perform complete risk assessment on a protocol.
+
+        Protocols with identical scoring inputs (e.g. repeat fetches of a cached
+        DefiLlama response) reuse an assessment made within ASSESSMENT_CACHE_TTL.
+        """
+        key = _fingerprint(protocol)
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._cache.pop(key, None)
+            if cached is not None and now - cached[0] < ASSESSMENT_CACHE_TTL:
+                self._cache[key] = cached  # Most recently used goes last
+                # Deep copies in and out, so callers can't mutate the score or lists it holds
+                return cached[1].model_copy(update={"assessed_at": datetime.now(UTC)}, deep=True)
+
+        # Scored outside the lock; concurrent misses for one key each score it once
+        assessment = self._assess_protocol(protocol)
+        with self._cache_lock:
+            self._cache.pop(key, None)
+            if len(self._cache) >= ASSESSMENT_CACHE_SIZE:
+                # Dicts preserve insertion order, so the first key is the least recently used
+                del self._cache[next(iter(self._cache))]
+            self._cache[key] = (now, assessment.model_copy(deep=True))
+        return assessment
+
+    def _assess_protocol(self, protocol: ProtocolData) -> RiskAssessment:
+        """Score every risk factor and assemble the assessment."""
+        # One clock read so every time-dependent factor scores against the same instant,
+        # stamped aware like cache hits and compared naive like protocol dates
+        assessed_at = datetime.now(UTC)
+        now = assessed_at.replace(tzinfo=None)
+        tvl_factor = self.assess_tvl_risk(protocol, now)
+        chain_factor = self.assess_chain_risk(protocol)
+        audit_factor = self.assess_audit_risk(protocol)
+        oracle_factor = self.assess_oracle_risk(protocol)
+        incident_factor = self.assess_incident_risk(protocol, now)
+        factors = [tvl_factor, chain_factor, audit_factor, oracle_factor, incident_factor]
 
         score = self.calculate_overall_risk(factors)
 
         # Generate analysis summaries
-        tvl_factor = next(f for f in factors if f.name == "TVL Risk")
-        chain_factor = next(f for f in factors if f.name == "Chain Concentration")
-        audit_factor = next(f for f in factors if f.name == "Audit Status")
-        incident_factor = next(f for f in factors if f.name == "Incident History")
-
         tvl_analysis = f"{tvl_factor.description}. {tvl_factor.details}"
         chain_analysis = f"{chain_factor.description}. {chain_factor.details}"
         audit_analysis = f"{audit_factor.description}. {audit_factor.details}"
@@ -402,8 +464,53 @@ class RiskCalculator:
             incident_analysis=incident_analysis,
             recommendations=recommendations,
             warnings=warnings,
+            assessed_at=assessed_at,
         )
 
+    def assess_batch(self, protocols: Sequence[ProtocolData]) -> list[RiskAssessment]:
+        """
+        Assess several protocols, returning assessments in input order.
+
+        Compare workflows reach this through RiskAgent.aassess_protocols. Scoring
+        stays per protocol: each factor's thresholds are a few float comparisons,
+        and the time goes to building descriptions and models.
+        """
+        assess = self.assess_protocol
+        return [assess(protocol) for protocol in protocols]
+
+
+def _utcnow_naive() -> datetime:
+    """Current UTC time without tzinfo, the clock scoring measures protocol dates against.
+
+    TVL history and incident dates are naive UTC, and naive and aware datetimes
+    don't compare, so scoring stays naive on purpose.
+    """
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def _point_date(point: TVLDataPoint) -> datetime:
+    """Sort key for TVL history points."""
+    return point.date
+
+
+def _fingerprint(protocol: ProtocolData) -> tuple[Any, ...]:
+    """Everything assess_protocol reads from a protocol, as a hashable key."""
+    return (
+        protocol.name,
+        protocol.slug,
+        protocol.tvl,
+        protocol.tvl_change_30d,
+        tuple((point.date, point.tvl) for point in protocol.tvl_history),
+        tuple(protocol.chains),
+        tuple((c.chain, c.percentage) for c in protocol.chain_tvls),
+        tuple(protocol.audits),
+        tuple(protocol.audit_links),
+        tuple(protocol.oracles),
+        tuple(
+            (i.date, i.severity, i.fixed, i.amount_lost_usd, i.title) for i in protocol.incidents
+        ),
+    )
+
 
 # Singleton instance
 _calculator: RiskCalculator | None = None
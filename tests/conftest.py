@@ -0,0 +1,48 @@
+"""Shared test fixtures."""
+
+import pytest
+
+from src.agents.report_agent import ReportAgent
+from src.graph.workflow import DeFiRiskWorkflow, compile_workflow
+from src.tools.risk_metrics import RiskCalculator
+
+try:
+    import uvloop
+except ImportError:  # uvloop is unavailable on Windows
+    uvloop = None
+
+if uvloop is not None:
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_asyncio_loop_factories(config, item):
+        """Run async tests on uvloop, the event loop the CLI uses."""
+        return {"uvloop": uvloop.new_event_loop}
+
+
+@pytest.fixture(scope="session")
+def calculator():
+    """
+    Create risk calculator, shared across the session.
+
+    Its assessment memo only returns results for protocols with identical scoring
+    inputs, so sharing it does not change the scores a test sees.
+    """
+    return RiskCalculator()
+
+
+@pytest.fixture(scope="session")
+def report_agent():
+    """Create report agent, shared across the session."""
+    return ReportAgent()
+
+
+@pytest.fixture(scope="session")
+def compiled_app():
+    """Compile the workflow graph once per session."""
+    return compile_workflow()
+
+
+@pytest.fixture(scope="session")
+def workflow(compiled_app):
+    """Create workflow instance, shared across the session (the compiled graph is immutable)."""
+    return DeFiRiskWorkflow(app=compiled_app)
@@ -1,8 +1,17 @@
 """Tests for agent implementations."""
 
+import asyncio
+import json
+
 import pytest
+from langchain_core.language_models.fake_chat_models import (
+    FakeListChatModel,
+    GenericFakeChatModel,
+)
+from langchain_core.messages import AIMessage
 
 from src.agents.data_agent import DataAgent
+from src.agents.llm_analyst import LLMAnalyst, format_protocol_for_llm
 from src.agents.report_agent import ReportAgent
 from src.agents.risk_agent import RiskAgent
 from src.agents.supervisor import SupervisorAgent
@@ -14,6 +23,8 @@ from src.models.schemas import (
     RiskLevel,
     RiskScore,
 )
+from src.tools.defillama import DefiLlamaError
+from src.tools.risk_metrics import RiskCalculator
 
 
 @pytest.fixture
@@ -147,6 +158,34 @@ class TestSupervisorAgent:
         assert "compound" in protocols
         assert len(protocols) == 3
 
+    def test_parse_query_fallback_skips_non_alpha_words(self):
+        """Test that fallback extraction ignores words containing digits or symbols."""
+        supervisor = SupervisorAgent()
+
+        _, protocols = supervisor.parse_query("analyze nonexistent_xyz123")
+        assert protocols == []
+
+        _, protocols = supervisor.parse_query("compare foo, bar! foo")
+        assert protocols == ["foo", "bar"]
+
+    def test_parse_query_intent_whole_words(self):
+        """Test that intent keywords only match whole words."""
+        supervisor = SupervisorAgent()
+
+        intent, _ = supervisor.parse_query("show metadata info for aave")
+        assert intent == "data"
+
+        intent, _ = supervisor.parse_query("how risky is lido compared to aave?")
+        assert intent == "compare"
+
+    def test_parse_query_order_and_longest_match(self):
+        """Test protocols are returned in query order, preferring the longest name."""
+        supervisor = SupervisorAgent()
+
+        _, protocols = supervisor.parse_query("compare makerdao vs rocket pool and aave")
+
+        assert protocols == ["makerdao", "rocket-pool", "aave"]
+
     @pytest.mark.asyncio
     async def test_run_with_valid_query(self):
         """Test running supervisor with valid query."""
@@ -168,6 +207,8 @@ class TestSupervisorAgent:
         assert result["protocol_names"] == ["aave"]
         assert result["next_agent"] == "data_agent"
         assert result["error"] is None
+        assert len(result["messages"]) == 1
+        assert state["messages"] == []
 
     @pytest.mark.asyncio
     async def test_run_with_empty_query(self):
@@ -203,6 +244,91 @@ class TestDataAgent:
         assert "TVL" in summary
         assert "Ethereum" in summary
 
+    def test_format_protocol_summary_tracks_tvl(self, sample_protocol: ProtocolData):
+        """Test that the summary shows the current TVL after the protocol changes."""
+        agent = DataAgent()
+        protocol = sample_protocol.model_copy()
+        agent.format_protocol_summary(protocol)
+
+        protocol.tvl = 2.5e9
+
+        assert "$2.50B" in agent.format_protocol_summary(protocol)
+        assert "$2.50B" in agent.format_protocol_summary(
+            sample_protocol.model_copy(update={"tvl": 2.5e9})
+        )
+
+    @pytest.mark.asyncio
+    async def test_fetch_protocols_partial_failure(self, sample_protocol: ProtocolData):
+        """Test that failed fetches are skipped while others succeed."""
+
+        class StubClient:
+            async def fetch_protocol_data(self, name: str) -> ProtocolData:
+                if name == "missing":
+                    raise DefiLlamaError(f"Protocol '{name}' not found")
+                return sample_protocol
+
+        agent = DataAgent(client=StubClient())
+
+        results = await agent.fetch_protocols(["aave", "missing"])
+
+        assert list(results) == ["aave"]
+
+        result = await agent.run({"protocol_names": ["aave", "missing"]})
+
+        assert result["error"] is None
+        assert list(result["protocol_data"]) == ["aave"]
+        assert "Could not fetch: missing" in result["messages"][0]["content"]
+
+    @pytest.mark.asyncio
+    async def test_fetch_protocols_bounded_concurrency(self, sample_protocol: ProtocolData):
+        """Test that concurrent fetches never exceed max_in_flight."""
+        in_flight = 0
+        peak = 0
+
+        class StubClient:
+            async def fetch_protocol_data(self, name: str) -> ProtocolData:
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.01)
+                in_flight -= 1
+                return sample_protocol.model_copy(update={"slug": name})
+
+        agent = DataAgent(client=StubClient(), max_in_flight=2)
+
+        results = await agent.fetch_protocols([f"p{i}" for i in range(6)])
+
+        assert len(results) == 6
+        assert peak == 2
+
+    def test_fetch_protocols_across_event_loops(self, sample_protocol: ProtocolData):
+        """Test that a shared agent keeps its concurrency limit usable on every new loop."""
+
+        class StubClient:
+            async def fetch_protocol_data(self, name: str) -> ProtocolData:
+                await asyncio.sleep(0)
+                return sample_protocol.model_copy(update={"slug": name})
+
+        agent = DataAgent(client=StubClient(), max_in_flight=1)
+        names = ["p0", "p1", "p2"]  # More than max_in_flight, so fetches wait on the limit
+
+        # One asyncio.run per CLI command
+        assert list(asyncio.run(agent.fetch_protocols(names))) == names
+        assert list(asyncio.run(agent.fetch_protocols(names))) == names
+
+    @pytest.mark.asyncio
+    async def test_fetch_protocols_all_failed(self):
+        """Test that an error is raised when every fetch fails."""
+
+        class StubClient:
+            async def fetch_protocol_data(self, name: str) -> ProtocolData:
+                raise DefiLlamaError(f"Protocol '{name}' not found")
+
+        agent = DataAgent(client=StubClient())
+
+        with pytest.raises(DefiLlamaError, match="Failed to fetch all protocols"):
+            await agent.fetch_protocols(["foo", "bar"])
+
 
 class TestRiskAgent:
     """Tests for RiskAgent."""
@@ -218,6 +344,30 @@ class TestRiskAgent:
         assert assessment.score.overall <= 10
         assert len(assessment.score.factors) == 5
 
+    @pytest.mark.asyncio
+    async def test_aassess_protocols(
+        self, sample_protocol: ProtocolData, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Test threaded assessment is one calculator batch matching the synchronous path."""
+        agent = RiskAgent(calculator=RiskCalculator())
+        batches = []
+        assess_batch = agent.calculator.assess_batch
+        monkeypatch.setattr(
+            agent.calculator, "assess_batch", lambda ps: batches.append(ps) or assess_batch(ps)
+        )
+        protocols = {
+            "aave": sample_protocol,
+            "other": sample_protocol.model_copy(update={"name": "Other", "slug": "other"}),
+        }
+
+        assessments = await agent.aassess_protocols(protocols)
+
+        assert batches == [list(protocols.values())]
+        assert list(assessments) == ["aave", "other"]
+        assert assessments["other"].protocol_name == "Other"
+        expected = agent.assess_protocols(protocols)["aave"].score.overall
+        assert assessments["aave"].score.overall == expected
+
     def test_format_assessment(self, sample_assessment: RiskAssessment):
         """Test formatting assessment."""
         agent = RiskAgent()
@@ -287,6 +437,72 @@ class TestReportAgent:
         assert report.detailed_analysis
         assert len(report.data_sources) > 0
 
+    def test_generate_report_without_narrative(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test generating a structured-only report skips the markdown sections."""
+        agent = ReportAgent()
+
+        report = agent.generate_report(sample_protocol, sample_assessment, narrative=False)
+
+        assert report.assessment.protocol_name == "Aave"
+        assert report.executive_summary == ""
+        assert report.detailed_analysis == ""
+
+    @pytest.mark.asyncio
+    async def test_run_returns_state_update(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test that run returns only the keys it changes."""
+        agent = ReportAgent()
+        state = {
+            "messages": [{"role": "assistant", "content": "earlier", "agent": "data_agent"}],
+            "query": "analyze aave",
+            "protocol_names": ["aave"],
+            "protocol_data": {"aave": sample_protocol},
+            "risk_assessments": {"aave": sample_assessment},
+            "report": None,
+            "current_agent": "risk_agent",
+            "next_agent": "report_agent",
+            "error": None,
+        }
+
+        result = await agent.run(state)
+
+        assert "query" not in result
+        assert len(result["messages"]) == 1
+        assert result["report"].protocol.name == "Aave"
+        assert len(state["messages"]) == 1
+
+    def test_generate_comparison_report_ranking(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test that comparison reports rank the lower-risk protocol first."""
+        agent = ReportAgent()
+        safer_protocol = sample_protocol.model_copy(update={"name": "Safer", "slug": "safer"})
+        safer_assessment = sample_assessment.model_copy(
+            update={"score": sample_assessment.score.model_copy(update={"overall": 1.0})}
+        )
+
+        report = agent.generate_comparison_report(
+            [sample_protocol, safer_protocol], [sample_assessment, safer_assessment]
+        )
+
+        assert "1. **Safer**" in report.comparison_summary
+        assert "2. **Aave**" in report.comparison_summary
+        assert "**Safer** presents the lowest" in report.recommendation
+
+    def test_serialize_matches_pydantic_json(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test that orjson serialization matches pydantic's JSON output."""
+        agent = ReportAgent()
+        report = agent.generate_report(sample_protocol, sample_assessment)
+
+        serialized = agent.serialize(report)
+
+        assert json.loads(serialized) == json.loads(report.model_dump_json())
+
     def test_format_report(self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment):
         """Test formatting report as markdown."""
         agent = ReportAgent()
@@ -297,3 +513,97 @@ class TestReportAgent:
         assert "# DeFi Risk Report" in formatted
         assert "Executive Summary" in formatted
         assert "Data Sources" in formatted
+
+    def test_iter_report_sections(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test that report sections rejoin into the full markdown report."""
+        agent = ReportAgent()
+        report = agent.generate_report(sample_protocol, sample_assessment)
+
+        sections = list(agent.iter_report_sections(report))
+
+        assert sections[0].startswith("# DeFi Risk Report")
+        assert all(section.startswith("---\n") for section in sections[1:])
+        assert "\n".join(sections) == agent.format_report(report)
+
+
+class TestLLMAnalyst:
+    """Tests for LLM analyst prompt formatting."""
+
+    def test_format_protocol_for_llm(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test that factor scores are included in the LLM prompt."""
+        formatted = format_protocol_for_llm(sample_protocol, sample_assessment)
+
+        assert "Protocol: Aave" in formatted
+        assert "TVL Risk: 2.5/10" in formatted
+        assert "Incident History: 2.0/10" in formatted
+
+    def test_format_protocol_for_llm_missing_factor(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test that missing factors are reported as N/A."""
+        sample_assessment.score.factors = []
+
+        formatted = format_protocol_for_llm(sample_protocol, sample_assessment)
+
+        assert "Oracle Risk: N/A/10" in formatted
+
+    def test_analyze_reuses_formatted_protocol(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test that repeated prompts for the same snapshot share one formatted block."""
+        analyst = LLMAnalyst(llm=FakeListChatModel(responses=["insight"]))
+
+        assert analyst.analyze(sample_protocol, sample_assessment) == "insight"
+        analyst.answer_question("Is it safe?", sample_protocol, sample_assessment)
+
+        assert len(analyst._fmt_cache) == 1
+
+    @pytest.mark.asyncio
+    async def test_aanalyze_returns_text_of_content_blocks(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test that a response made of content blocks is returned as plain text."""
+        blocks = [{"type": "text", "text": "Low"}, {"type": "text", "text": " risk"}]
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content=blocks)]))
+        analyst = LLMAnalyst(llm=llm)
+
+        assert await analyst.aanalyze(sample_protocol, sample_assessment) == "Low risk"
+
+    @pytest.mark.asyncio
+    async def test_analyze_many(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test concurrent per-protocol analysis returns one result per protocol."""
+        analyst = LLMAnalyst(llm=FakeListChatModel(responses=["insight"]))
+
+        results = await analyst.analyze_many(
+            [sample_protocol, sample_protocol], [sample_assessment, sample_assessment]
+        )
+
+        assert results == ["insight", "insight"]
+
+    @pytest.mark.asyncio
+    async def test_acompare(self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment):
+        """Test async comparison analysis."""
+        analyst = LLMAnalyst(llm=FakeListChatModel(responses=["comparison"]))
+
+        result = await analyst.acompare([sample_protocol], [sample_assessment])
+
+        assert result == "comparison"
+
+    @pytest.mark.asyncio
+    async def test_acompare_large_batch(
+        self, sample_protocol: ProtocolData, sample_assessment: RiskAssessment
+    ):
+        """Test that large comparison batches are formatted off the event loop."""
+        analyst = LLMAnalyst(llm=FakeListChatModel(responses=["comparison"]))
+        protocols = [sample_protocol.model_copy(update={"slug": f"p{i}"}) for i in range(10)]
+
+        result = await analyst.acompare(protocols, [sample_assessment] * 10)
+
+        assert result == "comparison"
+        assert len(analyst._fmt_cache) == 10
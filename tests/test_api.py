@@ -1,5 +1,7 @@
 """Tests for FastAPI endpoints."""
 
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -31,6 +33,7 @@ def test_health_check(client: TestClient):
     assert data["version"] == "0.1.0"
 
 
+@pytest.mark.integration
 def test_list_protocols(client: TestClient):
     """Test listing protocols."""
     response = client.get("/protocols?limit=10")
@@ -48,6 +51,7 @@ def test_list_protocols(client: TestClient):
         assert "tvl" in first
 
 
+@pytest.mark.integration
 def test_analyze_protocol(client: TestClient):
     """Test analyzing a protocol."""
     response = client.post("/analyze/aave")
@@ -73,6 +77,7 @@ def test_analyze_protocol_not_found(client: TestClient):
     assert "not found" in detail or "could not identify" in detail
 
 
+@pytest.mark.integration
 def test_compare_protocols(client: TestClient):
     """Test comparing protocols."""
     response = client.post("/compare", json={"protocols": ["aave", "compound"]})
@@ -106,3 +111,155 @@ def test_compare_protocols_too_many(client: TestClient):
 
     # Pydantic validation returns 422 for invalid input
     assert response.status_code == 422
+
+
+def test_list_protocols_cached(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    """Test that repeated /protocols calls reuse one DefiLlama fetch."""
+    import src.api.main as api_module
+    import src.tools.defillama as defillama_module
+
+    calls = 0
+
+    class StubClient:
+        async def get_protocols(self):
+            nonlocal calls
+            calls += 1
+            return [
+                {"name": "Small", "slug": "small", "tvl": 1.0},
+                {"name": "Big", "slug": "big", "tvl": 100.0},
+            ]
+
+    monkeypatch.setattr(api_module, "_protocols_cache", None)
+    monkeypatch.setattr(defillama_module, "get_client", lambda: StubClient())
+
+    first = client.get("/protocols?limit=1").json()
+    second = client.get("/protocols?limit=2").json()
+
+    assert calls == 1
+    assert [p["slug"] for p in first] == ["big"]
+    assert [p["slug"] for p in second] == ["big", "small"]
+
+
+def test_analyze_protocol_cached(monkeypatch: pytest.MonkeyPatch):
+    """Test that concurrent and repeated /analyze calls share one workflow run."""
+    import asyncio
+
+    import src.api.main as api_module
+
+    calls = 0
+    report = object()
+
+    class StubWorkflow:
+        async def analyze(self, protocol: str):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return report
+
+    monkeypatch.setattr(api_module, "workflow", StubWorkflow())
+    monkeypatch.setattr(api_module, "_report_cache", {})
+
+    async def run():
+        first = await asyncio.gather(*(api_module.analyze_protocol("Aave") for _ in range(5)))
+        second = await api_module.analyze_protocol("aave")
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert calls == 1
+    assert all(r is report for r in first)
+    assert second is report
+    assert not api_module._report_inflight
+
+
+def test_analyze_protocol_error_not_cached(monkeypatch: pytest.MonkeyPatch):
+    """Test that failed /analyze runs are shared with waiters but not cached."""
+    import asyncio
+
+    import src.api.main as api_module
+
+    calls = 0
+
+    class StubWorkflow:
+        async def analyze(self, protocol: str):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("Protocol not found")
+
+    monkeypatch.setattr(api_module, "workflow", StubWorkflow())
+    monkeypatch.setattr(api_module, "_report_cache", {})
+
+    async def run():
+        return await asyncio.gather(
+            *(api_module.analyze_protocol("unknown") for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(r.status_code == 400 for r in results)
+
+    asyncio.run(run())
+    assert calls == 2
+
+
+@pytest.fixture
+def stub_workflow(monkeypatch: pytest.MonkeyPatch):
+    """Install a workflow whose DataAgent serves a fixed protocol without network access."""
+    import src.api.main as api_module
+    from src.agents.data_agent import get_data_agent
+    from src.models.schemas import ChainBreakdown, ProtocolData
+
+    protocol = ProtocolData(
+        name="Aave",
+        slug="aave",
+        tvl=10_000_000_000,
+        chains=["Ethereum", "Polygon"],
+        chain_tvls=[
+            ChainBreakdown(chain="Ethereum", tvl=8_000_000_000, percentage=80),
+            ChainBreakdown(chain="Polygon", tvl=2_000_000_000, percentage=20),
+        ],
+        audit_links=["https://audit1.com"],
+        oracles=["Chainlink"],
+    )
+
+    class StubClient:
+        async def fetch_protocol_data(self, name: str) -> ProtocolData:
+            return protocol
+
+    monkeypatch.setattr(get_data_agent(), "client", StubClient())
+    monkeypatch.setattr(api_module, "workflow", DeFiRiskWorkflow())
+
+
+def test_run_query(stub_workflow):
+    """Test the buffered /query response, including agent messages."""
+    response = TestClient(app).post("/query", params={"query": "analyze aave"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["protocols_analyzed"] == ["aave"]
+    assert data["report_type"] == "risk_report"
+    assert data["report"]["protocol"]["slug"] == "aave"
+    assert [m["agent"] for m in data["agent_messages"]] == [
+        "supervisor",
+        "data_agent",
+        "risk_agent",
+        "report_agent",
+    ]
+
+
+def test_stream_query(stub_workflow):
+    """Test that /query/stream emits one event per agent step, then the result."""
+    response = TestClient(app).post("/query/stream", params={"query": "analyze aave"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names == ["message"] * 4 + ["result"]
+
+    result = json.loads(events[-1][1].removeprefix("data: "))
+    assert result["report_type"] == "risk_report"
+    assert result["report"]["protocol"]["slug"] == "aave"
@@ -1,8 +1,16 @@
 """Tests for DefiLlama client."""
 
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import httpx
 import pytest
+import respx
 
-from src.tools.defillama import DefiLlamaClient, DefiLlamaError
+from src.tools.defillama import BASE_URL, TVL_HISTORY_DAYS, DefiLlamaClient, DefiLlamaError
+from src.tools.rekt_scraper import RektScraper
 
 
 @pytest.fixture
@@ -12,6 +20,7 @@ def client():
 
 
 @pytest.mark.asyncio
+@pytest.mark.integration
 async def test_get_protocols(client: DefiLlamaClient):
     """Test fetching protocol list."""
     protocols = await client.get_protocols()
@@ -26,6 +35,7 @@ async def test_get_protocols(client: DefiLlamaClient):
 
 
 @pytest.mark.asyncio
+@pytest.mark.integration
 async def test_search_protocol_exact(client: DefiLlamaClient):
     """Test searching for protocol by exact name."""
     slug = await client.search_protocol("aave")
@@ -35,6 +45,7 @@ async def test_search_protocol_exact(client: DefiLlamaClient):
 
 
 @pytest.mark.asyncio
+@pytest.mark.integration
 async def test_search_protocol_partial(client: DefiLlamaClient):
     """Test searching for protocol by partial name."""
     slug = await client.search_protocol("uni")
@@ -43,6 +54,7 @@ async def test_search_protocol_partial(client: DefiLlamaClient):
 
 
 @pytest.mark.asyncio
+@pytest.mark.integration
 async def test_search_protocol_not_found(client: DefiLlamaClient):
     """Test searching for non-existent protocol."""
     slug = await client.search_protocol("nonexistent_protocol_xyz123")
@@ -51,6 +63,7 @@ async def test_search_protocol_not_found(client: DefiLlamaClient):
 
 
 @pytest.mark.asyncio
+@pytest.mark.integration
 async def test_fetch_protocol_data(client: DefiLlamaClient):
     """Test fetching detailed protocol data."""
     data = await client.fetch_protocol_data("aave")
@@ -61,6 +74,7 @@ async def test_fetch_protocol_data(client: DefiLlamaClient):
 
 
 @pytest.mark.asyncio
+@pytest.mark.integration
 async def test_fetch_protocol_not_found(client: DefiLlamaClient):
     """Test fetching non-existent protocol raises error."""
     with pytest.raises(DefiLlamaError, match="not found"):
@@ -68,6 +82,7 @@ async def test_fetch_protocol_not_found(client: DefiLlamaClient):
 
 
 @pytest.mark.asyncio
+@pytest.mark.integration
 async def test_caching(client: DefiLlamaClient):
     """Test that responses are cached."""
     # First call
@@ -78,3 +93,338 @@ async def test_caching(client: DefiLlamaClient):
 
     # Check cache has entry
     assert len(client._cache) > 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_protocol_prunes_unused_history(client: DefiLlamaClient):
+    """Test that per-chain/per-token histories are dropped and TVL history is capped."""
+    payload = {
+        "name": "Aave",
+        "tvl": [{"date": 1_700_000_000 + i * 86400, "totalLiquidityUSD": i} for i in range(200)],
+        "chainTvls": {"Ethereum": {"tvl": [], "tokens": []}},
+        "tokens": [],
+        "tokensInUsd": [],
+        "currentChainTvls": {"Ethereum": 1.0},
+    }
+    respx.get(f"{BASE_URL}/protocol/aave").mock(return_value=httpx.Response(200, json=payload))
+
+    data = await client.get_protocol("aave")
+
+    assert not {"chainTvls", "tokens", "tokensInUsd"} & data.keys()
+    assert data["currentChainTvls"] == {"Ethereum": 1.0}
+    assert len(data["tvl"]) == TVL_HISTORY_DAYS
+    assert data["tvl"][-1]["totalLiquidityUSD"] == 199
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_fetch_protocol_data_rounds_to_whole_usd(client: DefiLlamaClient):
+    """Test that TVL and market cap are quantized to whole dollars on ingest."""
+    respx.get(f"{BASE_URL}/protocols").mock(
+        return_value=httpx.Response(200, json=[{"name": "Aave", "slug": "aave"}])
+    )
+    payload = {
+        "name": "Aave",
+        "tvl": [
+            # Timestamps outside the datetime range are skipped
+            {"date": -1e15, "totalLiquidityUSD": 1.0},
+            {"date": 1e18, "totalLiquidityUSD": 1.0},
+            {"date": 1e20, "totalLiquidityUSD": 1.0},
+            {"date": 1_700_000_000, "totalLiquidityUSD": 1234.56},
+        ],
+        "currentChainTvls": {"Ethereum": 750.4, "Arbitrum": 249.6, "Base": 0.3},
+        "mcap": 98765.43,
+    }
+    respx.get(f"{BASE_URL}/protocol/aave").mock(return_value=httpx.Response(200, json=payload))
+
+    data = await client.fetch_protocol_data("aave")
+
+    assert data.tvl == 1000.0
+    assert [(c.chain, c.tvl) for c in data.chain_tvls] == [("Ethereum", 750.0), ("Arbitrum", 250.0)]
+    assert [p.tvl for p in data.tvl_history] == [1235.0]
+    assert data.mcap == 98765.0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_fetch_protocol_data_dates_tvl_history_in_utc(
+    client: DefiLlamaClient, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that TVL history dates are naive UTC whatever the local timezone."""
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    respx.get(f"{BASE_URL}/protocol/aave").mock(
+        return_value=httpx.Response(
+            200,
+            json={"name": "Aave", "tvl": [{"date": 1_704_067_200, "totalLiquidityUSD": 1.0}]},
+        )
+    )
+
+    try:
+        data = await client.fetch_protocol_data("aave")
+    finally:
+        monkeypatch.undo()  # Restore TZ before resetting the process timezone
+        time.tzset()
+
+    assert [p.date for p in data.tvl_history] == [datetime(2024, 1, 1)]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_fetch_protocol_data_scrapes_incidents_during_detail_fetch(
+    client: DefiLlamaClient, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that the incident scrape overlaps the protocol detail fetch."""
+    import src.tools.defillama as defillama
+
+    in_flight = 0
+    peak = 0
+    scraped = []
+
+    async def track():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    async def detail(request):
+        await track()
+        return httpx.Response(200, json={"name": "Aave", "currentChainTvls": {"Ethereum": 1.0}})
+
+    class StubScraper:
+        async def fetch_protocol_incidents(self, slug, name):
+            scraped.append((slug, name))
+            await track()
+            return []
+
+    monkeypatch.setattr(defillama, "get_scraper", StubScraper)
+    respx.get(f"{BASE_URL}/protocols").mock(
+        return_value=httpx.Response(200, json=[{"name": "Aave V3", "slug": "aave-v3"}])
+    )
+    respx.get(f"{BASE_URL}/protocol/aave").mock(return_value=httpx.Response(404))
+    respx.get(f"{BASE_URL}/protocol/aave-v3").mock(side_effect=detail)
+
+    data = await client.fetch_protocol_data("aave")
+
+    assert peak == 2
+    # Nothing is scraped for the missing "aave" slug
+    assert scraped == [("aave-v3", "Aave V3")]
+    assert data.slug == "aave-v3"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_fetch_protocol_data_by_slug_skips_protocol_list(
+    client: DefiLlamaClient, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that a query that is already a slug does not download the protocol list."""
+    import src.tools.defillama as defillama
+
+    class StubScraper:
+        async def fetch_protocol_incidents(self, slug, name):
+            return []
+
+    monkeypatch.setattr(defillama, "get_scraper", StubScraper)
+    protocols = respx.get(f"{BASE_URL}/protocols").mock(
+        return_value=httpx.Response(200, json=[{"name": "Aave V3", "slug": "aave-v3"}])
+    )
+    respx.get(f"{BASE_URL}/protocol/aave-v3").mock(
+        return_value=httpx.Response(200, json={"name": "Aave V3"})
+    )
+
+    data = await client.fetch_protocol_data("Aave-V3")
+    assert protocols.call_count == 0
+    assert (data.name, data.slug) == ("Aave V3", "aave-v3")
+
+    # Names that cannot be slugs go straight to search
+    data = await client.fetch_protocol_data("Aave V3")
+    assert protocols.call_count == 1
+    assert data.slug == "aave-v3"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_fetch_protocol_data_by_slug_matches_incidents_on_listed_name(
+    client: DefiLlamaClient, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that a slug query matches incidents on the listed name, not the slug."""
+    import src.tools.defillama as defillama
+
+    # Listed without a slug, so only the normalized name "badgerdao" can match it,
+    # while the slug "badger-dao" normalizes to itself
+    leaderboard = [{"protocol": "BadgerDAO", "amount": 120_000_000, "date": "2021-12-02"}]
+    scraper = RektScraper(cache_path=None)
+    monkeypatch.setattr(defillama, "get_scraper", lambda: scraper)
+    respx.get(RektScraper.LEADERBOARD_URL).mock(
+        return_value=httpx.Response(
+            200, text=f"<script>var leaderboard = {json.dumps(leaderboard)};</script>"
+        )
+    )
+    respx.get(f"{BASE_URL}/protocol/badger-dao").mock(
+        return_value=httpx.Response(200, json={"name": "BadgerDAO"})
+    )
+
+    data = await client.fetch_protocol_data("badger-dao")
+
+    assert [i.protocol_name for i in data.incidents] == ["BadgerDAO"]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_fetch_protocol_data_cancels_scrape_when_parsing_fails(
+    client: DefiLlamaClient, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that the incident scrape is not left pending when the detail cannot be parsed."""
+    import src.tools.defillama as defillama
+
+    class StubScraper:
+        async def fetch_protocol_incidents(self, slug, name):
+            await asyncio.sleep(10)
+            return []
+
+    monkeypatch.setattr(defillama, "get_scraper", StubScraper)
+    respx.get(f"{BASE_URL}/protocol/aave").mock(
+        return_value=httpx.Response(200, json={"name": "Aave", "currentChainTvls": []})
+    )
+
+    with pytest.raises(AttributeError):
+        await client.fetch_protocol_data("aave")
+    await asyncio.sleep(0)  # Let the cancellation be delivered
+    assert asyncio.all_tasks() == {asyncio.current_task()}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_fetch_protocol_data_resolution_ignores_cache(
+    client: DefiLlamaClient, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that a query resolves to the same protocol whether or not the list is cached."""
+    import src.tools.defillama as defillama
+
+    class StubScraper:
+        async def fetch_protocol_incidents(self, slug, name):
+            return []
+
+    monkeypatch.setattr(defillama, "get_scraper", StubScraper)
+    respx.get(f"{BASE_URL}/protocols").mock(
+        return_value=httpx.Response(200, json=[{"name": "Aave V3", "slug": "aave-v3"}])
+    )
+    respx.get(f"{BASE_URL}/protocol/aave").mock(
+        return_value=httpx.Response(200, json={"name": "Aave"})
+    )
+
+    cold = await client.fetch_protocol_data("aave")
+    await client.get_protocols()
+    warm = await client.fetch_protocol_data("aave")
+
+    assert cold.slug == warm.slug == "aave"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_fetch_protocol_data_server_errors_do_not_fall_back_to_search(
+    client: DefiLlamaClient, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that only a missing slug falls back to search; other errors propagate."""
+    import src.http
+    import src.tools.defillama as defillama
+
+    class StubScraper:
+        async def fetch_protocol_incidents(self, slug, name):
+            return []
+
+    monkeypatch.setattr(defillama, "get_scraper", StubScraper)
+    monkeypatch.setattr(src.http, "RETRY_BASE_DELAY", 0.0)
+    protocols = respx.get(f"{BASE_URL}/protocols").mock(return_value=httpx.Response(200, json=[]))
+    respx.get(f"{BASE_URL}/protocol/aave").mock(return_value=httpx.Response(503))
+
+    with pytest.raises(DefiLlamaError, match="API error: 503"):
+        await client.fetch_protocol_data("aave")
+    assert protocols.call_count == 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_concurrent_requests_share_one_call(client: DefiLlamaClient):
+    """Test that concurrent cold requests for one URL issue a single HTTP call."""
+
+    async def slow_success(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json=[{"name": "Aave", "slug": "aave"}])
+
+    route = respx.get(f"{BASE_URL}/protocols").mock(side_effect=slow_success)
+
+    results = await asyncio.gather(*(client.get_protocols() for _ in range(5)))
+
+    assert route.call_count == 1
+    assert all(result == [{"name": "Aave", "slug": "aave"}] for result in results)
+    assert not client._inflight
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_concurrent_request_errors_are_shared(client: DefiLlamaClient):
+    """Test that a failed shared request raises for every waiter and is not cached."""
+
+    async def slow_failure(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.01)
+        return httpx.Response(403)
+
+    route = respx.get(f"{BASE_URL}/protocols").mock(side_effect=slow_failure)
+
+    results = await asyncio.gather(
+        *(client.get_protocols() for _ in range(3)), return_exceptions=True
+    )
+
+    assert route.call_count == 1
+    assert all(isinstance(result, DefiLlamaError) for result in results)
+    assert not client._cache
+
+
+def test_cache_evicts_least_recently_used():
+    """Test that the response cache is bounded and evicts the least recently used entry."""
+    client = DefiLlamaClient(cache_size=2)
+    client._set_cache("a", 1)
+    client._set_cache("b", 2)
+
+    assert client._get_cached("a") == 1  # "a" is now the most recently used
+    client._set_cache("c", 3)
+
+    assert client._get_cached("b") is None
+    assert client._get_cached("a") == 1
+    assert client._get_cached("c") == 3
+
+
+def test_cache_expires_entries():
+    """Test that entries older than the TTL are dropped on lookup."""
+    client = DefiLlamaClient()
+    client._set_cache("a", 1)
+    client._cache_ttl = 0
+
+    assert client._get_cached("a") is None
+    assert "a" not in client._cache
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_search_protocol_index(client: DefiLlamaClient):
+    """Test exact and partial search semantics against a mocked protocol list."""
+    respx.get(f"{BASE_URL}/protocols").mock(
+        return_value=httpx.Response(
+            200,
+            json=[
+                {"name": "Uniswap V3", "slug": "uniswap-v3"},
+                {"name": "Aave", "slug": "aave-v3"},
+                {"name": "Aave V2", "slug": "aave"},
+            ],
+        )
+    )
+
+    # Earlier protocols win exact matches, whether on name or slug
+    assert await client.search_protocol("AAVE") == "aave-v3"
+    assert await client.search_protocol("aave v2") == "aave"
+    assert await client.search_protocol("uni") == "uniswap-v3"
+    assert await client.search_protocol("v2") == "aave"
+    assert await client.search_protocol("missing") is None
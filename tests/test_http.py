@@ -0,0 +1,117 @@
+"""Tests for shared HTTP clients."""
+
+import asyncio
+
+import httpx
+import pytest
+import respx
+
+from src import http
+
+
+def test_client_is_shared():
+    """Test that the sync client is created once."""
+    assert http.client() is http.client()
+
+
+def test_async_client_per_event_loop():
+    """Test that the async client is reused within a loop and rebuilt for a new one."""
+
+    async def get_twice():
+        return http.async_client(), http.async_client()
+
+    first, again = asyncio.run(get_twice())
+    second, _ = asyncio.run(get_twice())
+
+    assert first is again
+    assert second is not first
+
+
+def test_aclose_closes_the_running_loops_client():
+    """Test that each loop closes its own client, not one another loop opened later."""
+
+    async def get():
+        return http.async_client()
+
+    loop_a, loop_b = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        client_a = loop_a.run_until_complete(get())
+        client_b = loop_b.run_until_complete(get())
+
+        loop_a.run_until_complete(http.aclose())
+
+        assert client_a.is_closed
+        assert not client_b.is_closed
+        assert loop_b.run_until_complete(get()) is client_b
+
+        loop_b.run_until_complete(http.aclose())
+
+        assert client_b.is_closed
+    finally:
+        loop_a.close()
+        loop_b.close()
+
+
+@respx.mock
+async def test_get_with_retry_retries_transient_errors(monkeypatch):
+    """Test that 429/5xx responses are retried and Retry-After is honored."""
+    delays = []
+
+    async def record(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(http, "_sleep", record)
+    route = respx.get("https://example.com/").mock(
+        side_effect=[
+            httpx.Response(429, headers={"Retry-After": "2"}),
+            httpx.Response(503),
+            httpx.Response(200, json=[]),
+        ]
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await http.get_with_retry(client, "https://example.com/")
+
+    assert response.status_code == 200
+    assert route.call_count == 3
+    assert delays[0] == 2.0
+    assert http.RETRY_BASE_DELAY * 2 <= delays[1] <= http.RETRY_MAX_DELAY
+
+
+@respx.mock
+async def test_get_with_retry_returns_final_or_permanent_errors(monkeypatch):
+    """Test that permanent errors are not retried and attempts are bounded."""
+    monkeypatch.setattr(http, "RETRY_BASE_DELAY", 0.0)
+    not_found = respx.get("https://example.com/missing").mock(return_value=httpx.Response(404))
+    failing = respx.get("https://example.com/down").mock(return_value=httpx.Response(500))
+
+    async with httpx.AsyncClient() as client:
+        assert (await http.get_with_retry(client, "https://example.com/missing")).status_code == 404
+        assert (await http.get_with_retry(client, "https://example.com/down")).status_code == 500
+
+    assert not_found.call_count == 1
+    assert failing.call_count == http.RETRY_ATTEMPTS
+
+
+@respx.mock
+async def test_get_with_retry_retries_transport_errors(monkeypatch):
+    """Test that connection failures are retried within the same attempt cap."""
+    delays = []
+
+    async def record(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(http, "_sleep", record)
+    flaky = respx.get("https://example.com/flaky").mock(
+        side_effect=[httpx.ConnectError("refused"), httpx.Response(200, json=[])]
+    )
+    down = respx.get("https://example.com/down").mock(side_effect=httpx.ConnectError("refused"))
+
+    async with httpx.AsyncClient() as client:
+        assert (await http.get_with_retry(client, "https://example.com/flaky")).status_code == 200
+        with pytest.raises(httpx.ConnectError):
+            await http.get_with_retry(client, "https://example.com/down")
+
+    assert flaky.call_count == 2
+    assert down.call_count == http.RETRY_ATTEMPTS
+    assert len(delays) == 1 + (http.RETRY_ATTEMPTS - 1)
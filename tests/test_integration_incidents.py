@@ -1,10 +1,9 @@
 """Integration tests for incident data in risk assessments and reports."""
 
-from datetime import datetime, timedelta
+from datetime import UTC, datetime, timedelta
 
 import pytest
 
-from src.agents.report_agent import ReportAgent
 from src.models.schemas import (
     ChainBreakdown,
     ExploitIncident,
@@ -12,25 +11,20 @@ from src.models.schemas import (
     ProtocolData,
     TVLDataPoint,
 )
-from src.tools.risk_metrics import RiskCalculator
 
+# One reference time for every fixture and test in the module. Scoring still measures
+# recency against the real clock, so this is read at import rather than fixed. Naive UTC,
+# like the TVL and incident dates scoring compares against.
+NOW = datetime.now(UTC).replace(tzinfo=None)
 
-@pytest.fixture
-def calculator():
-    """Create risk calculator."""
-    return RiskCalculator()
 
-
-@pytest.fixture
-def report_agent():
-    """Create report agent."""
-    return ReportAgent()
-
-
-@pytest.fixture
+@pytest.fixture(scope="module")
 def protocol_with_incidents():
-    """Create protocol with incident history."""
-    now = datetime.utcnow()
+    """Create protocol with incident history, shared by the module.
+
+    Tests that need other incidents assess ``model_copy(update={"incidents": [...]})``.
+    """
+    now = NOW
     return ProtocolData(
         name="Vulnerable Protocol",
         slug="vulnerable-protocol",
@@ -76,10 +70,16 @@ def protocol_with_incidents():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
+def incidents_assessment(calculator, protocol_with_incidents):
+    """Assess the protocol with incident history once per module."""
+    return calculator.assess_protocol(protocol_with_incidents)
+
+
+@pytest.fixture(scope="module")
 def clean_protocol():
-    """Create protocol with no incidents."""
-    now = datetime.utcnow()
+    """Create protocol with no incidents, shared by the module (do not mutate)."""
+    now = NOW
     return ProtocolData(
         name="Clean Protocol",
         slug="clean-protocol",
@@ -105,9 +105,15 @@ def clean_protocol():
     )
 
 
-def test_risk_calculation_with_incidents(calculator, protocol_with_incidents):
+@pytest.fixture(scope="module")
+def clean_assessment(calculator, clean_protocol):
+    """Assess the protocol with no incidents once per module."""
+    return calculator.assess_protocol(clean_protocol)
+
+
+def test_risk_calculation_with_incidents(incidents_assessment):
     """Test that incidents properly affect risk scores."""
-    assessment = calculator.assess_protocol(protocol_with_incidents)
+    assessment = incidents_assessment
 
     # Should have incident factor
     incident_factor = next(
@@ -124,9 +130,9 @@ def test_risk_calculation_with_incidents(calculator, protocol_with_incidents):
     assert assessment.incident_analysis
 
 
-def test_risk_calculation_without_incidents(calculator, clean_protocol):
+def test_risk_calculation_without_incidents(clean_assessment):
     """Test that clean protocols have low incident risk."""
-    assessment = calculator.assess_protocol(clean_protocol)
+    assessment = clean_assessment
 
     incident_factor = next(
         (f for f in assessment.score.factors if f.name == "Incident History"), None
@@ -137,10 +143,9 @@ def test_risk_calculation_without_incidents(calculator, clean_protocol):
     assert "no documented" in assessment.incident_analysis.lower()
 
 
-def test_comparison_with_incidents(calculator, protocol_with_incidents, clean_protocol):
+def test_comparison_with_incidents(incidents_assessment, clean_assessment):
     """Test comparing protocols with different incident histories."""
-    vulnerable_assessment = calculator.assess_protocol(protocol_with_incidents)
-    clean_assessment = calculator.assess_protocol(clean_protocol)
+    vulnerable_assessment = incidents_assessment
 
     # Clean protocol should have lower overall risk
     assert clean_assessment.score.overall < vulnerable_assessment.score.overall
@@ -157,10 +162,9 @@ def test_comparison_with_incidents(calculator, protocol_with_incidents, clean_pr
     assert vuln_incident.score > clean_incident.score
 
 
-def test_report_includes_incidents(report_agent, calculator, protocol_with_incidents):
+def test_report_includes_incidents(report_agent, protocol_with_incidents, incidents_assessment):
     """Test that reports properly display incident information."""
-    assessment = calculator.assess_protocol(protocol_with_incidents)
-    report = report_agent.generate_report(protocol_with_incidents, assessment)
+    report = report_agent.generate_report(protocol_with_incidents, incidents_assessment)
 
     # Executive summary should mention incidents
     assert "incident" in report.executive_summary.lower()
@@ -174,10 +178,9 @@ def test_report_includes_incidents(report_agent, calculator, protocol_with_incid
     assert "https://rekt.news/vulnerable-protocol" in report.detailed_analysis
 
 
-def test_report_clean_protocol(report_agent, calculator, clean_protocol):
+def test_report_clean_protocol(report_agent, clean_protocol, clean_assessment):
     """Test that reports show clean history for protocols without incidents."""
-    assessment = calculator.assess_protocol(clean_protocol)
-    report = report_agent.generate_report(clean_protocol, assessment)
+    report = report_agent.generate_report(clean_protocol, clean_assessment)
 
     # Should mention no incidents
     assert "no documented security incidents" in report.executive_summary.lower()
@@ -186,10 +189,10 @@ def test_report_clean_protocol(report_agent, calculator, clean_protocol):
 
 def test_incident_severity_affects_score(calculator, protocol_with_incidents):
     """Test that incident severity properly affects risk scores."""
-    now = datetime.utcnow()
+    now = NOW
 
     # Test with critical incident
-    protocol_with_incidents.incidents = [
+    critical_incidents = [
         ExploitIncident(
             protocol_name="Test",
             date=now - timedelta(days=30),
@@ -200,13 +203,15 @@ def test_incident_severity_affects_score(calculator, protocol_with_incidents):
         )
     ]
 
-    assessment_critical = calculator.assess_protocol(protocol_with_incidents)
+    assessment_critical = calculator.assess_protocol(
+        protocol_with_incidents.model_copy(update={"incidents": critical_incidents})
+    )
     critical_factor = next(
         f for f in assessment_critical.score.factors if f.name == "Incident History"
     )
 
     # Test with low severity incident
-    protocol_with_incidents.incidents = [
+    low_incidents = [
         ExploitIncident(
             protocol_name="Test",
             date=now - timedelta(days=30),
@@ -217,7 +222,9 @@ def test_incident_severity_affects_score(calculator, protocol_with_incidents):
         )
     ]
 
-    assessment_low = calculator.assess_protocol(protocol_with_incidents)
+    assessment_low = calculator.assess_protocol(
+        protocol_with_incidents.model_copy(update={"incidents": low_incidents})
+    )
     low_factor = next(f for f in assessment_low.score.factors if f.name == "Incident History")
 
     # Critical should have higher risk score
@@ -226,10 +233,10 @@ def test_incident_severity_affects_score(calculator, protocol_with_incidents):
 
 def test_incident_recency_affects_score(calculator, protocol_with_incidents):
     """Test that recent incidents have higher impact than old incidents."""
-    now = datetime.utcnow()
+    now = NOW
 
     # Recent incident
-    protocol_with_incidents.incidents = [
+    recent_incidents = [
         ExploitIncident(
             protocol_name="Test",
             date=now - timedelta(days=20),
@@ -240,13 +247,15 @@ def test_incident_recency_affects_score(calculator, protocol_with_incidents):
         )
     ]
 
-    assessment_recent = calculator.assess_protocol(protocol_with_incidents)
+    assessment_recent = calculator.assess_protocol(
+        protocol_with_incidents.model_copy(update={"incidents": recent_incidents})
+    )
     recent_factor = next(
         f for f in assessment_recent.score.factors if f.name == "Incident History"
     )
 
     # Old incident
-    protocol_with_incidents.incidents = [
+    old_incidents = [
         ExploitIncident(
             protocol_name="Test",
             date=now - timedelta(days=800),
@@ -257,7 +266,9 @@ def test_incident_recency_affects_score(calculator, protocol_with_incidents):
         )
     ]
 
-    assessment_old = calculator.assess_protocol(protocol_with_incidents)
+    assessment_old = calculator.assess_protocol(
+        protocol_with_incidents.model_copy(update={"incidents": old_incidents})
+    )
     old_factor = next(f for f in assessment_old.score.factors if f.name == "Incident History")
 
     # Recent should have higher risk score
@@ -266,10 +277,10 @@ def test_incident_recency_affects_score(calculator, protocol_with_incidents):
 
 def test_multiple_incidents_compound_risk(calculator, protocol_with_incidents):
     """Test that multiple incidents compound the risk score."""
-    now = datetime.utcnow()
+    now = NOW
 
     # Single incident
-    protocol_with_incidents.incidents = [
+    single_incidents = [
         ExploitIncident(
             protocol_name="Test",
             date=now - timedelta(days=60),
@@ -280,13 +291,15 @@ def test_multiple_incidents_compound_risk(calculator, protocol_with_incidents):
         )
     ]
 
-    assessment_single = calculator.assess_protocol(protocol_with_incidents)
+    assessment_single = calculator.assess_protocol(
+        protocol_with_incidents.model_copy(update={"incidents": single_incidents})
+    )
     single_factor = next(
         f for f in assessment_single.score.factors if f.name == "Incident History"
     )
 
     # Multiple incidents
-    protocol_with_incidents.incidents = [
+    multiple_incidents = [
         ExploitIncident(
             protocol_name="Test",
             date=now - timedelta(days=60),
@@ -313,19 +326,20 @@ def test_multiple_incidents_compound_risk(calculator, protocol_with_incidents):
         ),
     ]
 
-    assessment_multiple = calculator.assess_protocol(protocol_with_incidents)
+    assessment_multiple = calculator.assess_protocol(
+        protocol_with_incidents.model_copy(update={"incidents": multiple_incidents})
+    )
     multiple_factor = next(
         f for f in assessment_multiple.score.factors if f.name == "Incident History"
     )
 
     # Multiple incidents should generally have higher risk (though normalized)
-    assert len(protocol_with_incidents.incidents) == 3
+    assert len(multiple_incidents) == 3
 
 
-def test_data_sources_include_rekt(report_agent, calculator, protocol_with_incidents):
+def test_data_sources_include_rekt(report_agent, protocol_with_incidents, incidents_assessment):
     """Test that Rekt.news is included in data sources."""
-    assessment = calculator.assess_protocol(protocol_with_incidents)
-    report = report_agent.generate_report(protocol_with_incidents, assessment)
+    report = report_agent.generate_report(protocol_with_incidents, incidents_assessment)
 
     # Should include Rekt.news in data sources
     assert any("rekt.news" in source.lower() for source in report.data_sources)
@@ -8,18 +8,33 @@ import pytest
 import respx
 
 from src.models.schemas import IncidentSeverity
-from src.tools.rekt_scraper import RektScraper
+from src.tools.rekt_scraper import RektScraper, _LeaderboardIndex
 
 
 @pytest.fixture
-def scraper():
-    """Create a fresh scraper instance."""
-    return RektScraper()
+def scraper(tmp_path):
+    """Create a fresh scraper instance with an isolated disk cache."""
+    return RektScraper(cache_path=tmp_path / "rekt_leaderboard.json")
 
 
-@pytest.fixture
+@pytest.fixture(scope="module", autouse=True)
+def respx_router():
+    """Patch httpx once for the whole module instead of once per test."""
+    with respx.mock as router:
+        yield router
+
+
+@pytest.fixture(autouse=True)
+def _reset_respx_routes(respx_router):
+    """Drop each test's routes and call history so tests stay independent."""
+    yield
+    respx_router.clear()
+    respx_router.reset()
+
+
+@pytest.fixture(scope="session")
 def mock_leaderboard_html():
-    """Mock HTML with embedded JSON data."""
+    """Mock HTML with embedded JSON data, built once per session."""
     leaderboard_data = [
         {
             "protocol": "Cream Finance",
@@ -73,9 +88,9 @@ def mock_leaderboard_html():
     return html
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_leaderboard_table():
-    """Mock HTML with table structure."""
+    """Mock HTML with table structure, built once per session."""
     html = """
     <!DOCTYPE html>
     <html>
@@ -99,7 +114,6 @@ def mock_leaderboard_table():
     return html
 
 
-@respx.mock
 async def test_fetch_leaderboard_data_json(scraper, mock_leaderboard_html):
     """Test fetching leaderboard data from embedded JSON."""
     respx.get(RektScraper.LEADERBOARD_URL).mock(
@@ -115,7 +129,25 @@ async def test_fetch_leaderboard_data_json(scraper, mock_leaderboard_html):
     assert data[1]["amount"] == 611000000
 
 
-@respx.mock
+async def test_fetch_leaderboard_data_json_skips_html_parsing(
+    scraper, mock_leaderboard_html, monkeypatch
+):
+    """Test that embedded JSON is extracted without building a parse tree."""
+    import src.tools.rekt_scraper as rekt_scraper
+
+    def fail(*args, **kwargs):
+        raise AssertionError("BeautifulSoup should not be needed for embedded JSON")
+
+    monkeypatch.setattr(rekt_scraper, "BeautifulSoup", fail)
+    respx.get(RektScraper.LEADERBOARD_URL).mock(
+        return_value=httpx.Response(200, text=mock_leaderboard_html)
+    )
+
+    data = await scraper.fetch_leaderboard_data()
+
+    assert [item["protocol"] for item in data] == ["Cream Finance", "Poly Network", "BadgerDAO"]
+
+
 async def test_fetch_leaderboard_data_table(scraper, mock_leaderboard_table):
     """Test parsing leaderboard data from HTML table."""
     respx.get(RektScraper.LEADERBOARD_URL).mock(
@@ -131,9 +163,11 @@ async def test_fetch_leaderboard_data_table(scraper, mock_leaderboard_table):
     assert data[1]["amount"] == 611000000
 
 
-@respx.mock
-async def test_fetch_leaderboard_data_error(scraper):
+async def test_fetch_leaderboard_data_error(scraper, monkeypatch):
     """Test handling of HTTP errors."""
+    import src.http
+
+    monkeypatch.setattr(src.http, "RETRY_BASE_DELAY", 0.0)
     respx.get(RektScraper.LEADERBOARD_URL).mock(return_value=httpx.Response(500))
 
     data = await scraper.fetch_leaderboard_data()
@@ -142,7 +176,6 @@ async def test_fetch_leaderboard_data_error(scraper):
     assert data == []
 
 
-@respx.mock
 async def test_fetch_protocol_incidents(scraper, mock_leaderboard_html):
     """Test fetching incidents for a specific protocol."""
     respx.get(RektScraper.LEADERBOARD_URL).mock(
@@ -156,9 +189,9 @@ async def test_fetch_protocol_incidents(scraper, mock_leaderboard_html):
     assert incidents[0].amount_lost_usd == 130000000
     assert incidents[0].severity == IncidentSeverity.CRITICAL
     assert incidents[0].title == "Cream Finance - $130M"
+    assert incidents[0].date == datetime(2021, 10, 27)  # "Z" suffix normalized to naive UTC
 
 
-@respx.mock
 async def test_fetch_protocol_incidents_by_name(scraper, mock_leaderboard_html):
     """Test matching by protocol name when slug doesn't match."""
     respx.get(RektScraper.LEADERBOARD_URL).mock(
@@ -172,7 +205,6 @@ async def test_fetch_protocol_incidents_by_name(scraper, mock_leaderboard_html):
     assert incidents[0].amount_lost_usd == 120000000
 
 
-@respx.mock
 async def test_fetch_protocol_incidents_no_match(scraper, mock_leaderboard_html):
     """Test fetching incidents when protocol has none."""
     respx.get(RektScraper.LEADERBOARD_URL).mock(
@@ -184,24 +216,52 @@ async def test_fetch_protocol_incidents_no_match(scraper, mock_leaderboard_html)
     assert len(incidents) == 0
 
 
-def test_classify_severity_critical(scraper):
-    """Test severity classification for critical incidents."""
-    assert scraper._classify_severity(100_000_000) == IncidentSeverity.CRITICAL
+async def test_leaderboard_rows_normalized_once(scraper, mock_leaderboard_html, monkeypatch):
+    """Test that leaderboard rows are normalized once, not on every lookup."""
+    respx.get(RektScraper.LEADERBOARD_URL).mock(
+        return_value=httpx.Response(200, text=mock_leaderboard_html)
+    )
+    await scraper.fetch_protocol_incidents("cream-finance", "Cream Finance")
+
+    calls = []
+    normalize = scraper._normalize_protocol_name
+    monkeypatch.setattr(
+        scraper, "_normalize_protocol_name", lambda name: calls.append(name) or normalize(name)
+    )
+    incidents = await scraper.fetch_protocol_incidents("badger", "BadgerDAO")
 
+    assert calls == ["badger", "BadgerDAO"]
+    assert len(incidents) == 1
 
-def test_classify_severity_high(scraper):
-    """Test severity classification for high severity incidents."""
-    assert scraper._classify_severity(30_000_000) == IncidentSeverity.HIGH
 
+def test_leaderboard_index_partial_matches():
+    """Test that partial matches search slug and protocol of rows that have a slug."""
+    index = _LeaderboardIndex(
+        [
+            ("cream-finance", "cream-rekt", set()),
+            ("creamy", "", set()),  # No slug: never a partial match
+            ("icecream", "ice-rekt-2", set()),
+            ("cream", "cream-rekt-cream", set()),  # Matches twice, reported once
+        ]
+    )
 
-def test_classify_severity_medium(scraper):
-    """Test severity classification for medium severity incidents."""
-    assert scraper._classify_severity(5_000_000) == IncidentSeverity.MEDIUM
+    assert index.partial_matches("cream") == [0, 2, 3]
+    assert index.partial_matches("rekt-2") == [2]
+    assert index.partial_matches("aave") == []
 
 
-def test_classify_severity_low(scraper):
-    """Test severity classification for low severity incidents."""
-    assert scraper._classify_severity(500_000) == IncidentSeverity.LOW
+@pytest.mark.parametrize(
+    "amount,expected",
+    [
+        (100_000_000, IncidentSeverity.CRITICAL),
+        (30_000_000, IncidentSeverity.HIGH),
+        (5_000_000, IncidentSeverity.MEDIUM),
+        (500_000, IncidentSeverity.LOW),
+    ],
+)
+def test_classify_severity(scraper, amount, expected):
+    """Test severity classification by amount lost."""
+    assert scraper._classify_severity(amount) == expected
 
 
 def test_normalize_protocol_name(scraper):
@@ -219,7 +279,6 @@ def test_normalize_protocol_name_empty(scraper):
     assert scraper._normalize_protocol_name("") == ""
 
 
-@respx.mock
 async def test_caching(scraper, mock_leaderboard_html):
     """Test that data is cached properly."""
     route = respx.get(RektScraper.LEADERBOARD_URL).mock(
@@ -238,14 +297,41 @@ async def test_caching(scraper, mock_leaderboard_html):
     assert data1 == data2
 
 
-def test_parse_amount(scraper):
+async def test_disk_cache_survives_restart(tmp_path, mock_leaderboard_html):
+    """Test that a fresh leaderboard is reused by a new scraper instance."""
+    import os
+    import time
+
+    cache_path = tmp_path / "rekt_leaderboard.json"
+    route = respx.get(RektScraper.LEADERBOARD_URL).mock(
+        return_value=httpx.Response(200, text=mock_leaderboard_html)
+    )
+
+    data = await RektScraper(cache_path=cache_path).fetch_leaderboard_data()
+    assert await RektScraper(cache_path=cache_path).fetch_leaderboard_data() == data
+    assert route.call_count == 1
+
+    # Expired snapshots are ignored
+    stale = time.time() - RektScraper.CACHE_TTL - 1
+    os.utime(cache_path, (stale, stale))
+    await RektScraper(cache_path=cache_path).fetch_leaderboard_data()
+    assert route.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("$100M", 100_000_000),
+        ("$1.5B", 1_500_000_000),
+        ("$50K", 50_000),
+        ("$10", 10),
+        ("$120.5M", 120_500_000),
+        ("invalid", 0.0),
+    ],
+)
+def test_parse_amount(scraper, text, expected):
     """Test amount parsing from various formats."""
-    assert scraper._parse_amount("$100M") == 100_000_000
-    assert scraper._parse_amount("$1.5B") == 1_500_000_000
-    assert scraper._parse_amount("$50K") == 50_000
-    assert scraper._parse_amount("$10") == 10
-    assert scraper._parse_amount("$120.5M") == 120_500_000
-    assert scraper._parse_amount("invalid") == 0.0
+    assert scraper._parse_amount(text) == expected
 
 
 def test_parse_date(scraper):
@@ -259,5 +345,10 @@ def test_parse_date(scraper):
     result = scraper._parse_date("10/27/2021")
     assert result is not None
 
+    # Day-first wins when both orders are valid
+    assert scraper._parse_date("05/04/2021") == datetime(2021, 4, 5)
+    assert scraper._parse_date("October 27, 2021") == datetime(2021, 10, 27)
+    assert scraper._parse_date("27 October 2021") == datetime(2021, 10, 27)
+
     result = scraper._parse_date("invalid")
     assert result is None
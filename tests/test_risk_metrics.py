@@ -1,6 +1,6 @@
 """Tests for risk metrics calculator."""
 
-from datetime import datetime, timedelta
+from datetime import UTC, datetime, timedelta
 
 import pytest
 
@@ -14,17 +14,16 @@ from src.models.schemas import (
 )
 from src.tools.risk_metrics import RiskCalculator
 
-
-@pytest.fixture
-def calculator():
-    """Create risk calculator."""
-    return RiskCalculator()
+# One reference time for every fixture and test in the module. Scoring still measures
+# recency against the real clock, so this is read at import rather than fixed. Naive UTC,
+# like the TVL and incident dates scoring compares against.
+NOW = datetime.now(UTC).replace(tzinfo=None)
 
 
 @pytest.fixture
 def sample_protocol():
     """Create sample protocol data for testing."""
-    now = datetime.utcnow()
+    now = NOW
     return ProtocolData(
         name="Test Protocol",
         slug="test-protocol",
@@ -54,7 +53,7 @@ def sample_protocol():
 @pytest.fixture
 def high_risk_protocol():
     """Create high-risk protocol data."""
-    now = datetime.utcnow()
+    now = NOW
     return ProtocolData(
         name="Risky Protocol",
         slug="risky-protocol",
@@ -191,29 +190,38 @@ def test_assess_protocol_full(calculator: RiskCalculator, sample_protocol: Proto
     assert assessment.incident_analysis
 
 
-def test_risk_level_classification(calculator: RiskCalculator):
+@pytest.mark.parametrize(
+    "score,level",
+    [
+        (2.0, RiskLevel.LOW),
+        (4.0, RiskLevel.MEDIUM),
+        (6.0, RiskLevel.HIGH),
+        (8.5, RiskLevel.CRITICAL),
+    ],
+)
+def test_risk_level_classification(calculator: RiskCalculator, score: float, level: RiskLevel):
     """Test risk level thresholds."""
     from src.models.schemas import RiskFactor
 
-    # Low risk
-    low_factors = [RiskFactor(name="Test", score=2.0, weight=1.0, description="test")]
-    low_score = calculator.calculate_overall_risk(low_factors)
-    assert low_score.level == RiskLevel.LOW
+    factors = [RiskFactor(name="Test", score=score, weight=1.0, description="test")]
+    assert calculator.calculate_overall_risk(factors).level == level
 
-    # Medium risk
-    med_factors = [RiskFactor(name="Test", score=4.0, weight=1.0, description="test")]
-    med_score = calculator.calculate_overall_risk(med_factors)
-    assert med_score.level == RiskLevel.MEDIUM
 
-    # High risk
-    high_factors = [RiskFactor(name="Test", score=6.0, weight=1.0, description="test")]
-    high_score = calculator.calculate_overall_risk(high_factors)
-    assert high_score.level == RiskLevel.HIGH
+def test_risk_level_boundaries():
+    """Test that each threshold belongs to the lower risk level."""
+    from src.models.schemas import RiskScore
 
-    # Critical risk
-    crit_factors = [RiskFactor(name="Test", score=8.5, weight=1.0, description="test")]
-    crit_score = calculator.calculate_overall_risk(crit_factors)
-    assert crit_score.level == RiskLevel.CRITICAL
+    levels = [RiskScore.from_score(s, []).level for s in (0, 3, 3.01, 5, 5.01, 7, 7.01, 10)]
+    assert levels == [
+        RiskLevel.LOW,
+        RiskLevel.LOW,
+        RiskLevel.MEDIUM,
+        RiskLevel.MEDIUM,
+        RiskLevel.HIGH,
+        RiskLevel.HIGH,
+        RiskLevel.CRITICAL,
+        RiskLevel.CRITICAL,
+    ]
 
 
 def test_assess_incident_risk_no_incidents(calculator: RiskCalculator, sample_protocol: ProtocolData):
@@ -229,7 +237,7 @@ def test_assess_incident_risk_no_incidents(calculator: RiskCalculator, sample_pr
 def test_assess_incident_risk_recent_critical(calculator: RiskCalculator, sample_protocol: ProtocolData):
     """Test incident risk for protocol with recent critical incident."""
     # Add a recent critical incident
-    now = datetime.utcnow()
+    now = NOW
     sample_protocol.incidents = [
         ExploitIncident(
             protocol_name="Test Protocol",
@@ -250,7 +258,7 @@ def test_assess_incident_risk_recent_critical(calculator: RiskCalculator, sample
 def test_assess_incident_risk_old_resolved(calculator: RiskCalculator, sample_protocol: ProtocolData):
     """Test incident risk for protocol with old resolved incident."""
     # Add an old resolved incident
-    now = datetime.utcnow()
+    now = NOW
     sample_protocol.incidents = [
         ExploitIncident(
             protocol_name="Test Protocol",
@@ -270,7 +278,7 @@ def test_assess_incident_risk_old_resolved(calculator: RiskCalculator, sample_pr
 
 def test_assess_protocol_with_incidents(calculator: RiskCalculator, sample_protocol: ProtocolData):
     """Test full protocol assessment with incidents."""
-    now = datetime.utcnow()
+    now = NOW
     sample_protocol.incidents = [
         ExploitIncident(
             protocol_name="Test Protocol",
@@ -288,3 +296,92 @@ def test_assess_protocol_with_incidents(calculator: RiskCalculator, sample_proto
     incident_factor = next(f for f in assessment.score.factors if f.name == "Incident History")
     assert incident_factor.score > 2.0  # Should have some risk
     assert "incident" in assessment.incident_analysis.lower()
+
+
+def test_assess_batch(
+    calculator: RiskCalculator, sample_protocol: ProtocolData, high_risk_protocol: ProtocolData
+):
+    """Test batch assessment matches per-protocol assessment, in input order."""
+    assessments = calculator.assess_batch([high_risk_protocol, sample_protocol])
+
+    assert [a.protocol_slug for a in assessments] == [high_risk_protocol.slug, sample_protocol.slug]
+    for protocol, assessment in zip([high_risk_protocol, sample_protocol], assessments):
+        assert assessment.score == calculator.assess_protocol(protocol).score
+
+
+def test_assess_protocol_reuses_identical_inputs(
+    sample_protocol: ProtocolData, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that a refetched but unchanged protocol reuses its assessment."""
+    calculator = RiskCalculator()  # Empty assessment cache
+    calls = []
+    assess = calculator._assess_protocol
+    monkeypatch.setattr(calculator, "_assess_protocol", lambda p: calls.append(p) or assess(p))
+
+    first = calculator.assess_protocol(sample_protocol)
+    refetched = sample_protocol.model_copy(update={"fetched_at": datetime.now(UTC)})
+    again = calculator.assess_protocol(refetched)
+
+    assert len(calls) == 1
+    assert again.score == first.score
+    assert again.assessed_at >= first.assessed_at
+    # Fresh and reused assessments are stamped the same way
+    assert first.assessed_at.tzinfo is again.assessed_at.tzinfo is UTC
+
+    changed = sample_protocol.model_copy(update={"oracles": []})
+    calculator.assess_protocol(changed)
+    assert len(calls) == 2
+
+
+def test_assess_protocol_cache_is_isolated_from_callers(sample_protocol: ProtocolData):
+    """Test that mutating a returned assessment does not change later reused ones."""
+    calculator = RiskCalculator()  # Empty assessment cache
+    fresh = calculator.assess_protocol(sample_protocol)
+    expected = fresh.model_copy(deep=True)
+
+    for assessment in (fresh, calculator.assess_protocol(sample_protocol)):
+        assessment.warnings.append("tampered")
+        assessment.recommendations.clear()
+        assessment.score.overall = 0.0
+        assessment.score.factors.clear()
+
+    again = calculator.assess_protocol(sample_protocol)
+
+    assert again.score == expected.score
+    assert again.warnings == expected.warnings
+    assert again.recommendations == expected.recommendations
+
+
+def test_assess_protocol_cache_is_thread_safe(
+    sample_protocol: ProtocolData, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that two threads evicting from a full cache at once do not collide."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    import src.tools.risk_metrics as risk_metrics
+
+    class RendezvousDict(dict):
+        """Hold each eviction until a second thread reaches it too, if one can."""
+
+        barrier = threading.Barrier(2, timeout=0.2)
+
+        def __delitem__(self, key):
+            try:
+                self.barrier.wait()
+            except threading.BrokenBarrierError:
+                pass  # The other thread is blocked on the cache lock
+            super().__delitem__(key)
+
+    monkeypatch.setattr(risk_metrics, "ASSESSMENT_CACHE_SIZE", 2)
+    calculator = RiskCalculator()
+    calculator._cache = RendezvousDict()
+    for i in range(2):
+        calculator.assess_protocol(sample_protocol.model_copy(update={"slug": f"old-{i}"}))
+
+    protocols = [sample_protocol.model_copy(update={"slug": f"new-{i}"}) for i in range(2)]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assessments = list(pool.map(calculator.assess_protocol, protocols))
+
+    assert [a.protocol_slug for a in assessments] == ["new-0", "new-1"]
+    assert len(dict(calculator._cache)) == 2
@@ -1,6 +1,13 @@
 """Tests for LangGraph workflow."""
 
+import importlib.util
+import json
+from datetime import datetime
+from typing import Any
+
+import httpx
 import pytest
+import respx
 
 from src.graph.workflow import (
     DeFiRiskWorkflow,
@@ -8,20 +15,131 @@ from src.graph.workflow import (
     create_initial_state,
     create_workflow,
 )
-from src.models.schemas import ComparisonReport, RiskReport
+from src.models.schemas import (
+    ChainBreakdown,
+    ComparisonReport,
+    ProtocolData,
+    RiskAssessment,
+    RiskLevel,
+    RiskReport,
+    RiskScore,
+)
+from src.tools import rekt_scraper
+from src.tools.defillama import BASE_URL, DefiLlamaClient
+from src.tools.rekt_scraper import RektScraper
+
+requires_benchmark = pytest.mark.skipif(
+    importlib.util.find_spec("pytest_benchmark") is None,
+    reason="pytest-benchmark is not installed",
+)
+
+# Recorded-shape API responses, trimmed to the fields the clients read
+PROTOCOLS = [
+    {"name": "Aave", "slug": "aave"},
+    {"name": "Compound", "slug": "compound"},
+]
+
+LEADERBOARD = [
+    {
+        "protocol": "Compound",
+        "slug": "compound",
+        "amount": 80_000_000,
+        "date": "2021-09-30T00:00:00Z",
+        "title": "Compound - REKT",
+        "url": "https://rekt.news/compound-rekt",
+    },
+]
+
+
+def protocol_detail(name: str, tvl: float) -> dict[str, Any]:
+    """Build a /protocol/{slug} response with 30 days of TVL history."""
+    start = int(datetime(2024, 1, 1).timestamp())
+    return {
+        "name": name,
+        "symbol": name[:4].upper(),
+        "category": "Lending",
+        "chains": ["Ethereum", "Arbitrum"],
+        "currentChainTvls": {"Ethereum": tvl * 0.8, "Arbitrum": tvl * 0.2, "borrowed": tvl},
+        "tvl": [
+            {"date": start + day * 86_400, "totalLiquidityUSD": tvl * (1 + day * 0.001)}
+            for day in range(30)
+        ],
+        "audits": "2",
+        "audit_links": [f"https://audits.example.com/{name.lower()}"],
+        "oracles": ["Chainlink"],
+        "change_1d": 0.5,
+        "change_7d": 1.2,
+        "change_1m": 3.4,
+    }
+
+
+@pytest.fixture
+def recorded_apis(monkeypatch: pytest.MonkeyPatch):
+    """Serve canned DefiLlama and Rekt responses so workflow tests run offline."""
+    from src.agents.data_agent import get_data_agent
+
+    # Fresh clients so no cached or on-disk responses leak in
+    monkeypatch.setattr(get_data_agent(), "client", DefiLlamaClient())
+    monkeypatch.setattr(rekt_scraper, "_scraper", RektScraper(cache_path=None))
+
+    leaderboard_html = f"<script>var leaderboard = {json.dumps(LEADERBOARD)};</script>"
+    with respx.mock:
+        respx.get(f"{BASE_URL}/protocols").mock(return_value=httpx.Response(200, json=PROTOCOLS))
+        respx.get(f"{BASE_URL}/protocol/aave").mock(
+            return_value=httpx.Response(200, json=protocol_detail("Aave", 20e9))
+        )
+        respx.get(f"{BASE_URL}/protocol/compound").mock(
+            return_value=httpx.Response(200, json=protocol_detail("Compound", 3e9))
+        )
+        respx.get(RektScraper.LEADERBOARD_URL).mock(
+            return_value=httpx.Response(200, text=leaderboard_html)
+        )
+        yield
+
+
+@pytest.fixture(scope="module")
+def sample_risk_report() -> RiskReport:
+    """Create a minimal risk report, validated once per module."""
+    protocol = ProtocolData(
+        name="Test",
+        slug="test",
+        tvl=1e9,
+        chains=["Ethereum"],
+        chain_tvls=[ChainBreakdown(chain="Ethereum", tvl=1e9, percentage=100)],
+    )
+
+    assessment = RiskAssessment(
+        protocol_name="Test",
+        protocol_slug="test",
+        score=RiskScore(overall=3.0, level=RiskLevel.LOW, factors=[]),
+        tvl_analysis="Test",
+        chain_analysis="Test",
+        audit_analysis="Test",
+        incident_analysis="Test",
+    )
+
+    return RiskReport(
+        protocol=protocol,
+        assessment=assessment,
+        executive_summary="Test summary",
+        detailed_analysis="Test analysis",
+        data_sources=["Test source"],
+    )
 
 
 def test_create_initial_state():
     """Test creating initial state."""
-    state = create_initial_state("analyze aave")
-
-    assert state["query"] == "analyze aave"
-    assert state["protocol_names"] == []
-    assert state["protocol_data"] == {}
-    assert state["risk_assessments"] == {}
-    assert state["report"] is None
-    assert state["next_agent"] == "supervisor"
-    assert state["error"] is None
+    assert create_initial_state("analyze aave") == {
+        "messages": [],
+        "query": "analyze aave",
+        "protocol_names": [],
+        "protocol_data": {},
+        "risk_assessments": {},
+        "report": None,
+        "current_agent": "",
+        "next_agent": "supervisor",
+        "error": None,
+    }
 
 
 def test_create_workflow():
@@ -29,10 +147,7 @@ def test_create_workflow():
     workflow = create_workflow()
 
     # Check nodes exist
-    assert "supervisor" in workflow.nodes
-    assert "data_agent" in workflow.nodes
-    assert "risk_agent" in workflow.nodes
-    assert "report_agent" in workflow.nodes
+    assert {"supervisor", "data_agent", "risk_agent", "report_agent"} <= workflow.nodes.keys()
 
 
 def test_compile_workflow():
@@ -42,17 +157,18 @@ def test_compile_workflow():
     assert app is not None
 
 
+def test_workflow_uses_injected_app(compiled_app):
+    """Test that a precompiled app is used instead of the shared one."""
+    assert DeFiRiskWorkflow(app=compiled_app).app is compiled_app
+    assert DeFiRiskWorkflow().app is not compiled_app
+
+
 class TestDeFiRiskWorkflow:
     """Integration tests for DeFiRiskWorkflow."""
 
-    @pytest.fixture
-    def workflow(self):
-        """Create workflow instance."""
-        return DeFiRiskWorkflow()
-
     @pytest.mark.asyncio
-    async def test_analyze_aave(self, workflow: DeFiRiskWorkflow):
-        """Test analyzing Aave (real API call)."""
+    async def test_analyze_aave(self, workflow: DeFiRiskWorkflow, recorded_apis):
+        """Test analyzing Aave."""
         report = await workflow.analyze("aave")
 
         assert report is not None
@@ -64,8 +180,18 @@ class TestDeFiRiskWorkflow:
         assert report.detailed_analysis
 
     @pytest.mark.asyncio
-    async def test_compare_protocols(self, workflow: DeFiRiskWorkflow):
-        """Test comparing protocols (real API call)."""
+    @pytest.mark.integration
+    async def test_analyze_aave_live(self, workflow: DeFiRiskWorkflow):
+        """Test analyzing Aave against the live APIs (run with -m integration)."""
+        report = await workflow.analyze("aave")
+
+        assert isinstance(report, RiskReport)
+        assert "aave" in report.protocol.slug.lower()
+        assert report.protocol.tvl > 0
+
+    @pytest.mark.asyncio
+    async def test_compare_protocols(self, workflow: DeFiRiskWorkflow, recorded_apis):
+        """Test comparing protocols."""
         report = await workflow.compare(["aave", "compound"])
 
         assert report is not None
@@ -74,9 +200,90 @@ class TestDeFiRiskWorkflow:
         assert len(report.assessments) == 2
         assert report.comparison_summary
         assert report.recommendation
+        assert report.protocols[1].incidents  # Served from the Rekt leaderboard
 
     @pytest.mark.asyncio
-    async def test_run_query(self, workflow: DeFiRiskWorkflow):
+    async def test_compare_assesses_as_one_batch(
+        self, workflow: DeFiRiskWorkflow, recorded_apis, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Test that compare scores every protocol in one RiskCalculator.assess_batch call."""
+        from src.agents.risk_agent import get_risk_agent
+
+        calculator = get_risk_agent().calculator
+        batches = []
+        assess_batch = calculator.assess_batch
+        monkeypatch.setattr(
+            calculator, "assess_batch", lambda ps: batches.append(ps) or assess_batch(ps)
+        )
+
+        await workflow.compare(["aave", "compound"])
+
+        assert [[p.slug for p in batch] for batch in batches] == [["aave", "compound"]]
+
+    @pytest.mark.asyncio
+    async def test_compare_fetches_concurrently(
+        self, workflow: DeFiRiskWorkflow, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Test that compare overlaps per-protocol fetches and keeps input order."""
+        import asyncio
+
+        from src.agents.data_agent import get_data_agent
+
+        in_flight = 0
+        peak = 0
+
+        class StubClient:
+            async def fetch_protocol_data(self, name: str) -> ProtocolData:
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.01)
+                in_flight -= 1
+                return ProtocolData(
+                    name=name.title(),
+                    slug=name,
+                    tvl=1e9,
+                    chains=["Ethereum"],
+                    chain_tvls=[ChainBreakdown(chain="Ethereum", tvl=1e9, percentage=100)],
+                )
+
+        monkeypatch.setattr(get_data_agent(), "client", StubClient())
+
+        report = await workflow.compare(["curve", "aave", "lido"])
+
+        assert peak == 3
+        assert [p.slug for p in report.protocols] == ["curve", "aave", "lido"]
+
+    @pytest.mark.asyncio
+    async def test_analyze_matches_graph(
+        self, workflow: DeFiRiskWorkflow, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Test that the direct single-protocol analyze matches the graph's report."""
+        from src.agents.data_agent import get_data_agent
+
+        class StubClient:
+            async def fetch_protocol_data(self, name: str) -> ProtocolData:
+                return ProtocolData(
+                    name=name.title(),
+                    slug=name,
+                    tvl=1e9,
+                    chains=["Ethereum"],
+                    chain_tvls=[ChainBreakdown(chain="Ethereum", tvl=1e9, percentage=100)],
+                )
+
+        monkeypatch.setattr(get_data_agent(), "client", StubClient())
+
+        report = await workflow.analyze("aave")
+        expected = (await workflow.run_query("analyze aave"))["report"]
+
+        assert isinstance(report, RiskReport)
+        assert report.protocol.slug == expected.protocol.slug
+        assert report.assessment.score == expected.assessment.score
+        assert report.executive_summary == expected.executive_summary
+        assert report.detailed_analysis == expected.detailed_analysis
+
+    @pytest.mark.asyncio
+    async def test_run_query(self, workflow: DeFiRiskWorkflow, recorded_apis):
         """Test running natural language query."""
         result = await workflow.run_query("analyze aave risk")
 
@@ -85,48 +292,63 @@ class TestDeFiRiskWorkflow:
         assert result["report"] is not None
 
     @pytest.mark.asyncio
-    async def test_analyze_invalid_protocol(self, workflow: DeFiRiskWorkflow):
+    async def test_analyze_invalid_protocol(self, workflow: DeFiRiskWorkflow, recorded_apis):
         """Test analyzing non-existent protocol."""
         with pytest.raises(RuntimeError):
             await workflow.analyze("nonexistent_protocol_xyz123")
 
-    def test_format_risk_report(self, workflow: DeFiRiskWorkflow):
-        """Test formatting risk report."""
-        from src.models.schemas import (
-            ChainBreakdown,
-            ProtocolData,
-            RiskAssessment,
-            RiskLevel,
-            RiskScore,
-        )
+    @pytest.mark.asyncio
+    async def test_analyze_error_matches_graph(self, workflow: DeFiRiskWorkflow, recorded_apis):
+        """Test that the direct analyze fails with the same message as the graph."""
+        respx.get(f"{BASE_URL}/protocol/unlisted").mock(return_value=httpx.Response(404))
 
-        protocol = ProtocolData(
-            name="Test",
-            slug="test",
-            tvl=1e9,
-            chains=["Ethereum"],
-            chain_tvls=[ChainBreakdown(chain="Ethereum", tvl=1e9, percentage=100)],
-        )
+        with pytest.raises(RuntimeError) as direct:
+            await workflow.analyze("unlisted")
+        with pytest.raises(RuntimeError) as graph:
+            await workflow._analyze_with_graph("analyze unlisted")
 
-        assessment = RiskAssessment(
-            protocol_name="Test",
-            protocol_slug="test",
-            score=RiskScore(overall=3.0, level=RiskLevel.LOW, factors=[]),
-            tvl_analysis="Test",
-            chain_analysis="Test",
-            audit_analysis="Test",
-            incident_analysis="Test",
-        )
+        assert str(direct.value) == str(graph.value)
+        assert str(direct.value).startswith("Failed to fetch all protocols: ")
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_isolate_failures(
+        self, workflow: DeFiRiskWorkflow, recorded_apis
+    ):
+        """Test that a failing analysis does not disturb calls running alongside it."""
+        import asyncio
 
-        report = RiskReport(
-            protocol=protocol,
-            assessment=assessment,
-            executive_summary="Test summary",
-            detailed_analysis="Test analysis",
-            data_sources=["Test source"],
+        analyzed, failed, compared = await asyncio.gather(
+            workflow.analyze("aave"),
+            workflow.analyze("nonexistent_protocol_xyz123"),
+            workflow.compare(["aave", "compound"]),
+            return_exceptions=True,
         )
 
-        formatted = workflow.format_report(report)
+        assert isinstance(analyzed, RiskReport)
+        assert analyzed.protocol.slug == "aave"
+        assert isinstance(failed, RuntimeError)
+        assert isinstance(compared, ComparisonReport)
+        assert [p.slug for p in compared.protocols] == ["aave", "compound"]
+
+    def test_format_risk_report(self, workflow: DeFiRiskWorkflow, sample_risk_report):
+        """Test formatting risk report."""
+        formatted = workflow.format_report(sample_risk_report)
 
         assert "Test" in formatted
         assert "DeFi Risk Report" in formatted
+
+
+@requires_benchmark
+def test_create_initial_state_perf(benchmark):
+    """Benchmark initial state creation, run before every workflow invocation."""
+    state = benchmark(create_initial_state, "analyze aave")
+
+    assert state["query"] == "analyze aave"
+
+
+@requires_benchmark
+def test_format_report_perf(benchmark, workflow: DeFiRiskWorkflow, sample_risk_report):
+    """Benchmark markdown report formatting."""
+    formatted = benchmark(workflow.format_report, sample_risk_report)
+
+    assert "DeFi Risk Report" in formatted